@@ -0,0 +1,48 @@
+"""feat: rating aggregates for photos
+
+Revision ID: 3f2a9c1d7e55
+Revises: 96aeb0549b37
+Create Date: 2026-10-18 09:12:41.503172
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2a9c1d7e55'
+down_revision: Union[str, None] = '96aeb0549b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('photos', sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('photos', sa.Column('rating_sum', sa.Float(), server_default='0', nullable=False))
+    op.add_column('photos', sa.Column('avg_rating', sa.Float(), nullable=True))
+    op.create_index(op.f('ix_photos_avg_rating'), 'photos', ['avg_rating'], unique=False)
+
+    # Backfill the aggregates from the existing ratings
+    op.execute(
+        """
+        UPDATE photos
+        SET rating_count = agg.rating_count,
+            rating_sum = agg.rating_sum,
+            avg_rating = agg.rating_sum / agg.rating_count
+        FROM (
+            SELECT photo_id, COUNT(*) AS rating_count, SUM(rating) AS rating_sum
+            FROM ratings
+            GROUP BY photo_id
+        ) AS agg
+        WHERE photos.id = agg.photo_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_photos_avg_rating'), table_name='photos')
+    op.drop_column('photos', 'avg_rating')
+    op.drop_column('photos', 'rating_sum')
+    op.drop_column('photos', 'rating_count')
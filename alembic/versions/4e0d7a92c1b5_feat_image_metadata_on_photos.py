@@ -0,0 +1,49 @@
+"""feat: image version, dimensions, format and size stored on photos and blobs
+
+Revision ID: 4e0d7a92c1b5
+Revises: b81f4c2d9a36
+Create Date: 2026-10-18 21:03:17.482910
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e0d7a92c1b5'
+down_revision: Union[str, None] = 'b81f4c2d9a36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('blobs', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('blobs', sa.Column('height', sa.Integer(), nullable=True))
+    op.add_column('blobs', sa.Column('format', sa.String(length=16), nullable=True))
+    op.add_column('photos', sa.Column('version', sa.BigInteger(), nullable=True))
+    op.add_column('photos', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('photos', sa.Column('height', sa.Integer(), nullable=True))
+    op.add_column('photos', sa.Column('format', sa.String(length=16), nullable=True))
+    op.add_column('photos', sa.Column('size', sa.BigInteger(), nullable=True))
+    # Photos still showing their uploaded blob; the others are filled in on their next transformation
+    op.execute(
+        """
+        UPDATE photos SET version = blobs.version, size = blobs.size
+        FROM blobs
+        WHERE photos.blob_id = blobs.id
+          AND right(photos.url, length(blobs.public_id) + 1) = '/' || blobs.public_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('photos', 'size')
+    op.drop_column('photos', 'format')
+    op.drop_column('photos', 'height')
+    op.drop_column('photos', 'width')
+    op.drop_column('photos', 'version')
+    op.drop_column('blobs', 'format')
+    op.drop_column('blobs', 'height')
+    op.drop_column('blobs', 'width')
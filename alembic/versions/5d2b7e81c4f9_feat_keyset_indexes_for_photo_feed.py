@@ -0,0 +1,31 @@
+"""feat: keyset indexes for the photo feed
+
+Revision ID: 5d2b7e81c4f9
+Revises: 9a6c3f18e2d7
+Create Date: 2026-10-19 09:12:44.305118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2b7e81c4f9'
+down_revision: Union[str, None] = '9a6c3f18e2d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # (created_at, id) also serves the lookups ix_photos_created_at was for
+    op.create_index('ix_photos_created_at_id', 'photos', ['created_at', 'id'], unique=False)
+    op.create_index('ix_photos_user_id_created_at_id', 'photos', ['user_id', 'created_at', 'id'], unique=False)
+    op.drop_index(op.f('ix_photos_created_at'), table_name='photos')
+
+
+def downgrade() -> None:
+    op.create_index(op.f('ix_photos_created_at'), 'photos', ['created_at'], unique=False)
+    op.drop_index('ix_photos_user_id_created_at_id', table_name='photos')
+    op.drop_index('ix_photos_created_at_id', table_name='photos')
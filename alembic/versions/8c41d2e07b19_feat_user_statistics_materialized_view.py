@@ -0,0 +1,59 @@
+"""feat: user_statistics materialized view
+
+Revision ID: 8c41d2e07b19
+Revises: 3f2a9c1d7e55
+Create Date: 2026-10-18 11:40:03.218874
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41d2e07b19'
+down_revision: Union[str, None] = '3f2a9c1d7e55'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Same columns as src.repository.admin_moderation.user_statistics_query
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW user_statistics AS
+        WITH photo_stats AS (
+            SELECT user_id, COUNT(id) AS num_images, AVG(avg_rating) AS rating
+            FROM photos
+            GROUP BY user_id
+        ),
+        comment_stats AS (
+            SELECT user_id, COUNT(id) AS num_comments
+            FROM comments
+            GROUP BY user_id
+        ),
+        given_stats AS (
+            SELECT user_id, AVG(rating) AS average_rating_given
+            FROM ratings
+            GROUP BY user_id
+        )
+        SELECT users.id AS user_id,
+               users.username,
+               COALESCE(photo_stats.num_images, 0) AS num_images,
+               COALESCE(comment_stats.num_comments, 0) AS num_comments,
+               photo_stats.rating,
+               given_stats.average_rating_given
+        FROM users
+        LEFT OUTER JOIN photo_stats ON photo_stats.user_id = users.id
+        LEFT OUTER JOIN comment_stats ON comment_stats.user_id = users.id
+        LEFT OUTER JOIN given_stats ON given_stats.user_id = users.id
+        """
+    )
+    # Unique index is required by REFRESH MATERIALIZED VIEW CONCURRENTLY
+    op.create_index('ix_user_statistics_user_id', 'user_statistics', ['user_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_statistics_user_id', table_name='user_statistics')
+    op.execute("DROP MATERIALIZED VIEW user_statistics")
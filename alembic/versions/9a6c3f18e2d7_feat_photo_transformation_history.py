@@ -0,0 +1,41 @@
+"""feat: photo transformation history for undo and redo
+
+Revision ID: 9a6c3f18e2d7
+Revises: 4e0d7a92c1b5
+Create Date: 2026-10-18 22:41:05.913264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a6c3f18e2d7'
+down_revision: Union[str, None] = '4e0d7a92c1b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'photo_transformations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('photo_id', sa.Integer(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('params', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['photo_id'], ['photos.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('photo_id', 'position'),
+    )
+    op.add_column(
+        'photos', sa.Column('transformation_position', sa.Integer(), server_default='0', nullable=False)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('photos', 'transformation_position')
+    op.drop_table('photo_transformations')
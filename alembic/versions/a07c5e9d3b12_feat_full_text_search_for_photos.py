@@ -0,0 +1,90 @@
+"""feat: full-text search for photos
+
+Revision ID: a07c5e9d3b12
+Revises: d5e83b6a0f24
+Create Date: 2026-10-18 15:22:48.104935
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a07c5e9d3b12'
+down_revision: Union[str, None] = 'd5e83b6a0f24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('photos', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    # Search document of a photo: its description and the names of its tags
+    op.execute(
+        """
+        CREATE FUNCTION photo_search_document(p_photo_id integer, p_description text)
+        RETURNS tsvector AS $$
+            SELECT to_tsvector('simple', coalesce(p_description, ''))
+                || to_tsvector('simple', coalesce((
+                    SELECT string_agg(tags.name, ' ')
+                    FROM photo_tags JOIN tags ON tags.id = photo_tags.tag_id
+                    WHERE photo_tags.photo_id = p_photo_id
+                ), ''))
+        $$ LANGUAGE sql STABLE
+        """
+    )
+    op.execute(
+        """
+        CREATE FUNCTION photos_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := photo_search_document(NEW.id, NEW.description);
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER photos_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF description ON photos
+        FOR EACH ROW EXECUTE FUNCTION photos_search_vector_update()
+        """
+    )
+    op.execute(
+        """
+        CREATE FUNCTION photo_tags_search_vector_update() RETURNS trigger AS $$
+        DECLARE
+            changed_photo_id integer := coalesce(NEW.photo_id, OLD.photo_id);
+        BEGIN
+            UPDATE photos
+            SET search_vector = photo_search_document(id, description)
+            WHERE id = changed_photo_id;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER photo_tags_search_vector_trigger
+        AFTER INSERT OR DELETE ON photo_tags
+        FOR EACH ROW EXECUTE FUNCTION photo_tags_search_vector_update()
+        """
+    )
+
+    op.execute("UPDATE photos SET search_vector = photo_search_document(id, description)")
+    op.create_index('ix_photos_search_vector', 'photos', ['search_vector'], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_photos_search_vector', table_name='photos', postgresql_using='gin')
+    op.execute("DROP TRIGGER photo_tags_search_vector_trigger ON photo_tags")
+    op.execute("DROP FUNCTION photo_tags_search_vector_update()")
+    op.execute("DROP TRIGGER photos_search_vector_trigger ON photos")
+    op.execute("DROP FUNCTION photos_search_vector_update()")
+    op.execute("DROP FUNCTION photo_search_document(integer, text)")
+    op.drop_column('photos', 'search_vector')
@@ -0,0 +1,46 @@
+"""feat: content-addressed blobs shared by photos with the same image
+
+Revision ID: b81f4c2d9a36
+Revises: c3b9e4f1a870
+Create Date: 2026-10-18 19:12:40.215733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81f4c2d9a36'
+down_revision: Union[str, None] = 'c3b9e4f1a870'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'blobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('public_id', sa.String(length=255), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=True),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('content_type', sa.String(length=32), nullable=True),
+        sa.Column('refcount', sa.Integer(), server_default='1', nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('sha256'),
+    )
+    op.add_column('photos', sa.Column('blob_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_photos_blob_id'), 'photos', ['blob_id'], unique=False)
+    op.create_foreign_key(
+        'photos_blob_id_fkey', 'photos', 'blobs', ['blob_id'], ['id'], ondelete='SET NULL'
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('photos_blob_id_fkey', 'photos', type_='foreignkey')
+    op.drop_index(op.f('ix_photos_blob_id'), table_name='photos')
+    op.drop_column('photos', 'blob_id')
+    op.drop_table('blobs')
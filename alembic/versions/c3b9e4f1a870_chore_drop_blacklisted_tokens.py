@@ -0,0 +1,36 @@
+"""chore: drop blacklisted_tokens, revoked tokens are kept in Redis
+
+Revision ID: c3b9e4f1a870
+Revises: a07c5e9d3b12
+Create Date: 2026-10-18 17:05:12.418206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3b9e4f1a870'
+down_revision: Union[str, None] = 'a07c5e9d3b12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_index(op.f('ix_blacklisted_tokens_id'), table_name='blacklisted_tokens')
+    op.drop_table('blacklisted_tokens')
+
+
+def downgrade() -> None:
+    op.create_table(
+        'blacklisted_tokens',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('jwt', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('jwt'),
+    )
+    op.create_index(op.f('ix_blacklisted_tokens_id'), 'blacklisted_tokens', ['id'], unique=False)
@@ -0,0 +1,66 @@
+"""feat: indexes for hot queries and unique rating per user
+
+Revision ID: d5e83b6a0f24
+Revises: 8c41d2e07b19
+Create Date: 2026-10-18 13:05:27.661029
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e83b6a0f24'
+down_revision: Union[str, None] = '8c41d2e07b19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_photos_user_id'), 'photos', ['user_id'], unique=False)
+    op.create_index(op.f('ix_photos_created_at'), 'photos', ['created_at'], unique=False)
+    op.create_index(op.f('ix_comments_photo_id'), 'comments', ['photo_id'], unique=False)
+    op.create_index(op.f('ix_comments_user_id'), 'comments', ['user_id'], unique=False)
+    op.create_index(op.f('ix_photo_tags_tag_id'), 'photo_tags', ['tag_id'], unique=False)
+    op.create_index(op.f('ix_ratings_user_id'), 'ratings', ['user_id'], unique=False)
+
+    # Drop duplicated ratings left by the old read-then-insert check
+    # (keep the first one) and recompute the photo aggregates
+    op.execute(
+        """
+        DELETE FROM ratings
+        USING ratings AS kept
+        WHERE ratings.photo_id = kept.photo_id
+          AND ratings.user_id = kept.user_id
+          AND ratings.id > kept.id
+        """
+    )
+    op.execute("UPDATE photos SET rating_count = 0, rating_sum = 0, avg_rating = NULL")
+    op.execute(
+        """
+        UPDATE photos
+        SET rating_count = agg.rating_count,
+            rating_sum = agg.rating_sum,
+            avg_rating = agg.rating_sum / agg.rating_count
+        FROM (
+            SELECT photo_id, COUNT(*) AS rating_count, SUM(rating) AS rating_sum
+            FROM ratings
+            GROUP BY photo_id
+        ) AS agg
+        WHERE photos.id = agg.photo_id
+        """
+    )
+    # The unique index also covers lookups by ratings.photo_id
+    op.create_unique_constraint('uq_ratings_photo_id_user_id', 'ratings', ['photo_id', 'user_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_ratings_photo_id_user_id', 'ratings', type_='unique')
+    op.drop_index(op.f('ix_ratings_user_id'), table_name='ratings')
+    op.drop_index(op.f('ix_photo_tags_tag_id'), table_name='photo_tags')
+    op.drop_index(op.f('ix_comments_user_id'), table_name='comments')
+    op.drop_index(op.f('ix_comments_photo_id'), table_name='comments')
+    op.drop_index(op.f('ix_photos_created_at'), table_name='photos')
+    op.drop_index(op.f('ix_photos_user_id'), table_name='photos')
@@ -0,0 +1,131 @@
+"""
+Per-request overhead of the authentication middleware: the previous
+BaseHTTPMiddleware stack vs the pure-ASGI AuthMiddleware.
+
+Both apps serve an endpoint that needs the token claims and are called
+directly through ASGI (no server, no sockets), so the difference is the
+middleware and JWT handling only. The revocation check uses the
+in-process blacklist in both cases.
+
+Usage:
+    poetry run python benchmarks/auth_middleware_overhead.py --requests 20000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from fastapi import Depends, FastAPI, Request
+from jose import jwt
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.conf.config import settings  # noqa: E402
+from src.middleware.security_middleware import AuthMiddleware  # noqa: E402
+from src.repository.token_blacklist import is_token_blacklisted  # noqa: E402
+from src.services.auth import auth_service  # noqa: E402
+
+
+class PreviousTokenBlacklistMiddleware(BaseHTTPMiddleware):
+    """The middleware as it was before AuthMiddleware."""
+
+    async def dispatch(self, request: Request, call_next):
+        authorization = request.headers.get("Authorization")
+        if authorization:
+            token_type, token = authorization.split()
+            if token_type.lower() == "bearer":
+                payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.algorithm])
+                if await is_token_blacklisted(token, payload):
+                    return JSONResponse(status_code=401, content={"detail": "Token is blacklisted."})
+        return await call_next(request)
+
+
+def previous_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/me")
+    async def me(request: Request):
+        # get_current_user decoded the token a second time
+        token = request.headers["Authorization"].split()[1]
+        return jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.algorithm])
+
+    app.add_middleware(PreviousTokenBlacklistMiddleware)
+
+    @app.middleware("http")
+    async def exception_handling(request: Request, call_next):
+        try:
+            return await call_next(request)
+        except Exception:
+            return JSONResponse(content={"message": "Something went wrong"}, status_code=500)
+
+    return app
+
+
+def current_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/me")
+    async def me(payload: dict = Depends(auth_service.get_token_payload)):
+        return payload
+
+    app.add_middleware(AuthMiddleware)
+    return app
+
+
+async def call(app, headers: list) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/me", "raw_path": b"/me",
+        "root_path": "", "query_string": b"", "headers": headers,
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app, headers: list, requests: int) -> list[float]:
+    for _ in range(200):
+        await call(app, headers)
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        status = await call(app, headers)
+        timings.append(time.perf_counter() - start)
+        assert status == 200, status
+    return timings
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    token = await auth_service.create_access_token(data={"sub": "user@mail.com"})
+    headers = [(b"authorization", f"Bearer {token}".encode())]
+
+    print(f"{'stack':<28}{'mean':>10}{'p50':>10}{'p99':>10}")
+    for name, app in (("BaseHTTPMiddleware x2", previous_app()), ("AuthMiddleware (ASGI)", current_app())):
+        timings = sorted(await measure(app, headers, args.requests))
+        mean = statistics.mean(timings) * 1e6
+        p50 = timings[len(timings) // 2] * 1e6
+        p99 = timings[int(len(timings) * 0.99)] * 1e6
+        print(f"{name:<28}{mean:>8.1f}us{p50:>8.1f}us{p99:>8.1f}us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+Throughput of the local image transformation engine.
+
+Runs the CropEnum modes on a generated photo-sized JPEG: first one mode at
+a time in-process (latency per mode), then a mixed batch through
+ImageEngine's process pool for each worker count, printing
+transformations per second overall and per worker.
+
+Usage:
+    poetry run python benchmarks/image_transform_throughput.py --size 4000x3000 --transforms 120 --workers 1 2 4
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.services.image_engine import ImageEngine, transform_image  # noqa: E402
+
+MODES = [
+    {"crop": "fill", "width": 800, "height": 800, "gravity": "center"},
+    {"crop": "fill", "width": 800, "height": 800, "gravity": "auto"},
+    {"crop": "lfill", "width": 1200, "height": 800},
+    {"crop": "fill_pad", "width": 640, "height": 480},
+    {"crop": "crop", "width": 1000, "height": 1000, "x": 500, "y": 300},
+    {"crop": "thumb", "width": 250, "height": 250},
+    {"crop": "auto", "width": 640, "aspect_ratio": "16:9"},
+    {"crop": "scale", "width": 1600},
+    {"crop": "fit", "width": 1024, "height": 1024},
+    {"crop": "lfit", "width": 2048, "height": 2048},
+    {"crop": "mfit", "width": 1024, "height": 1024},
+    {"crop": "pad", "width": 1024, "height": 1024, "background": "black"},
+    {"crop": "lpad", "width": 1024, "height": 1024},
+    {"crop": "mpad", "width": 5000, "height": 5000},
+]
+
+
+def photo(width: int, height: int) -> bytes:
+    image = Image.radial_gradient("L").resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for i in range(0, width, 37):
+        draw.line((i, 0, width - i, height), fill=(i % 255, 80, 160), width=3)
+    output = BytesIO()
+    image.save(output, "JPEG", quality=90)
+    return output.getvalue()
+
+
+def per_mode(source: bytes, repeat: int):
+    for options in MODES:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            transform_image(source, options)
+            timings.append(time.perf_counter() - started)
+        label = " ".join(f"{name}={value}" for name, value in options.items())
+        print(f"  {label:<60} {statistics.median(timings) * 1000:7.1f} ms")
+
+
+async def pooled(source: bytes, workers: int, transforms: int) -> float:
+    engine = ImageEngine(workers, max_queue=transforms)
+    try:
+        # Start the workers before timing
+        await asyncio.gather(*(engine.transform(source, MODES[0]) for _ in range(workers)))
+        started = time.perf_counter()
+        await asyncio.gather(*(engine.transform(source, MODES[i % len(MODES)]) for i in range(transforms)))
+        return time.perf_counter() - started
+    finally:
+        engine.shutdown()
+
+
+def run(args):
+    width, height = (int(side) for side in args.size.split("x"))
+    source = photo(width, height)
+    print(f"source: {width}x{height} JPEG, {len(source) / 1024:.0f} KB, {os.cpu_count()} CPUs")
+    print("single process, median per mode:")
+    per_mode(source, args.repeat)
+    print("process pool, mixed modes:")
+    for workers in args.workers:
+        elapsed = asyncio.run(pooled(source, workers, args.transforms))
+        rate = args.transforms / elapsed
+        print(f"  workers={workers:<3} {rate:7.1f} transforms/s  ({rate / workers:.1f} per worker)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", default="4000x3000")
+    parser.add_argument("--transforms", type=int, default=120)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,98 @@
+"""
+Load benchmark for ``GET /photos/get_photo/{photo_id}``.
+
+Runs N concurrent clients against a running PhotoShare instance and prints
+throughput and latency percentiles. Run it once against the build you want
+to compare (e.g. before and after a change) with the same arguments.
+
+Usage:
+    poetry run python benchmarks/load_get_photo.py \\
+        --base-url http://127.0.0.1:8000 --email user@mail.com --password secret \\
+        --photo-id 1 --clients 200 --duration 30
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> str:
+    response = await client.post(
+        "/auth/login", data={"username": email, "password": password}
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def worker(
+    client: httpx.AsyncClient,
+    url: str,
+    headers: dict,
+    deadline: float,
+    latencies: list,
+    errors: list,
+):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.get(url, headers=headers)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errors.append(e.__class__.__name__)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=args.timeout, verify=False
+    ) as client:
+        token = args.token or await login(client, args.email, args.password)
+        headers = {"Authorization": f"Bearer {token}"}
+        url = f"/photos/get_photo/{args.photo_id}"
+
+        latencies, errors = [], []
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(
+            *(
+                worker(client, url, headers, deadline, latencies, errors)
+                for _ in range(args.clients)
+            )
+        )
+        elapsed = time.perf_counter() - started
+
+    print(f"clients:      {args.clients}")
+    print(f"duration:     {elapsed:.1f}s")
+    print(f"requests:     {len(latencies)} ok, {len(errors)} failed")
+    print(f"throughput:   {len(latencies) / elapsed:.1f} req/s")
+    if latencies:
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"latency p50:  {statistics.median(latencies) * 1000:.1f} ms")
+        print(f"latency p95:  {p95 * 1000:.1f} ms")
+        print(f"latency p99:  {p99 * 1000:.1f} ms")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    parser.add_argument("--token", help="Use an existing access token instead of logging in")
+    parser.add_argument("--photo-id", type=int, default=1)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--timeout", type=float, default=30)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,96 @@
+"""
+Login throughput benchmark for ``POST /auth/login``.
+
+Runs N concurrent clients logging in against a running PhotoShare instance
+while a probe measures the latency of ``GET /``, which shows how long the
+event loop is held by password hashing. Prints logins per second, login
+latency percentiles, the number of 429 responses and the probe latency.
+
+Usage:
+    poetry run python benchmarks/login_throughput.py \\
+        --base-url http://127.0.0.1:8000 --email user@mail.com --password secret \\
+        --clients 32 --duration 30
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values: list, fraction: float) -> float:
+    return values[max(0, int(len(values) * fraction) - 1)]
+
+
+async def login_worker(client, data, deadline, latencies, rejected, errors):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.post("/auth/login", data=data)
+        except httpx.HTTPError as e:
+            errors.append(e.__class__.__name__)
+            continue
+        if response.status_code == 429:
+            rejected.append(time.perf_counter() - started)
+            await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+        elif response.status_code != 200:
+            errors.append(response.status_code)
+        else:
+            latencies.append(time.perf_counter() - started)
+
+
+async def probe(client, deadline, latencies):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        await client.get("/")
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.05)
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.clients + 1, max_keepalive_connections=args.clients + 1)
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=args.timeout, verify=False
+    ) as client:
+        data = {"username": args.email, "password": args.password}
+        latencies, rejected, errors, probe_latencies = [], [], [], []
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(
+            probe(client, deadline, probe_latencies),
+            *(
+                login_worker(client, data, deadline, latencies, rejected, errors)
+                for _ in range(args.clients)
+            ),
+        )
+        elapsed = time.perf_counter() - started
+
+    print(f"clients:        {args.clients}")
+    print(f"duration:       {elapsed:.1f}s")
+    print(f"logins:         {len(latencies)} ok, {len(rejected)} rejected (429), {len(errors)} failed")
+    print(f"throughput:     {len(latencies) / elapsed:.1f} logins/s")
+    if latencies:
+        latencies.sort()
+        print(f"login p50:      {statistics.median(latencies) * 1000:.1f} ms")
+        print(f"login p99:      {percentile(latencies, 0.99) * 1000:.1f} ms")
+    if probe_latencies:
+        probe_latencies.sort()
+        print(f"GET / p50:      {statistics.median(probe_latencies) * 1000:.1f} ms")
+        print(f"GET / p99:      {percentile(probe_latencies, 0.99) * 1000:.1f} ms")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--timeout", type=float, default=60)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,120 @@
+"""
+Memory and latency of concurrent photo uploads: streamed vs spooled.
+
+Sends N concurrent multipart uploads of SIZE MB through an in-process ASGI
+app whose Cloudinary client talks to the in-memory fake API. The
+``streaming`` mode uses the upload pipeline of the photo routes
+(``receive_upload``); the ``spooled`` mode is the previous route code,
+Starlette's ``UploadFile`` passed to ``cloudinary_client.upload``. Each mode
+runs in its own process and reports peak RSS (VmHWM), the RSS growth over
+the idle process and upload latency percentiles.
+
+Usage:
+    poetry run python benchmarks/upload_streaming.py --uploads 50 --size-mb 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI, File, Request, UploadFile
+
+os.environ.setdefault("CLOUDINARY_FAKE", "true")
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.services.cloudinary_client import cloudinary_client  # noqa: E402
+from src.services.upload import receive_upload  # noqa: E402
+
+CHUNK = 64 * 1024
+BOUNDARY = "benchmarkboundary"
+
+
+def memory_kb(field: str) -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field):
+                return int(line.split()[1])
+    return 0
+
+
+def create_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/streaming")
+    async def streaming(request: Request):
+        upload = await receive_upload(
+            request, int(request.headers["x-user"]), lambda filename: f"PhotoShare/{request.headers['x-user']}",
+            max_bytes=1024 ** 3,
+        )
+        return {"bytes": upload.size}
+
+    @app.post("/spooled")
+    async def spooled(request: Request, file: UploadFile = File()):
+        result = await cloudinary_client.upload(file.file, public_id=f"PhotoShare/{request.headers['x-user']}")
+        return {"bytes": result["bytes"]}
+
+    return app
+
+
+async def body(size: int):
+    chunk = b"\xff\xd8\xff\xe0" + bytes(CHUNK - 4)
+    yield f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="a.jpg"\r\n\r\n'.encode()
+    for offset in range(0, size, CHUNK):
+        # Let the other uploads run, as reads from a socket would
+        await asyncio.sleep(0)
+        yield chunk[:min(CHUNK, size - offset)]
+    yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+async def upload(client, mode, user, size, latencies):
+    started = time.perf_counter()
+    response = await client.post(
+        f"/{mode}", content=body(size),
+        headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}", "x-user": str(user)},
+    )
+    response.raise_for_status()
+    assert response.json()["bytes"] == size
+    latencies.append(time.perf_counter() - started)
+
+
+async def run_mode(args):
+    size = args.size_mb * 1024 * 1024
+    app = create_app()
+    baseline = memory_kb("VmRSS")
+    latencies = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(upload(client, args.mode, user, size, latencies) for user in range(args.uploads)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    peak = memory_kb("VmHWM")
+    print(f"{args.mode}:")
+    print(f"  uploads:      {args.uploads} x {args.size_mb} MB in {elapsed:.1f}s")
+    print(f"  peak RSS:     {peak / 1024:.0f} MB (+{(peak - baseline) / 1024:.0f} MB over idle)")
+    print(f"  latency p50:  {statistics.median(latencies) * 1000:.0f} ms")
+    print(f"  latency max:  {latencies[-1] * 1000:.0f} ms")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uploads", type=int, default=50)
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--mode", choices=["streaming", "spooled"], help="run one mode in this process")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.mode:
+        asyncio.run(run_mode(args))
+    else:
+        for mode in ("spooled", "streaming"):
+            subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--uploads", str(args.uploads), "--size-mb", str(args.size_mb)],
+                check=True,
+            )
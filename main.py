@@ -1,7 +1,8 @@
+import asyncio
 import os
 import redis.asyncio as aioredis
 import uvicorn
-from fastapi import FastAPI, Request, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi_limiter import FastAPILimiter
@@ -20,15 +21,28 @@ from src.routes import (
     tags,
     comments,
     users,
-    photo_transformation
+    photo_transformation,
+    storage as storage_routes,
+    metrics,
 )
 
-from src.middleware.security_middleware import TokenBlacklistMiddleware
+from sqlalchemy.exc import IntegrityError
+
+from src.middleware.security_middleware import AuthMiddleware
+from src.middleware.query_stats_middleware import QueryStatsMiddleware
+from src.middleware.metrics_middleware import MetricsMiddleware
 from src.middleware.exception_handlers import (
     http_exception_handler,
-    exception_handling_middleware,
+    integrity_error_handler,
+    unhandled_exception_handler,
 )
 from src.conf.config import settings
+from src.services.user_statistics import refresh_user_statistics_periodically
+from src.services.metrics import monitor_event_loop_lag
+from src.repository.token_blacklist import token_blacklist
+from src.services.user_cache import user_cache
+from src.services.password_hasher import password_hasher
+from src.services.storage import image_engine, storage
 
 
 @asynccontextmanager
@@ -44,11 +58,33 @@ async def lifespan(app: FastAPI):
         print("Connected to Redis successfully!")
         await FastAPILimiter.init(redis)
         print("FastAPILimiter initialized successfully!")
+        await token_blacklist.start(redis)
+        await user_cache.start(redis)
     except Exception as e:
         print(f"Failed to connect to Redis: {e}")
 
+    await storage.load_derivatives()
+
+    statistics_refresher = None
+    if settings.user_statistics_from_view:
+        statistics_refresher = asyncio.create_task(
+            refresh_user_statistics_periodically(settings.user_statistics_refresh_seconds)
+        )
+
+    loop_lag_monitor = asyncio.create_task(
+        monitor_event_loop_lag(settings.metrics_loop_lag_interval)
+    )
+
     yield
 
+    loop_lag_monitor.cancel()
+    if statistics_refresher:
+        statistics_refresher.cancel()
+    await token_blacklist.stop()
+    await user_cache.stop()
+    password_hasher.shutdown()
+    image_engine.shutdown()
+    await storage.aclose()
     await redis.close()
     print("Application is shutting down")
 
@@ -69,7 +105,7 @@ app = FastAPI(
     title="PhotoShare RestAPI",
     description=description,
     version="1.0.0",
-#    lifespan=lifespan,
+    lifespan=lifespan,
 #    dependencies=[Depends(RateLimiter(times=2, seconds=5))],
     docs_url="/docs",
     redoc_url=None,
@@ -86,8 +122,12 @@ app.include_router(search.router)
 # app.include_router(average_rating.router)
 app.include_router(comments.router)
 app.include_router(users.router)
+app.include_router(storage_routes.router)
+app.include_router(metrics.router)
 
-app.add_middleware(TokenBlacklistMiddleware)
+app.add_middleware(AuthMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 # origins = [
@@ -108,14 +148,10 @@ def read_root():
     return {"message": "PhotoShare"}
 
 
-# Register the exception handler
+# Register the exception handlers
 app.add_exception_handler(StarletteHTTPException, http_exception_handler)
-
-
-# Register the middleware
-@app.middleware("http")
-async def exception_handling_middleware_app(request: Request, call_next):
-    return await exception_handling_middleware(request, call_next)
+app.add_exception_handler(IntegrityError, integrity_error_handler)
+app.add_exception_handler(Exception, unhandled_exception_handler)
 
 
 if __name__ == "__main__":
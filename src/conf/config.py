@@ -23,6 +23,63 @@ class Settings(BaseSettings):
     mail_from: str
     mail_port: int
     mail_server: str
+    # /admin/statistics: serve from the user_statistics materialized view
+    user_statistics_from_view: bool = False
+    user_statistics_refresh_seconds: int = 300
+    # Bloom filter in front of the Redis token blacklist
+    token_blacklist_capacity: int = 100000
+    token_blacklist_error_rate: float = 0.001
+    # Authenticated users cached per token for a few seconds
+    user_cache_size: int = 10000
+    user_cache_ttl: int = 30
+    # Password hashing: argon2 cost and the size of the hashing pool
+    argon2_time_cost: int = 4
+    argon2_memory_cost: int = 131072
+    argon2_parallelism: int = 4
+    password_hash_workers: int = 2
+    password_hash_queue: int = 32
+    # Cloudinary HTTP client; cloudinary_fake serves the API and delivery URLs from memory (offline runs)
+    cloudinary_timeout: float = 30
+    cloudinary_connect_timeout: float = 5
+    cloudinary_max_retries: int = 3
+    cloudinary_max_concurrency: int = 16
+    # Seconds Admin API image details are cached
+    cloudinary_resource_ttl: float = 300
+    cloudinary_fake: bool = False
+    cloudinary_fake_latency: float = 0
+    # Photo storage: "cloudinary", or "local" files under storage_local_root served by
+    # GET /storage/files (storage_local_accel_redirect: internal nginx location for sendfile)
+    storage_backend: str = "cloudinary"
+    storage_local_root: str = "media"
+    storage_local_base_url: str = ""
+    storage_local_accel_redirect: str = ""
+    # Image transformations: "auto" renders them where the images are stored (Cloudinary URLs,
+    # local engine for local storage), "local" always uses the local engine
+    image_engine: str = "auto"
+    image_workers: int = 0
+    image_queue: int = 64
+    # Locally rendered transformations kept in storage, least recently used evicted beyond either limit
+    derivative_cache_entries: int = 10000
+    derivative_cache_bytes: int = 1024 * 1024 * 1024
+    # POST /photo_effects/transform_batch: photos per request, transformations computed at once
+    transformation_batch_max_photos: int = 100
+    transformation_batch_concurrency: int = 8
+    # QR codes of photos: images kept in memory, and in storage (QRCodes/) for other workers
+    qr_cache_entries: int = 1000
+    qr_cache_storage: bool = True
+    # Streamed photo uploads: size cap and uploads in progress per user
+    upload_max_bytes: int = 20 * 1024 * 1024
+    upload_max_concurrent_per_user: int = 2
+
+    # SQL statements per request: X-DB-* response headers (debug), and statements of
+    # slow_query_ms or more kept (last slow_query_log_size) for /admin/debug/slow_queries
+    query_stats_headers: bool = False
+    slow_query_ms: float = 100
+    slow_query_log_size: int = 200
+    # /metrics: seconds between two probes of the event loop lag; served to admins, and to
+    # scrapers sending metrics_token as their HTTP Basic password when it is set
+    metrics_loop_lag_interval: float = 0.5
+    metrics_token: str = ""
 
     class Config:
         env_file = ".env"
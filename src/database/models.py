@@ -5,14 +5,18 @@ from sqlalchemy import (
     Enum,
     func,
     Boolean,
+    BigInteger,
     ForeignKey,
     Text,
     Float,
+    Index,
     Table,
+    UniqueConstraint,
 )
 from sqlalchemy.sql.sqltypes import DateTime
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 
 
 Base = declarative_base()
@@ -22,7 +26,7 @@ photo_tags = Table(
     "photo_tags",
     Base.metadata,
     Column("photo_id", Integer, ForeignKey("photos.id"), primary_key=True),
-    Column("tag_id", Integer, ForeignKey("tags.id"), primary_key=True),
+    Column("tag_id", Integer, ForeignKey("tags.id"), primary_key=True, index=True),
 )
 
 
@@ -52,13 +56,54 @@ class User(Base):
     ratings = relationship("Rating", back_populates="user")
 
 
+class Blob(Base):
+    """A stored image file, shared by all photos with the same content (SHA-256)."""
+    __tablename__ = "blobs"
+    id = Column(Integer, primary_key=True)
+    sha256 = Column(String(64), nullable=False, unique=True)
+    public_id = Column(String(255), nullable=False)
+    version = Column(BigInteger, nullable=True)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String(32), nullable=True)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    format = Column(String(16), nullable=True)
+    # Photos referencing this blob; the file is removed from storage when it drops to 0
+    refcount = Column(Integer, nullable=False, default=1, server_default="1")
+    created_at = Column(DateTime, nullable=False, default=func.now())
+
+
 class Photo(Base):
     __tablename__ = "photos"
+    __table_args__ = (
+        Index("ix_photos_search_vector", "search_vector", postgresql_using="gin"),
+        # Keyset pagination of the feed, newest first (scanned backward)
+        Index("ix_photos_created_at_id", "created_at", "id"),
+        Index("ix_photos_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     url = Column(String(255), nullable=False)
     transformed_url = Column(String(255), nullable=True)
     description = Column(Text, nullable=True)
+    # Stored file; NULL for photos uploaded before content-addressed storage
+    blob_id = Column(Integer, ForeignKey("blobs.id", ondelete="SET NULL"), nullable=True, index=True)
+    # The image at url as stored (version, pixels, format, bytes), so transformations
+    # need no storage lookup; NULL until known for older photos
+    version = Column(BigInteger, nullable=True)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    format = Column(String(16), nullable=True)
+    size = Column(BigInteger, nullable=True)
+    # Position in the transformation history shown at transformed_url; 0 is the photo itself
+    transformation_position = Column(Integer, nullable=False, default=0, server_default="0")
+    # Rating aggregates, maintained by src.services.rating on every rating write
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Float, nullable=False, default=0, server_default="0")
+    avg_rating = Column(Float, nullable=True, index=True)
+    # Full-text document (description + tag names), filled by database triggers,
+    # deferred so regular photo queries don't fetch it
+    search_vector = deferred(Column(TSVECTOR, nullable=True))
     created_at = Column(DateTime, nullable=False, default=func.now())
     updated_at = Column(
         DateTime, nullable=False, default=func.now(), onupdate=func.now()
@@ -70,6 +115,22 @@ class Photo(Base):
     tags = relationship("Tag", secondary=photo_tags, back_populates="photos")
 
 
+class PhotoTransformation(Base):
+    """
+    One step of a photo's transformation history (undo/redo), numbered from 1.
+
+    Steps hold the transformation options only; their URL is built again from
+    the photo's image, so the history survives cache eviction.
+    """
+    __tablename__ = "photo_transformations"
+    __table_args__ = (UniqueConstraint("photo_id", "position"),)
+    id = Column(Integer, primary_key=True)
+    photo_id = Column(Integer, ForeignKey("photos.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)
+    params = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=func.now())
+
+
 class Tag(Base):
     __tablename__ = "tags"
     id = Column(Integer, primary_key=True, index=True)
@@ -82,8 +143,8 @@ class Tag(Base):
 class Comment(Base):
     __tablename__ = "comments"
     id = Column(Integer, primary_key=True, index=True)
-    photo_id = Column(Integer, ForeignKey("photos.id"), nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    photo_id = Column(Integer, ForeignKey("photos.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     text = Column(Text, nullable=False)
     created_at = Column(DateTime, nullable=False, default=func.now())
     updated_at = Column(
@@ -96,21 +157,15 @@ class Comment(Base):
 
 class Rating(Base):
     __tablename__ = "ratings"
+    # one rating per user and photo, also serves lookups by photo_id
+    __table_args__ = (
+        UniqueConstraint("photo_id", "user_id", name="uq_ratings_photo_id_user_id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     photo_id = Column(Integer, ForeignKey("photos.id"), nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     rating = Column(Float, nullable=False)
     created_at = Column(DateTime, nullable=False, default=func.now())
 
     user = relationship("User", back_populates="ratings")
     photo = relationship("Photo", back_populates="ratings")
-
-
-class BlacklistedToken(Base):
-    __tablename__ = "blacklisted_tokens"
-    id = Column(Integer, primary_key=True, index=True)
-    jwt = Column(String(255), nullable=False, unique=True)
-    created_at = Column(DateTime, nullable=False, default=func.now())
-    updated_at = Column(
-        DateTime, nullable=False, default=func.now(), onupdate=func.now()
-    )
@@ -0,0 +1,61 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.middleware.query_stats_middleware import route_name
+from src.services.metrics import HTTP_IN_PROGRESS, HTTP_REQUEST_SECONDS
+
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+
+class MetricsMiddleware:
+    """
+    Counts and times HTTP requests for the ``/metrics`` endpoint.
+
+    Pure ASGI, like ``AuthMiddleware``: the response is passed through, only
+    its status is read. Requests are labelled by method, route template
+    (``/photos/get_photo/{photo_id}``, ``unmatched`` for 404s) and status,
+    never by raw path, so the number of series stays bounded.
+
+    The hot path stays at one histogram observation: the labelled children
+    are looked up once per label set and kept, and requests in progress are
+    a plain count per method that the gauge reads when scraped.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.in_progress: dict[str, int] = {}
+        self._seconds = {}
+
+    def _track(self, method: str) -> None:
+        self.in_progress[method] = 0
+        HTTP_IN_PROGRESS.labels(method).set_function(lambda: self.in_progress[method])
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"] if scope["method"] in METHODS else "other"
+        if method not in self.in_progress:
+            self._track(method)
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.in_progress[method] += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - started
+            self.in_progress[method] -= 1
+            key = (method, route_name(scope), status)
+            histogram = self._seconds.get(key)
+            if histogram is None:
+                histogram = self._seconds[key] = HTTP_REQUEST_SECONDS.labels(key[0], key[1], str(status))
+            histogram.observe(seconds)
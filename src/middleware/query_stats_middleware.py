@@ -0,0 +1,68 @@
+import json
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.conf.config import settings
+from src.services.query_stats import (
+    DB_REQUEST_SECONDS,
+    DB_REQUEST_STATEMENTS,
+    QueryStats,
+    current_path,
+    current_stats,
+)
+
+
+def route_name(scope: Scope) -> str:
+    """Path template of the route that handled a request (``/photos/get_photo/{photo_id}``)."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class QueryStatsMiddleware:
+    """
+    Counts and times the SQL statements run by each request.
+
+    Pure ASGI, like ``AuthMiddleware``. The statements are recorded by the
+    engine hooks of ``src.services.query_stats`` into the ``QueryStats`` of
+    the request; when it completes, its count and time are observed in the
+    per-route Prometheus histograms. With ``query_stats_headers`` (debug) they
+    are also sent back as ``X-DB-Statements``, ``X-DB-Time-Ms`` and
+    ``X-DB-Slowest`` headers, the last one holding the slowest statements
+    (normalized SQL) as JSON.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.headers = settings.query_stats_headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        stats_token = current_stats.set(stats)
+        path_token = current_path.set(scope["path"])
+
+        async def send_with_stats(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *self.response_headers(stats)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats if self.headers else send)
+        finally:
+            current_stats.reset(stats_token)
+            current_path.reset(path_token)
+            route = route_name(scope)
+            DB_REQUEST_STATEMENTS.labels(route).observe(stats.count)
+            DB_REQUEST_SECONDS.labels(route).observe(stats.seconds)
+
+    @staticmethod
+    def response_headers(stats: QueryStats) -> list[tuple[bytes, bytes]]:
+        slowest = json.dumps(stats.slowest_statements(), separators=(",", ":"), ensure_ascii=True)
+        return [
+            (b"x-db-statements", str(stats.count).encode()),
+            (b"x-db-time-ms", f"{stats.seconds * 1000:.3f}".encode()),
+            (b"x-db-slowest", slowest.encode()),
+        ]
@@ -1,47 +1,61 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import JSONResponse
-from fastapi import HTTPException, status, Depends
+from fastapi import status
 from jose import JWTError, jwt
-from src.database.models import BlacklistedToken
-from src.database.db import get_db
+from jose.exceptions import ExpiredSignatureError
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
 from src.conf.config import settings
-from sqlalchemy.orm import Session
+from src.repository.token_blacklist import is_token_blacklisted
+
+
+class AuthMiddleware:
+    """
+    Decodes the bearer token once per request and rejects revoked tokens.
 
-class TokenBlacklistMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
+    Pure ASGI: the response is not wrapped. The token and its claims are put
+    on ``request.state`` (``token``, ``token_payload``) for
+    ``Auth.get_token_payload`` and ``Auth.get_current_user``.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
         self.jwt_secret_key = settings.jwt_secret_key
         self.algorithm = settings.algorithm
 
-    async def dispatch(self, request: Request, call_next):
-        authorization: str = request.headers.get("Authorization")
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
+        authorization = Headers(scope=scope).get("authorization")
         if authorization:
-            token_type, token = authorization.split()
+            token_type, _, token = authorization.partition(" ")
 
             if token_type.lower() == "bearer":
                 try:
                     payload = jwt.decode(
                         token, self.jwt_secret_key, algorithms=[self.algorithm]
                     )
-                    token_id = payload.get("jti")
-                    print(token_id)
+                except ExpiredSignatureError:
+                    return await self.reject("Token has expired", scope, receive, send)
+                except JWTError:
+                    return await self.reject("Invalid token.", scope, receive, send)
 
-                    db: Session = next(get_db())
+                if await is_token_blacklisted(token, payload):
+                    return await self.reject(
+                        "Token is blacklisted. Please log in again.", scope, receive, send
+                    )
 
-                    blacklisted_token = db.query(BlacklistedToken).filter_by(jwt=token).first()
+                state = scope.setdefault("state", {})
+                state["token"] = token
+                state["token_payload"] = payload
 
-                    if blacklisted_token:
-                        return JSONResponse(
-                            status_code=status.HTTP_401_UNAUTHORIZED,
-                            content={"detail": "Token is blacklisted. Please log in again."},
-                        )
-                except JWTError:
-                    return JSONResponse(
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                        content={"detail": "Invalid token."},
-                    )
+        await self.app(scope, receive, send)
 
-        response = await call_next(request)
-        return response
+    @staticmethod
+    async def reject(detail: str, scope: Scope, receive: Receive, send: Send) -> None:
+        response = JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": detail}
+        )
+        await response(scope, receive, send)
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from datetime import datetime
+from pydantic import BaseModel, Field, model_validator
 from typing import Optional
 from enum import Enum
 from cloudinary import CloudinaryImage
@@ -41,6 +42,11 @@ class GravityEnum(str, Enum):
     option16 = "faces"
 
 
+class QRCodeFormatEnum(str, Enum):
+    png = "png"
+    svg = "svg"
+
+
 class PhotoEffectResponse(BaseModel):
     id: int
     description: Optional[str] | None
@@ -50,3 +56,59 @@ class PhotoEffectResponse(BaseModel):
     class Config:
         from_attributes = True
 
+
+
+class TransformationModel(BaseModel):
+    """Transformation options, applied by Cloudinary or the local image engine."""
+    crop: CropEnum
+    width: Optional[int] = Field(default=None, gt=0)
+    height: Optional[int] = Field(default=None, gt=0)
+    aspect_ratio: Optional[str] = Field(default=None, max_length=16)
+    gravity: Optional[GravityEnum] = None
+    x: Optional[int] = Field(default=None, ge=0)
+    y: Optional[int] = Field(default=None, ge=0)
+
+    @model_validator(mode="after")
+    def check_gravity(self):
+        if self.gravity not in (None, GravityEnum.option10) and self.crop not in (CropEnum.option1, CropEnum.option4):
+            raise ValueError("Gravity can only be used with 'fill' or 'crop' options.")
+        return self
+
+    def params(self) -> dict:
+        """Options set, with plain string values (stored in the transformation history)."""
+        return self.model_dump(mode="json", exclude_none=True)
+
+
+class BatchTransformationModel(BaseModel):
+    """The same transformation applied to several photos."""
+    photo_ids: list[int] = Field(min_length=1)
+    transformation: TransformationModel
+
+
+class BatchTransformationItem(BaseModel):
+    photo_id: int
+    status_code: int
+    transformed_url: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class BatchTransformationResponse(BaseModel):
+    applied: int
+    items: list[BatchTransformationItem]
+
+
+class TransformationStepResponse(BaseModel):
+    position: int
+    params: dict
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class TransformationHistoryResponse(BaseModel):
+    photo_id: int
+    position: int
+    url: Optional[str] | None
+    transformed_url: Optional[str] | None
+    transformations: list[TransformationStepResponse]
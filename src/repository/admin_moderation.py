@@ -1,113 +1,223 @@
-from src.database.models import User, Photo, Comment
-from src.schemas import UserStatistics
-from sqlalchemy.orm import Session
-
-from typing import List, Type
-from sqlalchemy import and_
-from sqlalchemy.orm import Session
-from src.database.models import Photo, User, Tag
-from src.schemas import PhotoModel, PhotoResponse, TagModel, TagsPhoto
-from datetime import date, timedelta
+from typing import List, Optional, Type
 
 from fastapi import UploadFile
+from sqlalchemy import column, func, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from src.database.models import Blob, Comment, Photo, Rating, Tag, User
+from src.schemas import TagsPhoto, UserStatistics
 
-from src.services.average_rating import get_average_rating_user_gives, get_user_rating
+from src.conf.config import settings
+from src.repository.blobs import image_metadata, release_blob, remove_unreferenced
+from src.repository.photo_transformation import clear_transformations, release_images
 
 
-async def create_photo(user_id:int, text: str, url: str, db: Session) -> Photo:
+async def create_photo(user_id:int, text: str, url: str, db: AsyncSession, blob: Blob | None = None) -> Photo:
 
     photo = Photo(
         user_id=user_id,
         url=url,
-        description=text
+        description=text,
+        blob_id=blob.id if blob else None,
+        **image_metadata(blob)
     )
     db.add(photo)
-    db.commit()
-    db.refresh(photo)
+    await db.commit()
+    await db.refresh(photo, ["id", "tags"])
     return photo
 
 
-async def read_photo(photo_id: int, db: Session) -> Type[Photo] | None:
-    return db.query(Photo).filter(Photo.id == photo_id).first()
+async def read_photo(photo_id: int, db: AsyncSession) -> Type[Photo] | None:
+    result = await db.execute(
+        select(Photo).options(selectinload(Photo.tags)).filter(Photo.id == photo_id)
+    )
+    return result.scalar_one_or_none()
 
 
-async def update_photo(photo_id: int, url: UploadFile, description: str, db: Session) -> Photo | None:
+async def update_photo(photo_id: int, url: UploadFile, description: str, db: AsyncSession,
+                       blob: Blob | None = None) -> Photo | None:
 
-    photo = db.query(Photo).filter(Photo.id == photo_id).first()
+    photo = await read_photo(photo_id, db)
     if photo:
+        unreferenced = await release_blob(photo.blob_id, db)
+        old_blob_id, shown = photo.blob_id, [photo.url, photo.transformed_url]
         photo.url = url
         photo.description = description
-        db.commit()
+        photo.blob_id = blob.id if blob else None
+        for field, value in image_metadata(blob).items():
+            setattr(photo, field, value)
+        photo.transformed_url = url
+        await clear_transformations(photo, db)
+        await db.commit()
+        await release_images(photo.id, old_blob_id, shown, db)
+        await remove_unreferenced(unreferenced)
     return photo
 
 
-async def delete_photo(photo_id: int, db: Session) -> Photo | None:
+async def delete_photo(photo_id: int, db: AsyncSession) -> Photo | None:
 
-    photo = db.query(Photo).filter(Photo.id == photo_id).first()
+    photo = await read_photo(photo_id, db)
     if photo:
-        db.delete(photo)
-        db.commit()
+        unreferenced = await release_blob(photo.blob_id, db)
+        await db.delete(photo)
+        await db.commit()
+        await release_images(photo.id, photo.blob_id, [photo.url, photo.transformed_url], db)
+        await remove_unreferenced(unreferenced)
     return photo
 
 
-async def change_description(photo_id: int, description: str, db: Session) -> Photo | None:
+async def change_description(photo_id: int, description: str, db: AsyncSession) -> Photo | None:
 
-    photo = db.query(Photo).filter(Photo.id == photo_id).first()
+    photo = await read_photo(photo_id, db)
     if photo:
         photo.description = description
-        db.commit()
+        await db.commit()
     return photo
 
 
-async def add_tags(photo_id: int, body: TagsPhoto, db: Session) -> Photo | None:
-    photo = db.query(Photo).filter(Photo.id == photo_id).first()
-    photo_tags = photo.tags
+async def add_tags(photo_id: int, body: TagsPhoto, db: AsyncSession) -> Photo | None:
+    photo = await read_photo(photo_id, db)
+    if photo is None:
+        return None
 
     for tag in body.tags:
-        if len(photo_tags) < 5:
-            photo.add_tag(photo_id, tag, db)
+        if len(photo.tags) < 5:
+            await add_tag(photo_id, tag, db)
         else:
 
             break
 
-    photo = db.query(Photo).filter(Photo.id == photo_id).first()
+    return photo
 
-    if photo:
-        photo.tags = body.tags
-        db.commit()
+
+async def add_tag(photo_id: int, tag: str, db: AsyncSession) -> Photo | None:
+    photo = await read_photo(photo_id, db)
+    if photo is None:
+        return None
+
+    if tag not in [tag_obj.name for tag_obj in photo.tags]:
+        result = await db.execute(select(Tag).filter(Tag.name == tag))
+        photo.tags.append(result.scalars().first() or Tag(name=tag))
+        await db.commit()
     return photo
 
 
-async def add_tag(photo_id: int, tag: str, db: Session) -> Photo | None:
-    pass
+async def search_photos(tag: str, db: AsyncSession) -> list[Photo]:
+    result = await db.execute(
+        select(Photo).options(selectinload(Photo.tags)).join(Photo.tags).filter(Tag.name == tag)
+    )
+    return list(result.scalars().all())
 
+# Materialized view created by migration 8c41d2e07b19, same columns as user_statistics_query
+user_statistics_view = table(
+    "user_statistics",
+    column("user_id"),
+    column("username"),
+    column("num_images"),
+    column("num_comments"),
+    column("rating"),
+    column("average_rating_given"),
+)
 
-async def search_photos(tag: str, db: Session) -> list[Photo]:
-    photos = db.query(Photo).filter(tag in Photo.tags).all()
-    return list(photos)
 
-async def get_user_statistics(db: Session):
+def user_statistics_query(limit: int, after_id: Optional[int] = None):
     """
-    Retrieve statistics for all users in the system.
+    Build a single statement computing statistics for one page of users.
+
+    Every aggregate is a grouped CTE restricted to the users of the page and
+    joined on user id, so the cost does not grow with the number of queries
+    per user.
+    """
+    page_users = select(User.id, User.username)
+    if after_id is not None:
+        page_users = page_users.filter(User.id > after_id)
+    page_users = page_users.order_by(User.id).limit(limit).cte("page_users")
+    page_user_ids = select(page_users.c.id)
+
+    photo_stats = (
+        select(
+            Photo.user_id,
+            func.count(Photo.id).label("num_images"),
+            # average of the per-photo averages, unrated photos are skipped
+            func.avg(Photo.avg_rating).label("rating"),
+        )
+        .filter(Photo.user_id.in_(page_user_ids))
+        .group_by(Photo.user_id)
+        .cte("photo_stats")
+    )
+    comment_stats = (
+        select(Comment.user_id, func.count(Comment.id).label("num_comments"))
+        .filter(Comment.user_id.in_(page_user_ids))
+        .group_by(Comment.user_id)
+        .cte("comment_stats")
+    )
+    given_stats = (
+        select(Rating.user_id, func.avg(Rating.rating).label("average_rating_given"))
+        .filter(Rating.user_id.in_(page_user_ids))
+        .group_by(Rating.user_id)
+        .cte("given_stats")
+    )
+
+    return (
+        select(
+            page_users.c.id.label("user_id"),
+            page_users.c.username,
+            func.coalesce(photo_stats.c.num_images, 0).label("num_images"),
+            func.coalesce(comment_stats.c.num_comments, 0).label("num_comments"),
+            photo_stats.c.rating,
+            given_stats.c.average_rating_given,
+        )
+        .outerjoin(photo_stats, photo_stats.c.user_id == page_users.c.id)
+        .outerjoin(comment_stats, comment_stats.c.user_id == page_users.c.id)
+        .outerjoin(given_stats, given_stats.c.user_id == page_users.c.id)
+        .order_by(page_users.c.id)
+    )
+
+
+def user_statistics_view_query(limit: int, after_id: Optional[int] = None):
+    query = select(user_statistics_view)
+    if after_id is not None:
+        query = query.filter(user_statistics_view.c.user_id > after_id)
+    return query.order_by(user_statistics_view.c.user_id).limit(limit)
+
+
+async def get_user_statistics(
+    db: AsyncSession, limit: int = 50, after_id: Optional[int] = None
+) -> List[UserStatistics]:
+    """
+    Retrieve statistics for one page of users, ordered by user id.
 
     Args:
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
+    - **limit** (int): Page size.
+    - **after_id** (int, optional): Id of the last user of the previous page.
 
     Returns:
     - **List[UserStatistics]**: A list of user statistics.
     """
-    statistics = []
-    users = db.query(User).all()
-
-    for user in users:
-        user_stats = UserStatistics(
-            user_id=user.id,
-            username=user.username,
-            num_images=db.query(Photo).filter(Photo.user_id == user.id).count(),
-            num_comments=db.query(Comment).filter(Comment.user_id == user.id).count(),
-            rating = await get_user_rating(db, user.id),
-            average_rating_given=await get_average_rating_user_gives(db, user.id),
+    if settings.user_statistics_from_view:
+        query = user_statistics_view_query(limit, after_id)
+    else:
+        query = user_statistics_query(limit, after_id)
+
+    result = await db.execute(query)
+
+    return [
+        UserStatistics(
+            user_id=row.user_id,
+            username=row.username,
+            num_images=row.num_images,
+            num_comments=row.num_comments,
+            rating=round(row.rating or 0, 2),
+            average_rating_given=round(row.average_rating_given or 0, 2),
         )
-        statistics.append(user_stats)
+        for row in result
+    ]
+
 
-    return statistics
\ No newline at end of file
+async def refresh_user_statistics_view(db: AsyncSession) -> None:
+    # CONCURRENTLY keeps the view readable during the refresh
+    # (relies on the unique index on user_statistics.user_id)
+    await db.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY user_statistics"))
+    await db.commit()
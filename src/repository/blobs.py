@@ -0,0 +1,102 @@
+from contextlib import asynccontextmanager
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import Blob
+from src.services.storage import storage
+from src.services.upload import Upload
+from src.settings import logger
+
+
+async def acquire_blob(upload: Upload, db: AsyncSession) -> Blob:
+    """
+    Reference the blob holding the content of an upload, creating it for new content.
+
+    When the same image is already stored, its reference count is raised
+    and the file just uploaded is removed from storage again. The reference
+    is committed with the photo that uses it.
+    """
+    statement = (
+        insert(Blob)
+        .values(
+            sha256=upload.sha256,
+            public_id=upload.public_id,
+            version=upload.result.get("version"),
+            size=upload.size,
+            content_type=upload.content_type,
+            width=upload.width,
+            height=upload.height,
+            format=upload.format,
+            refcount=1,
+        )
+        .on_conflict_do_update(index_elements=[Blob.sha256], set_={"refcount": Blob.refcount + 1})
+        .returning(Blob)
+    )
+    blob = await db.scalar(statement, execution_options={"populate_existing": True})
+    if blob.public_id != upload.public_id:
+        logger.info(f"Upload {upload.public_id} is a duplicate of {blob.public_id}")
+        await storage.delete(upload.public_id)
+    return blob
+
+
+@asynccontextmanager
+async def discard_on_error(upload: Upload, db: AsyncSession):
+    """
+    Remove the stored file of an upload when saving its photo fails.
+
+    The transaction is rolled back first; the file is kept when a committed
+    blob holds it (the error came after the commit), and a duplicate was
+    removed by ``acquire_blob`` already.
+    """
+    try:
+        yield
+    except BaseException:
+        await db.rollback()
+        if await db.scalar(select(Blob.id).where(Blob.public_id == upload.public_id)) is None:
+            result = await storage.delete(upload.public_id)
+            logger.info(f"Upload {upload.public_id} of a photo not saved removed: {result['result']}")
+        raise
+
+
+def image_metadata(blob: Blob | None) -> dict:
+    """Photo columns describing the stored image of a blob."""
+    if blob is None:
+        return {}
+    return {
+        "version": blob.version,
+        "width": blob.width,
+        "height": blob.height,
+        "format": blob.format,
+        "size": blob.size,
+    }
+
+
+async def release_blob(blob_id: int | None, db: AsyncSession) -> str | None:
+    """
+    Drop one reference to a blob, deleting the row with the last one.
+
+    :return: Public id to remove from storage once the transaction is committed,
+        None while other photos still use the file.
+    """
+    if blob_id is None:
+        return None
+    refcount = await db.scalar(
+        update(Blob).where(Blob.id == blob_id).values(refcount=Blob.refcount - 1).returning(Blob.refcount),
+        execution_options={"synchronize_session": False},
+    )
+    if refcount:
+        return None
+    return await db.scalar(
+        delete(Blob).where(Blob.id == blob_id, Blob.refcount <= 0).returning(Blob.public_id),
+        execution_options={"synchronize_session": False},
+    )
+
+
+async def remove_unreferenced(public_id: str | None) -> None:
+    """Remove the file of a released blob and its transformations from storage (after commit)."""
+    if public_id is not None:
+        await storage.invalidate(public_id, saved=True)
+        result = await storage.delete(public_id)
+        logger.info(f"Unreferenced blob {public_id} removed: {result['result']}")
@@ -1,31 +1,41 @@
-from sqlalchemy.orm import Session
-from src.database.models import Comment
-from datetime import datetime
-
-def create_comment(db: Session, photo_id: int, user_id: int, text: str):
-    comment = Comment(photo_id=photo_id, user_id=user_id, text=text, created_at=datetime.utcnow(), updated_at=datetime.utcnow())
-    db.add(comment)
-    db.commit()
-    db.refresh(comment)
-    return comment
-
-def get_comments(db: Session, photo_id: int):
-    return db.query(Comment).filter(Comment.photo_id == photo_id).all()
-
-def update_comment(db: Session, comment_id: int, text: str):
-    comment = db.query(Comment).filter(Comment.id == comment_id).first()
-    if not comment:
-        return None  
-    comment.text = text
-    comment.updated_at = datetime.utcnow()  
-    db.commit()
-    db.refresh(comment)
-    return comment
-
-def delete_comment_by_id(db: Session, comment_id: int):
-    comment = db.query(Comment).filter(Comment.id == comment_id).first()
-    if not comment:
-        return None
-    db.delete(comment)
-    db.commit()
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database.models import Comment
+from src.services.pagination import MAX_PAGE_SIZE, keyset
+from datetime import datetime
+
+async def create_comment(db: AsyncSession, photo_id: int, user_id: int, text: str):
+    comment = Comment(photo_id=photo_id, user_id=user_id, text=text, created_at=datetime.utcnow(), updated_at=datetime.utcnow())
+    db.add(comment)
+    await db.commit()
+    await db.refresh(comment)
+    return comment
+
+async def get_comments(db: AsyncSession, photo_id: int, limit: int = MAX_PAGE_SIZE, after_id: int | None = None):
+    """One page of the comments of a photo, oldest first, starting after the comment ``after_id``."""
+    query = select(Comment).filter(Comment.photo_id == photo_id)
+    after = [after_id] if after_id is not None else None
+    result = await db.execute(keyset(query, [Comment.id], after).limit(limit))
+    return result.scalars().all()
+
+async def get_comment_by_id(db: AsyncSession, comment_id: int):
+    result = await db.execute(select(Comment).filter(Comment.id == comment_id))
+    return result.scalar_one_or_none()
+
+async def update_comment(db: AsyncSession, comment_id: int, text: str):
+    comment = await get_comment_by_id(db, comment_id)
+    if not comment:
+        return None  
+    comment.text = text
+    comment.updated_at = datetime.utcnow()  
+    await db.commit()
+    await db.refresh(comment)
+    return comment
+
+async def delete_comment_by_id(db: AsyncSession, comment_id: int):
+    comment = await get_comment_by_id(db, comment_id)
+    if not comment:
+        return None
+    await db.delete(comment)
+    await db.commit()
     return comment
\ No newline at end of file
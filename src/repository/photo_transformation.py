@@ -1,19 +1,23 @@
+import asyncio
 from typing import List, Type
 from pydantic import validator, field_validator
 from fastapi.exceptions import ResponseValidationError
 
-from cloudinary import CloudinaryImage
-import cloudinary.api
-import cloudinary.uploader
+import cloudinary.exceptions
 from cloudinary.exceptions import Error, AuthorizationRequired, BadRequest
 
 import sqlalchemy.exc
-from sqlalchemy import and_
-from sqlalchemy.orm import Session
-from src.database.models import Photo, User, Tag
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database.models import Blob, Photo, PhotoTransformation, User, Tag
 from src.conf.config import settings
 from src.schemas import PhotoModel, PhotoResponse, TagModel, TagsPhoto
 from src.photo_effects_schemas import CropEnum, GravityEnum
+from src.repository.blobs import image_metadata
+from src.services.derivative_cache import is_preview, is_saved
+from src.services.qr_codes import qr_cache
+from src.services.storage import storage
+from src.settings import logger
 from datetime import date, timedelta
 from sqlalchemy.exc import IntegrityError
 
@@ -21,85 +25,260 @@ from qrcode import QRCode
 
 from fastapi import UploadFile, HTTPException, status
 
-cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True
+async def get_user_photo(photo_id: int, user: User, db: AsyncSession) -> Photo | None:
+    result = await db.execute(
+        select(Photo).join(User).filter(and_(Photo.id == photo_id, User.id == user.id))
     )
+    return result.scalar_one_or_none()
 
 
 async def gravity_crop(photo_id: int, aspect_ratio: str, width: int, crop: str, gravity: str,
-                       user: User, db: Session) -> Type[Photo]:
-    photo = db.query(Photo).join(User).filter(and_(Photo.id == photo_id, User.id == user.id)).first()
+                       user: User, db: AsyncSession) -> Type[Photo]:
+    return await apply_transformation(
+        photo_id, {'gravity': gravity, 'aspect_ratio': aspect_ratio, 'width': width, 'crop': crop}, user, db
+    )
+
+
+async def coordinates_crop(photo_id: int, aspect_ratio: str, width: int, x: int, y: int, crop: str,
+                           user: User, db: AsyncSession) -> Type[Photo]:
+    return await apply_transformation(
+        photo_id, {'aspect_ratio': aspect_ratio, 'width': width, 'crop': crop, 'x': x, 'y': y}, user, db
+    )
+
+
+async def transformation_url(photo: Photo, params: dict) -> str:
+    """
+    URL of the photo's image with transformation options, built again from the stored version.
+
+    The photo row keeps the URL, so a locally rendered image is saved out of
+    reach of the preview cache eviction; ``release_images`` removes it once
+    no photo shows it any more.
+    """
+    photo_public_id, version = await get_image_source(photo)
+    try:
+        return await storage.transform_saved(photo_public_id, version, **params)
+    except BadRequest as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+async def apply_transformation(photo_id: int, params: dict, user: User, db: AsyncSession) -> Photo:
+    """
+    Transform a photo and add the options to its history after the current step.
+
+    Steps undone before are dropped, as in an editor.
+    """
+    photo = await get_user_photo(photo_id, user, db)
     if photo is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Photo was not found')
-    photo_public_id = await get_public_id(photo.url)
+    params = {name: value for name, value in params.items() if value is not None}
+    shown = photo.transformed_url
+    photo.transformed_url = await transformation_url(photo, params)
+    position = photo.transformation_position + 1
+    await db.execute(
+        delete(PhotoTransformation).where(
+            PhotoTransformation.photo_id == photo.id, PhotoTransformation.position >= position
+        )
+    )
+    db.add(PhotoTransformation(photo_id=photo.id, position=position, params=params))
+    photo.transformation_position = position
+    await db.commit()
+    await release_images(photo.id, photo.blob_id, [shown], db)
+    return photo
 
-    version = await get_image_version(photo_public_id)
-    try:
-        resized_photo_url = CloudinaryImage(photo_public_id).build_url(gravity=gravity,
-                                                                       aspect_ratio=aspect_ratio,
-                                                                       width=width, crop=crop,
-                                                                       version=version)
-        if resized_photo_url:
-            photo.transformed_url = resized_photo_url
-            db.commit()
-        return photo
-    except ResponseValidationError as e:
-        print(f'Error {e}')
 
+async def apply_transformation_batch(photo_ids: list[int], params: dict, user: User,
+                                    db: AsyncSession) -> list[dict]:
+    """
+    Transform several photos of the user with the same options.
+
+    The photos are loaded in one query and their URLs computed concurrently,
+    at most ``transformation_batch_concurrency`` at a time; every photo
+    transformed gets the step in its history and all of them are committed
+    together. A photo that is missing or fails does not stop the others.
+
+    :return: Per photo, in request order: ``photo_id``, ``status_code`` and
+        the ``transformed_url`` or the error ``detail``.
+    """
+    photo_ids = list(dict.fromkeys(photo_ids))
+    if len(photo_ids) > settings.transformation_batch_max_photos:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'At most {settings.transformation_batch_max_photos} photos can be transformed at once',
+        )
+    params = {name: value for name, value in params.items() if value is not None}
+    photos = await db.scalars(select(Photo).where(Photo.id.in_(photo_ids), Photo.user_id == user.id))
+    photos = {photo.id: photo for photo in photos}
+    semaphore = asyncio.Semaphore(settings.transformation_batch_concurrency)
+
+    async def transform(photo: Photo) -> dict:
+        async with semaphore:
+            try:
+                url = await transformation_url(photo, params)
+            except HTTPException as e:
+                return {'photo_id': photo.id, 'status_code': e.status_code, 'detail': e.detail}
+            except cloudinary.exceptions.Error as e:
+                return {'photo_id': photo.id, 'status_code': status.HTTP_502_BAD_GATEWAY, 'detail': str(e)}
+        return {'photo_id': photo.id, 'status_code': status.HTTP_200_OK, 'transformed_url': url}
+
+    results = dict(zip(photos, await asyncio.gather(*(transform(photo) for photo in photos.values()))))
+    done = [photo for photo in photos.values() if results[photo.id]['status_code'] == status.HTTP_200_OK]
+    shown = {photo.id: photo.transformed_url for photo in done}
+    if done:
+        # Steps undone before are dropped, for all the photos in one statement
+        await db.execute(
+            delete(PhotoTransformation)
+            .where(
+                PhotoTransformation.photo_id == Photo.id,
+                Photo.id.in_([photo.id for photo in done]),
+                PhotoTransformation.position > Photo.transformation_position,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        for photo in done:
+            photo.transformed_url = results[photo.id]['transformed_url']
+            photo.transformation_position += 1
+            db.add(PhotoTransformation(photo_id=photo.id, position=photo.transformation_position, params=params))
+        await db.commit()
+    for photo in done:
+        await release_images(photo.id, photo.blob_id, [shown[photo.id]], db)
+    return [
+        results.get(photo_id) or {
+            'photo_id': photo_id, 'status_code': status.HTTP_404_NOT_FOUND, 'detail': 'Photo was not found'
+        }
+        for photo_id in photo_ids
+    ]
+
+
+async def go_to_transformation(photo: Photo, position: int, db: AsyncSession, missing: str) -> Photo:
+    """Show the given step of the history (0: the photo itself); ``missing`` is the 400 detail when it does not exist."""
+    if position < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=missing)
+    shown = photo.transformed_url
+    if position == 0:
+        photo.transformed_url = photo.url
+    else:
+        # A single lookup on the (photo_id, position) unique index
+        step = await db.scalar(
+            select(PhotoTransformation).where(
+                PhotoTransformation.photo_id == photo.id, PhotoTransformation.position == position
+            )
+        )
+        if step is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=missing)
+        photo.transformed_url = await transformation_url(photo, step.params)
+    photo.transformation_position = position
+    await db.commit()
+    await release_images(photo.id, photo.blob_id, [shown], db)
     return photo
 
 
-async def coordinates_crop(photo_id: int, aspect_ratio: str, width: int, x: int, y: int, crop: str,
-                           user: User, db: Session) -> Type[Photo]:
-    photo = db.query(Photo).join(User).filter(and_(Photo.id == photo_id, User.id == user.id)).first()
+async def undo_transformation(photo_id: int, user: User, db: AsyncSession) -> Photo:
+    photo = await get_user_photo(photo_id, user, db)
     if photo is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Photo was not found')
-    photo_public_id = await get_public_id(photo.url)
+    return await go_to_transformation(photo, photo.transformation_position - 1, db, 'Nothing to undo')
 
-    version = await get_image_version(photo_public_id)
-    try:
-        resized_photo_url = CloudinaryImage(photo_public_id).build_url(aspect_ratio=aspect_ratio,
-                                                                       width=width, crop=crop, x=x, y=y,
-                                                                       version=version)
-        if resized_photo_url:
-            photo.transformed_url = resized_photo_url
-            db.commit()
-        return photo
-    except ResponseValidationError as e:
-        print(f'Error {e}')
 
-    return photo
+async def redo_transformation(photo_id: int, user: User, db: AsyncSession) -> Photo:
+    photo = await get_user_photo(photo_id, user, db)
+    if photo is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Photo was not found')
+    return await go_to_transformation(photo, photo.transformation_position + 1, db, 'Nothing to redo')
 
 
-async def reset_transformation(photo_id: int, user: User, db: Session):
-    photo = db.query(Photo).join(User).filter(and_(Photo.id == photo_id, User.id == user.id)).first()
+async def jump_to_transformation(photo_id: int, position: int, user: User, db: AsyncSession) -> Photo:
+    photo = await get_user_photo(photo_id, user, db)
+    if photo is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Photo was not found')
+    return await go_to_transformation(photo, position, db, f'Transformation {position} was not found')
+
+
+async def get_transformations(photo_id: int, user: User, db: AsyncSession) -> tuple[Photo, list[PhotoTransformation]]:
+    photo = await get_user_photo(photo_id, user, db)
+    if photo is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Photo was not found')
+    steps = await db.scalars(
+        select(PhotoTransformation)
+        .where(PhotoTransformation.photo_id == photo.id)
+        .order_by(PhotoTransformation.position)
+    )
+    return photo, list(steps)
+
+
+async def clear_transformations(photo: Photo, db: AsyncSession) -> None:
+    """Forget the history of a photo whose image changes (committed by the caller)."""
+    await db.execute(delete(PhotoTransformation).where(PhotoTransformation.photo_id == photo.id))
+    photo.transformation_position = 0
+
+
+async def reset_transformation(photo_id: int, user: User, db: AsyncSession):
+    photo = await get_user_photo(photo_id, user, db)
+    if photo is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Photo was not found')
+    # The history is kept, redo goes back to the transformation
+    shown = photo.transformed_url
     photo.transformed_url = photo.url
-    db.commit()
+    photo.transformation_position = 0
+    await db.commit()
+    await release_images(photo.id, photo.blob_id, [shown], db)
     return photo
 
 
-async def save_transformation(photo_id: int, user: User, db: Session):
-    photo = db.query(Photo).join(User).filter(and_(Photo.id == photo_id, User.id == user.id)).first()
+async def save_transformation(photo_id: int, user: User, db: AsyncSession):
+    photo = await get_user_photo(photo_id, user, db)
+    if photo is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Photo was not found')
+    if not photo.transformed_url or photo.transformed_url == photo.url:
+        return photo
+    source_url = photo.url
+    transformed_public_id = await get_public_id(photo.transformed_url)
+    if is_preview(transformed_public_id) or is_saved(transformed_public_id):
+        # Cached previews may be evicted, the photo keeps its own copy; a
+        # saved transformation is returned as it is, with its metadata
+        saved = await storage.promote(transformed_public_id)
+        photo.transformed_url = storage.url(saved['public_id'], version=saved.get('version'))
+        set_image_metadata(photo, stored_metadata(saved))
+    else:
+        # Rendered by Cloudinary from the URL: the version stays the source's,
+        # size, pixels and format are the result's (unknown if it cannot be fetched)
+        try:
+            rendered = await storage.rendered_info(photo.transformed_url)
+        except cloudinary.exceptions.Error as e:
+            logger.warning(f'Saved transformation {photo.transformed_url} was not described: {e}')
+            rendered = {}
+        set_image_metadata(photo, {name: value for name, value in stored_metadata(rendered).items() if name != 'version'})
     photo.url = photo.transformed_url
-    db.commit()
+    # Steps were relative to the previous image
+    await clear_transformations(photo, db)
+    await db.commit()
+    # The previous image is removed only if it was a transformation no photo shows
+    await release_images(photo.id, photo.blob_id, [source_url], db)
     return photo
 
 
-async def roll_back_transformations(photo_id: int, user: User, db: Session):
-    photo = db.query(Photo).join(User).filter(and_(Photo.id == photo_id, User.id == user.id)).first()
-    photo_public_id = await get_public_id(photo.url)
-    version = await get_image_version(photo_public_id)
+async def roll_back_transformations(photo_id: int, user: User, db: AsyncSession):
+    photo = await get_user_photo(photo_id, user, db)
+    if photo is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Photo was not found')
+    if photo.blob_id is not None:
+        # Back to the uploaded image
+        blob = await db.get(Blob, photo.blob_id)
+        shown = [photo.url, photo.transformed_url]
+        photo.url = photo.transformed_url = storage.url(blob.public_id, version=blob.version)
+        set_image_metadata(photo, image_metadata(blob))
+        await clear_transformations(photo, db)
+        await db.commit()
+        await release_images(photo.id, photo.blob_id, shown, db)
+        return photo
+
+    photo_public_id, version = await get_image_source(photo)
     try:
-        url = cloudinary.CloudinaryImage(photo_public_id).build_url(
-            version=version
-        )
+        url = storage.url(photo_public_id, version=version)
         if url:
             photo.transformed_url = url
             photo.url = url
-            db.commit()
+            await clear_transformations(photo, db)
+            await db.commit()
         return photo
     except ResponseValidationError as e:
         print(f'Error {e}')
@@ -108,24 +287,86 @@ async def roll_back_transformations(photo_id: int, user: User, db: Session):
     return photo
 
 
+async def release_images(photo_id: int, blob_id: int | None, urls: list[str | None], db: AsyncSession) -> None:
+    """
+    Remove the saved transformations among ``urls`` that no photo shows any more (after commit).
+
+    Photos of the same blob may show the same transformation, so one is
+    removed, with its previews, only when neither the ``url`` nor the
+    ``transformed_url`` of any of them points to it. Uploaded images are
+    reference counted as blobs and previews are left to the cache. The QR
+    codes of a URL no photo shows are removed too.
+    """
+    for url in dict.fromkeys(filter(None, urls)):
+        encoded = await db.scalar(
+            select(Photo.id).where(or_(Photo.url == url, Photo.transformed_url == url)).limit(1)
+        )
+        if encoded is None:
+            await qr_cache.forget(url)
+        public_id = await get_public_id(url)
+        if not is_saved(public_id):
+            continue
+        same_image = Photo.blob_id == blob_id if blob_id is not None else Photo.id == photo_id
+        shown = await db.scalar(
+            select(Photo.id).where(
+                same_image,
+                or_(
+                    Photo.url.endswith(f'/{public_id}', autoescape=True),
+                    Photo.transformed_url.endswith(f'/{public_id}', autoescape=True),
+                ),
+            ).limit(1)
+        )
+        if shown is not None:
+            continue
+        try:
+            await storage.invalidate(public_id)
+            await storage.delete(public_id)
+        except cloudinary.exceptions.Error as e:
+            logger.warning(f'Transformation {public_id} was not removed: {e}')
+
+
 async def get_public_id(url: str) -> str:
     url_parts = url.split('/')
     photo_public_id = '/'.join(url_parts[-2:])
     return photo_public_id
 
 
-# Get info on cloudinary about th photo
-async def get_image_version(public_id):
-    try:
-        # Take metadata by public_id
-        result = cloudinary.api.resource(public_id)
-        # Take the photo version
-        version = result.get('version')
-        return version
-    except cloudinary.exceptions.Error as e:
-        print(f"Error while getting photo metadata: {e}")
-        return None
+def stored_metadata(info: dict) -> dict:
+    """Photo columns from the details storage reports about an image."""
+    return {
+        'version': info.get('version'),
+        'width': info.get('width'),
+        'height': info.get('height'),
+        'format': info.get('format'),
+        'size': info.get('bytes'),
+    }
+
+
+def set_image_metadata(photo: Photo, metadata: dict) -> None:
+    for field, value in metadata.items():
+        setattr(photo, field, value)
 
 
+async def get_image_source(photo: Photo) -> tuple[str, int | None]:
+    """
+    Public id and version of the image a photo shows.
+
+    The version is stored with the photo since its upload; photos from before
+    are looked up in storage once and keep the result when committed.
+    """
+    photo_public_id = await get_public_id(photo.url)
+    if photo.version is None:
+        metadata = await get_image_metadata(photo_public_id)
+        if metadata:
+            set_image_metadata(photo, stored_metadata(metadata))
+    return photo_public_id, photo.version
 
 
+# Get info from storage about the photo
+async def get_image_metadata(public_id: str) -> dict | None:
+    try:
+        # Take metadata by public_id (cached by the Cloudinary client)
+        return await storage.info(public_id)
+    except cloudinary.exceptions.Error as e:
+        print(f"Error while getting photo metadata: {e}")
+        return None
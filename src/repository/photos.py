@@ -1,95 +1,147 @@
 from typing import List, Type
 
-import cloudinary
-import cloudinary.uploader
 from cloudinary.exceptions import Error, AuthorizationRequired, BadRequest
 
 import sqlalchemy.exc
-from sqlalchemy import and_
-from sqlalchemy.orm import Session
-from src.database.models import Photo, User, Tag
-from src.conf.config import settings
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from src.database.models import Blob, Photo, User, Tag
+from src.services.storage import storage
+from src.repository.blobs import image_metadata, release_blob, remove_unreferenced
+from src.repository.photo_transformation import clear_transformations, release_images
 from src.schemas import PhotoModel, PhotoResponse, TagModel, TagsPhoto
+from src.services.pagination import MAX_PAGE_SIZE, keyset
 from datetime import date, timedelta
 from sqlalchemy.exc import IntegrityError
 
 from fastapi import UploadFile, HTTPException, status
 
-cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True
-    )
-
-
-async def create_photo(text: str, url: str, user: User, db: Session) -> Photo:
+async def create_photo(text: str, url: str, user: User, db: AsyncSession, blob: Blob | None = None) -> Photo:
 
     photo = Photo(
         user_id=user.id,
         url=url,
-        description=text
+        description=text,
+        blob_id=blob.id if blob else None,
+        tags=[],
+        **image_metadata(blob)
     )
     db.add(photo)
-    db.commit()
-    db.refresh(photo)
+    await db.commit()
+    await db.refresh(photo, ["id", "tags"])
     return photo
 
 
-async def read_photo(photo_id: int, user: User, db: Session) -> Type[Photo] | None:
-    return db.query(Photo).filter(and_(Photo.id == photo_id, Photo.user_id == user.id)).first()
+async def get_photo(photo_id: int, user: User, db: AsyncSession) -> Photo | None:
+    stmt = (
+        select(Photo)
+        .options(selectinload(Photo.tags))
+        .filter(and_(Photo.id == photo_id, Photo.user_id == user.id))
+    )
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
+
 
+async def read_photo(photo_id: int, user: User, db: AsyncSession) -> Type[Photo] | None:
+    return await get_photo(photo_id, user, db)
 
-async def update_photo(photo_id: int, url: UploadFile, description: str, user: User,  db: Session) -> Photo | None:
 
-    photo = db.query(Photo).filter(and_(Photo.id == photo_id, Photo.user_id == user.id)).first()
+async def update_photo(photo_id: int, url: UploadFile, description: str, user: User,  db: AsyncSession,
+                       blob: Blob | None = None) -> Photo | None:
+
+    photo = await get_photo(photo_id, user, db)
     if photo:
-        await destroy_cloud_url(photo.url)
+        old_url, old_blob_id = photo.url, photo.blob_id
+        shown = [photo.url, photo.transformed_url]
         photo.url = url
         photo.description = description
-        db.commit()
+        photo.blob_id = blob.id if blob else None
+        for field, value in image_metadata(blob).items():
+            setattr(photo, field, value)
+        photo.transformed_url = url
+        await clear_transformations(photo, db)
+        unreferenced = await release_blob(old_blob_id, db)
+        await db.commit()
+        if old_blob_id is None:
+            await destroy_cloud_url(old_url)
+        else:
+            await release_images(photo.id, old_blob_id, shown, db)
+        await remove_unreferenced(unreferenced)
     return photo
 
 
-async def delete_photo(photo_id: int, user: User, db: Session) -> Type[Photo]:
+async def delete_photo(photo_id: int, user: User, db: AsyncSession) -> Type[Photo]:
 
-    photo = db.query(Photo).filter(and_(Photo.id == photo_id, Photo.user_id == user.id)).first()
+    photo = await get_photo(photo_id, user, db)
     if photo is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Photo not found')
     if photo:
-        await destroy_cloud_url(photo.url)
-        db.delete(photo)
-        db.commit()
+        unreferenced = await release_blob(photo.blob_id, db)
+        if photo.blob_id is None:
+            await destroy_cloud_url(photo.url)
+        await db.delete(photo)
+        await db.commit()
+        await release_images(photo.id, photo.blob_id, [photo.url, photo.transformed_url], db)
+        await remove_unreferenced(unreferenced)
     return photo
 
 
 async def change_description(
-    photo_id: int, description: str, user: User, db: Session
+    photo_id: int, description: str, user: User, db: AsyncSession
 ) -> Photo | None:
 
-    photo = db.query(Photo).filter(and_(Photo.id == photo_id, Photo.user_id == user.id)).first()
+    photo = await get_photo(photo_id, user, db)
     if photo:
         photo.description = description
-        db.commit()
+        await db.commit()
     return photo
 
 
-async def get_users_photos(user_id: int, user: User, db: Session) -> List[Type[Photo]] | None:
-    user = db.query(User).join(Photo).filter(and_(User.id == user_id, Photo.user_id == user.id)).first()
-    if user is None:
+async def get_users_photos(user_id: int, user: User, db: AsyncSession, limit: int = MAX_PAGE_SIZE,
+                           after: list | None = None) -> List[Type[Photo]] | None:
+    """One page of the photos of a user, newest first, starting after the ``(created_at, id)`` key ``after``."""
+    if await db.scalar(select(User.id).filter(User.id == user_id)) is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
-    photos = db.query(Photo).filter(Photo.user_id == user_id).all()
-    return photos
+    query = select(Photo).options(selectinload(Photo.tags)).filter(Photo.user_id == user_id)
+    result = await db.execute(
+        keyset(query, [Photo.created_at, Photo.id], after, descending=True).limit(limit)
+    )
+    return list(result.scalars().all())
 
 
 async def destroy_cloud_url(photo_url):
     url_parts = photo_url.split('/')
     photo_public_id = '/'.join(url_parts[-2:])
-    result = cloudinary.uploader.destroy(photo_public_id)
+    await storage.invalidate(photo_public_id, saved=True)
+    result = await storage.delete(photo_public_id)
     print(f'The old photo url was destroyed: {result["result"]}')
 
 
 
-async def search_photos(tag: str, db: Session) -> list[Photo]:
-    photos = db.query(Photo).filter(tag in Photo.tags).all()
-    return list(photos)
+async def search_photos(tag: str, db: AsyncSession) -> list[Photo]:
+    result = await db.execute(
+        select(Photo).options(selectinload(Photo.tags)).join(Photo.tags).filter(Tag.name == tag)
+    )
+    return list(result.scalars().all())
+
+
+async def get_feed(db: AsyncSession, limit: int, after: list | None = None, tag: str | None = None,
+                   user_id: int | None = None) -> list[Photo]:
+    """
+    One page of the photos of all users, newest first.
+
+    Ordered by ``(created_at, id)`` and started right after the ``after``
+    key (keyset pagination, index ix_photos_created_at_id or
+    ix_photos_user_id_created_at_id), so every page costs the same however
+    deep it is. Tags are loaded with the page in one more statement.
+    """
+    query = select(Photo).options(selectinload(Photo.tags))
+    if tag:
+        query = query.filter(Photo.tags.any(name=tag))
+    if user_id is not None:
+        query = query.filter(Photo.user_id == user_id)
+    result = await db.execute(
+        keyset(query, [Photo.created_at, Photo.id], after, descending=True).limit(limit)
+    )
+    return list(result.scalars().all())
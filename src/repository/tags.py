@@ -1,17 +1,30 @@
 from typing import List, Type
 
-from sqlalchemy import and_
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from src.database.models import Photo, User, Tag
 from src.schemas import PhotoModel, PhotoResponse, TagModel, TagsPhoto
+from src.services.pagination import MAX_PAGE_SIZE, keyset
 
 
 from fastapi import UploadFile, HTTPException, status
 
 
-async def add_tags(photo_id: int, body: TagsPhoto, user: User, db: Session) -> Photo | None:
+async def get_user_photo(photo_id: int, user: User, db: AsyncSession) -> Photo | None:
+    result = await db.execute(
+        select(Photo)
+        .options(selectinload(Photo.tags))
+        .filter(and_(Photo.id == photo_id, Photo.user_id == user.id))
+    )
+    return result.scalar_one_or_none()
+
+
+async def add_tags(photo_id: int, body: TagsPhoto, user: User, db: AsyncSession) -> Photo | None:
     print('REPOSITORY add tags')
-    photo = db.query(Photo).filter(and_(Photo.id == photo_id, Photo.user_id == user.id)).first()
+    photo = await get_user_photo(photo_id, user, db)
+    if photo is None:
+        return None
 
     if len(photo.tags) + len(body.tags) > 5:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
@@ -24,9 +37,9 @@ async def add_tags(photo_id: int, body: TagsPhoto, user: User, db: Session) -> P
     return photo
 
 
-async def add_tag(photo_id: int, tag: str, user: User, db: Session) -> Type[Photo] | None:
+async def add_tag(photo_id: int, tag: str, user: User, db: AsyncSession) -> Type[Photo] | None:
     print('Repository ADD TAG')
-    photo = db.query(Photo).filter(and_(Photo.id == photo_id, Photo.user_id == user.id)).first()
+    photo = await get_user_photo(photo_id, user, db)
 
     if not photo:
         return None
@@ -41,35 +54,37 @@ async def add_tag(photo_id: int, tag: str, user: User, db: Session) -> Type[Phot
     await check_unique_tags(photo, tag)
 
     # Check if tag already exist in DB
-    existing_tag = db.query(Tag).filter(Tag.name == tag).first()
+    result = await db.execute(select(Tag).filter(Tag.name == tag))
+    existing_tag = result.scalars().first()
     if existing_tag:
         photo.tags.append(existing_tag)
     else:
         new_tag = Tag(name=tag)
         photo.tags.append(new_tag)
-    db.commit()
+    await db.commit()
     return photo
 
 
-async def remove_tags(photo_id: int, user: User, db: Session) -> Photo | None:
-    photo = db.query(Photo).filter(and_(Photo.id == photo_id, Photo.user_id == user.id)).first()
+async def remove_tags(photo_id: int, user: User, db: AsyncSession) -> Photo | None:
+    photo = await get_user_photo(photo_id, user, db)
 
     if photo:
         photo.tags = []
-        db.commit()
+        await db.commit()
     return photo
 
 
-async def remove_tag(photo_id: int, tag: str, user: User, db: Session) -> Type[Photo] | None:
-    photo = db.query(Photo).filter(and_(Photo.id == photo_id, Photo.user_id == user.id)).first()
-    db_tag = db.query(Tag).filter(and_(Tag.name == tag, Photo.user_id == user.id)).first()
+async def remove_tag(photo_id: int, tag: str, user: User, db: AsyncSession) -> Type[Photo] | None:
+    photo = await get_user_photo(photo_id, user, db)
+    result = await db.execute(select(Tag).filter(Tag.name == tag))
+    db_tag = result.scalars().first()
 
     # Check if photo exists
     if photo and db_tag:
         # Check if photo contain required tag and removes it
         if db_tag.name in [ex_tag.name for ex_tag in photo.tags]:
             photo.tags.remove(db_tag)
-            db.commit()
+            await db.commit()
         else:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                                 detail=f"The photo doesn't contain a tag '{db_tag.name}'")
@@ -85,6 +100,10 @@ async def check_unique_tags(photo: Type[Photo], tag: str):
                                 detail=f'Tags should be unique. Photos tags: {[tag.name for tag in photo.tags]}')
 
 
-async def search_photos(tag: str, db: Session) -> list[Type[Photo]]:
-    photos = db.query(Photo).join(Photo.tags).filter(Tag.name == tag).all()
-    return photos
+async def search_photos(tag: str, db: AsyncSession, limit: int = MAX_PAGE_SIZE,
+                        after_id: int | None = None) -> list[Type[Photo]]:
+    """One page of the photos with a tag, newest first, starting after the photo ``after_id``."""
+    query = select(Photo).options(selectinload(Photo.tags)).join(Photo.tags).filter(Tag.name == tag)
+    after = [after_id] if after_id is not None else None
+    result = await db.execute(keyset(query, [Photo.id], after, descending=True).limit(limit))
+    return list(result.scalars().all())
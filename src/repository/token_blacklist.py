@@ -1,13 +1,175 @@
-from sqlalchemy.orm import Session
-from src.database.models import BlacklistedToken
+import asyncio
+import hashlib
+import time
 
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
 
-async def is_token_blacklisted(token: str, db: Session) -> bool:
-    token = db.query(BlacklistedToken).filter(BlacklistedToken.jwt == token).first()
-    return token is not None
+from src.conf.config import settings
+from src.services.bloom_filter import BloomFilter
+from src.settings import logger
 
+KEY_PREFIX = "token_blacklist:"
+# Revocations are broadcast so that every worker keeps its bloom filter complete
+CHANNEL = "token_blacklist"
+# Used for tokens without an "exp" claim (the longest token lifetime)
+DEFAULT_TTL = 7 * 24 * 60 * 60
 
-async def add_token_to_blacklist(token: str, db: Session) -> None:
-    blacklisted_token = BlacklistedToken(jwt=token)
-    db.add(blacklisted_token)
-    db.commit()
+
+def blacklist_key(token: str, payload: dict) -> str:
+    """
+    Identifier of a token in the blacklist: its ``jti`` claim, or a digest of
+    the token for tokens issued without one.
+    """
+    return payload.get("jti") or hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenBlacklist:
+    """
+    Revoked tokens stored in Redis with a TTL of the token's remaining lifetime.
+
+    An in-process bloom filter of the revoked identifiers answers "not revoked"
+    for almost every token without a Redis round trip; only filter hits
+    (revoked tokens and false positives) are confirmed in Redis. Without Redis
+    the revocations are kept in process memory.
+
+    When Redis cannot be reached, the filter answers alone: revocations this
+    worker has seen are still rejected, other tokens are let through rather
+    than locking every user out.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.redis: Redis | None = None
+        # False until the filter holds every revocation stored in Redis
+        self.synced = False
+        # Revocations received while a rebuild scans Redis
+        self._rebuilding: list[str] | None = None
+        self._listener: asyncio.Task | None = None
+        self._rebuild_task: asyncio.Task | None = None
+        self._local: dict[str, float] = {}
+
+    async def start(self, redis: Redis) -> None:
+        """Use ``redis`` as the store and keep the filter in sync with it."""
+        self.redis = redis
+        self._listener = asyncio.create_task(self._listen())
+        self._listener.add_done_callback(self._stopped_listening)
+
+    async def stop(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            self._listener = None
+        if self._rebuild_task:
+            self._rebuild_task.cancel()
+            self._rebuild_task = None
+        self.redis = None
+        self.synced = False
+
+    def _remember(self, jti: str) -> None:
+        self.bloom.add(jti)
+        if self._rebuilding is not None:
+            self._rebuilding.append(jti)
+        elif self.bloom.is_full and self.synced and self._rebuild_task is None:
+            # Expired revocations are only dropped by rebuilding the filter
+            self._rebuild_task = asyncio.create_task(self.rebuild())
+            self._rebuild_task.add_done_callback(self._rebuilt)
+
+    def _rebuilt(self, task: asyncio.Task) -> None:
+        self._rebuild_task = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Token blacklist rebuild failed: {task.exception()}")
+
+    async def rebuild(self) -> None:
+        """
+        Replace the filter with one holding the revocations currently in Redis.
+
+        The new filter has room for twice the live revocations, so that it is
+        not full again, and rebuilt, after the next few revocations.
+        """
+        if self._rebuilding is not None:
+            return
+        self._rebuilding = []
+        try:
+            async for key in self.redis.scan_iter(match=f"{KEY_PREFIX}*", count=1000):
+                self._rebuilding.append(key.removeprefix(KEY_PREFIX))
+            bloom = BloomFilter(max(self.capacity, 2 * len(self._rebuilding)), self.error_rate)
+            for jti in self._rebuilding:
+                bloom.add(jti)
+            self.bloom = bloom
+        finally:
+            self._rebuilding = None
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    # Subscribe before loading so no revocation falls in between
+                    await pubsub.subscribe(CHANNEL)
+                    if self._rebuild_task is not None:
+                        # Started before this subscription, it may miss revocations
+                        await asyncio.wait([self._rebuild_task])
+                    await self.rebuild()
+                    self.synced = True
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._remember(message["data"])
+            except Exception as e:
+                # Revocations of other workers are missed until subscribed again
+                self.synced = False
+                logger.warning(f"Token blacklist lost its Redis subscription: {e}")
+                await asyncio.sleep(1)
+
+    def _stopped_listening(self, task: asyncio.Task) -> None:
+        self.synced = False
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Token blacklist stopped listening to revocations: {task.exception()!r}")
+
+    async def add(self, jti: str, expires_at: float | None) -> None:
+        ttl = int(expires_at - time.time()) if expires_at else DEFAULT_TTL
+        if ttl <= 0:
+            # Already expired, rejected by the signature check anyway
+            return
+        if self.redis is None:
+            now = time.time()
+            # Expired revocations are otherwise only dropped when looked up
+            for expired in [key for key, expires_at in self._local.items() if expires_at <= now]:
+                del self._local[expired]
+            self._local[jti] = now + ttl
+            self._remember(jti)
+            return
+        self._remember(jti)
+        await self.redis.set(f"{KEY_PREFIX}{jti}", 1, ex=ttl)
+        await self.redis.publish(CHANNEL, jti)
+
+    async def contains(self, jti: str) -> bool:
+        if self.synced and jti not in self.bloom:
+            return False
+        if self.redis is None:
+            expires_at = self._local.get(jti)
+            if expires_at is not None and expires_at <= time.time():
+                del self._local[jti]
+                return False
+            return expires_at is not None
+        try:
+            return bool(await self.redis.exists(f"{KEY_PREFIX}{jti}"))
+        except RedisError as e:
+            # Once synced only filter hits (revoked tokens and false positives)
+            # get here and stay rejected; before that, the filter holds the
+            # revocations this worker has seen and anything else is let through
+            logger.warning(f"Token blacklist lookup failed, answered by the local filter: {e}")
+            return jti in self.bloom
+
+
+token_blacklist = TokenBlacklist(
+    settings.token_blacklist_capacity, settings.token_blacklist_error_rate
+)
+
+
+async def is_token_blacklisted(token: str, payload: dict) -> bool:
+    return await token_blacklist.contains(blacklist_key(token, payload))
+
+
+async def add_token_to_blacklist(token: str, payload: dict) -> None:
+    await token_blacklist.add(blacklist_key(token, payload), payload.get("exp"))
@@ -1,16 +1,19 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import User
+from src.services.user_cache import user_cache
 
 from passlib.context import CryptContext
 from libgravatar import Gravatar
 
 
-async def get_user_by_email(email: str, db: Session) -> User | None:
-    return db.query(User).filter(User.email == email).first()
+async def get_user_by_email(email: str, db: AsyncSession) -> User | None:
+    result = await db.execute(select(User).filter(User.email == email))
+    return result.scalar_one_or_none()
 
 
-async def create_user(user_data: dict, db: Session) -> User:
+async def create_user(user_data: dict, db: AsyncSession) -> User:
     avatar = None
     try:
         g = Gravatar(user_data["email"])
@@ -19,56 +22,64 @@ async def create_user(user_data: dict, db: Session) -> User:
         print(e)
     new_user = User(**user_data, avatar=avatar)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 
-async def update_token(user: User, token: str | None, db: Session) -> None:
+async def update_token(user: User, token: str | None, db: AsyncSession) -> None:
     user.refresh_token = token
-    db.commit()
+    await db.commit()
+    await user_cache.invalidate(user.email)
 
 
-async def get_user_count(db: Session):
-    return db.query(User).count()
+async def get_user_count(db: AsyncSession):
+    result = await db.execute(select(func.count(User.id)))
+    return result.scalar_one()
 
 
-async def get_user_by_id(user_id: int, db: Session):
-    return db.query(User).filter(User.id == user_id).first()
+async def get_user_by_id(user_id: int, db: AsyncSession):
+    result = await db.execute(select(User).filter(User.id == user_id))
+    return result.scalar_one_or_none()
 
 
-async def update_user_in_db(user: User, db: Session):
+async def update_user_in_db(user: User, db: AsyncSession):
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    await user_cache.invalidate(user.email)
 
 
-async def confirmed_email(email: str, db: Session) -> None:
+async def confirmed_email(email: str, db: AsyncSession) -> None:
     """
     Changes status of user to 'confirmed' after email confirmation.
 
     :param email: email to be confirmed.
     :type email: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: None.
     :rtype: None
     """
     user = await get_user_by_email(email, db)
     user.confirmed = True
-    db.commit()
+    await db.commit()
+    await user_cache.invalidate(email)
 
 
-async def update_avatar(email, url: str, db: Session) -> User:
+async def update_avatar(email, url: str, db: AsyncSession) -> User:
     user = await get_user_by_email(email, db)
     user.avatar = url
-    db.commit()
+    await db.commit()
+    await db.refresh(user)
+    await user_cache.invalidate(email)
     return user
 
 
-async def update_user_profile(user: User, update_data: dict, db: Session) -> User:
+async def update_user_profile(user: User, update_data: dict, db: AsyncSession) -> User:
     for key, value in update_data.items():
         setattr(user, key, value)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    await user_cache.invalidate(user.email)
     return user
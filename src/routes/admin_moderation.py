@@ -1,80 +1,109 @@
+from secrets import token_hex
 from typing import List
-from fastapi import APIRouter, Depends, status, UploadFile, File, HTTPException, Form
-from sqlalchemy.orm import Session
-import cloudinary
-import cloudinary.uploader
+from fastapi import APIRouter, Depends, status, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from cloudinary.exceptions import Error, AuthorizationRequired, BadRequest
 
 from src.routes.permissions import is_admin
-from src.database.db import get_db
+from src.database.db import get_async_db
 from src.repository import admin_moderation as repository_admin_moderation
-from src.schemas import Comment, PhotoResponse, PhotoModel, TagsPhoto, UserStatistics
-from src.conf.config import settings
+from src.repository import comments as repository_comments
+from src.repository import blobs as repository_blobs
+from src.repository import users as repository_users
+from src.schemas import Comment, Page, PhotoResponse, PhotoModel, SlowQuery, TagsPhoto, UserStatistics
 from src.services.auth import auth_service
-from src.database.models import User, Comment as DB_Comment
+from src.services.pagination import PageParams, make_page, page_params
+from src.services.query_stats import slow_query_log
+from src.services.storage import storage
+from src.services.upload import receive_upload, upload_form
+from src.database.models import User
 
 router = APIRouter(prefix="/admin", tags=["admin_moderation"])
 
-cloudinary.config(
-    cloud_name=settings.cloudinary_name,
-    api_key=settings.cloudinary_api_key,
-    api_secret=settings.cloudinary_api_secret,
-    secure=True,
-)
 
+def create_public_id(filename: str) -> str:
+    """Create a clean file identifier; the random suffix keeps earlier uploads intact."""
 
-def create_public_id(description: str, file: UploadFile) -> tuple[str, str, str]:
-    """Create a clean file identifier and return clean description, clean filename and public id."""
-
-    clean_description = description[:7].replace(" ", "")
-    clean_filename = file.filename.replace(".", "")
-    public_id = f"PhotoShare/{clean_description}{clean_filename}"
+    clean_filename = filename.replace(".", "")
+    public_id = f"PhotoShare/{clean_filename}{token_hex(4)}"
 
     return public_id
 
 
-@router.get("/statistics", response_model=List[UserStatistics])
+@router.get("/statistics", response_model=Page[UserStatistics])
 async def get_user_statistics(
+    params: PageParams = Depends(page_params(default=50, maximum=500)),
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Retrieve statistics for all users in the system.
+    Retrieve statistics for one page of users in the system.
 
     Args:
+    - **limit** (int): Page size (1-500).
+    - **cursor** (str, optional): ``next_cursor`` of the previous page.
     - **current_user** (User): The current authenticated user (must be an admin).
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
-    - **HTTPException**: If the user is not an admin.
+    - **HTTPException**: If the user is not an admin or the cursor is invalid.
 
     Returns:
-    - **List[UserStatistics]**: A list of user statistics.
+    - **Page[UserStatistics]**: One page of user statistics, ordered by user id.
     """
 
     # raise ValueError("Not implemented")
     is_admin(current_user)
 
-    return await repository_admin_moderation.get_user_statistics(db)
+    after = params.after(int)
+    statistics = await repository_admin_moderation.get_user_statistics(
+        db, params.fetch, after[0] if after else None
+    )
+    return make_page(statistics, params, lambda row: (row.user_id,))
+
+
+@router.get("/debug/slow_queries", response_model=List[SlowQuery])
+async def get_slow_queries(
+    limit: int = Query(100, ge=1, le=1000, description="Statements to return, newest first"),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    Retrieve the latest slow SQL statements of this worker.
+
+    Statements taking ``slow_query_ms`` or more are kept in a ring buffer of
+    the last ``slow_query_log_size``, with their literals replaced by ``?``.
+
+    Args:
+    - **limit** (int): Number of statements to return.
+    - **current_user** (User): The current authenticated user (must be an admin).
+
+    Raises:
+    - **HTTPException**: If the user is not an admin.
+
+    Returns:
+    - **List[SlowQuery]**: Statements with their duration, request path and time, newest first.
+    """
+
+    is_admin(current_user)
+
+    return slow_query_log.recent(limit)
 
 
-@router.post("/add_photo", response_model=PhotoResponse)
+@router.post("/add_photo", response_model=PhotoResponse, openapi_extra=upload_form(description="string", user_id="integer"))
 async def create_photo(
-    file: UploadFile = File(),
-    description: str = Form(),
-    user_id: int = Form(),
+    request: Request,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Upload a new photo for a specific user.
 
     Args:
-    - **file** (UploadFile): The photo to upload.
-    - **description** (str): Description of the photo.
-    - **user_id** (int): The user ID to assign the photo to.
+    - **file** (form file): The photo to upload, streamed to storage.
+    - **description** (form field): Description of the photo.
+    - **user_id** (form field): The user ID to assign the photo to.
     - **current_user** (User): The current authenticated user (must be an admin).
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
     - **HTTPException**: If the upload or request is invalid.
@@ -87,21 +116,29 @@ async def create_photo(
     # Check if the current user is an admin
     is_admin(current_user)
 
-    # Create a clean file identifier
-    public_id = create_public_id(description, file)
-
     try:
         # Upload the file
-        r = cloudinary.uploader.upload(file.file, public_id=public_id, overwrite=True)
-
-        # Generate the Cloudinary image URL
-        url = cloudinary.CloudinaryImage(public_id).build_url(
-            crop="fill", version=r.get("version")
-        )
-
-        return await repository_admin_moderation.create_photo(
-            user_id, description, url, db
+        upload = await receive_upload(
+            request, current_user.id, create_public_id, required=("description", "user_id")
         )
+        async with repository_blobs.discard_on_error(upload, db):
+            if not upload.fields["user_id"].isdigit():
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="user_id must be an integer"
+                )
+            # The form fields arrive with the file, so the owner is checked once it is stored
+            if await repository_users.get_user_by_id(int(upload.fields["user_id"]), db) is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+            # Reuse the stored file when the same image was uploaded before
+            blob = await repository_blobs.acquire_blob(upload, db)
+
+            # Generate the image URL
+            url = await storage.transform(blob.public_id, blob.version, crop="fill")
+
+            return await repository_admin_moderation.create_photo(
+                int(upload.fields["user_id"]), upload.fields["description"], url, db, blob
+            )
     except AuthorizationRequired as e:
         print(f"Required authorization: {e}.")
     except BadRequest:
@@ -114,14 +151,14 @@ async def create_photo(
 async def read_photo(
     photo_id: int,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Retrieve a photo by its ID.
 
     - **photo_id** (int): The ID of the photo.
     - **current_user** (User): The current authenticated user (must be an admin).
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
     - **HTTPException**: If the photo is not found.
@@ -141,25 +178,24 @@ async def read_photo(
     return photo
 
 
-@router.put("/update-photo/{photo_id}", response_model=PhotoResponse)
+@router.put("/update-photo/{photo_id}", response_model=PhotoResponse, openapi_extra=upload_form(description="string"))
 async def update_photo(
     photo_id: int,
-    file: UploadFile = File(),
-    description: str = Form(),
+    request: Request,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update a photo's information, including file and description.
 
     - **photo_id** (int): The ID of the photo.
-    - **file** (UploadFile): The new file to upload.
-    - **description** (str): The updated description of the photo.
+    - **file** (form file): The new file to upload, streamed to storage.
+    - **description** (form field): The updated description of the photo.
     - **current_user** (User): The current authenticated user (must be an admin).
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
-    - **HTTPException**: If the photo is not found.
+    - **HTTPException**: If the photo is not found, checked before the upload.
 
     Returns:
     - **PhotoResponse**: The updated photo details.
@@ -167,25 +203,31 @@ async def update_photo(
     # Check if the current user is an admin
     is_admin(current_user)
 
-    public_id = create_public_id(description, file)
+    if await repository_admin_moderation.read_photo(photo_id, db) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found"
+        )
 
     try:
         # Upload the file
-        r = cloudinary.uploader.upload(file.file, public_id=public_id, overwrite=True)
+        upload = await receive_upload(request, current_user.id, create_public_id, required=("description",))
 
-        # Generate the Cloudinary image URL
-        url = cloudinary.CloudinaryImage(public_id).build_url(
-            crop="fill", version=r.get("version")
-        )
+        async with repository_blobs.discard_on_error(upload, db):
+            # Reuse the stored file when the same image was uploaded before
+            blob = await repository_blobs.acquire_blob(upload, db)
 
-        photo = await repository_admin_moderation.update_photo(
-            photo_id, url, description, db
-        )
+            # Generate the image URL
+            url = await storage.transform(blob.public_id, blob.version, crop="fill")
 
-        if photo is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found"
+            photo = await repository_admin_moderation.update_photo(
+                photo_id, url, upload.fields["description"], db, blob
             )
+
+            if photo is None:
+                # Deleted while the file was uploading
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found"
+                )
         return photo
 
     except AuthorizationRequired as e:
@@ -200,14 +242,14 @@ async def update_photo(
 async def delete_photo(
     photo_id: int,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Delete a photo by its ID.
 
     - **photo_id** (int): The ID of the photo to delete.
     - **current_user** (User): The current authenticated user (must be an admin).
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
     - **HTTPException**: If the photo is not found.
@@ -232,7 +274,7 @@ async def change_description(
     photo_id: int,
     description: str,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update a photo's description.
@@ -240,7 +282,7 @@ async def change_description(
     - **photo_id** (int): The ID of the photo to update.
     - **description** (str): The new description.
     - **current_user** (User): The current authenticated user (must be an admin).
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
     - **HTTPException**: If the photo is not found.
@@ -266,7 +308,7 @@ async def add_tags(
     photo_id: int,
     body: TagsPhoto,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Add tags to a photo, with a maximum of 5 tags.
@@ -274,7 +316,7 @@ async def add_tags(
     - **photo_id** (int): The ID of the photo.
     - **body** (TagsPhoto): Tags to add to the photo.
     - **current_user** (User): The current authenticated user (must be an admin).
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
     - **HTTPException**: If there are more than 5 tags, or the photo is not found.
@@ -301,14 +343,14 @@ async def add_tags(
 async def remove_comment(
     comment_id: int,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Delete a comment by its ID.
 
     - **comment_id** (int): The ID of the comment to delete.
     - **current_user** (User): The current authenticated user (must be an admin).
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
     - **HTTPException**: If the comment is not found.
@@ -319,14 +361,11 @@ async def remove_comment(
 
     is_admin(current_user)
 
-    deleted_comment = db.query(DB_Comment).filter(DB_Comment.id == comment_id).first()
+    deleted_comment = await repository_comments.delete_comment_by_id(db, comment_id)
 
     if not deleted_comment:
         raise HTTPException(status_code=404, detail="Comment not found")
 
-    db.delete(deleted_comment)
-    db.commit()
-
     return Comment(
         id=deleted_comment.id,
         text=deleted_comment.text,
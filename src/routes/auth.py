@@ -1,6 +1,5 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Security, BackgroundTasks, Request
 from fastapi import APIRouter, HTTPException, status, Depends, Security, Form
-from jose import JWTError, jwt
 
 from src.schemas import (
     UserCreateModel,
@@ -14,14 +13,12 @@ from fastapi.security import (
     HTTPAuthorizationCredentials,
     OAuth2PasswordRequestForm,
 )
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.repository import users as repository_users
-from src.repository.token_blacklist import add_token_to_blacklist
-from src.database.db import get_db
+from src.database.db import get_async_db
 from src.database.models import User
 from pydantic import BaseModel
 from src.routes.permissions import is_admin
-from src.conf.config import settings
 from src.services.email import send_email
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -34,15 +31,16 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
     response_model=UserResponseModel,
     status_code=status.HTTP_201_CREATED,
 )
-async def signup(user: UserCreateModel, background_tasks: BackgroundTasks, request: Request, db: Session = Depends(get_db)):
+async def signup(user: UserCreateModel, background_tasks: BackgroundTasks, request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Create a new user account.
 
     - **user** (UserCreateModel): The user information for registration.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
-    - **HTTPException**: 409 error if the user already exists.
+    - **HTTPException**: 409 error if the user already exists, 429 if too many
+      password hashes are in progress.
 
     Returns:
     - **UserResponseModel**: The newly created user's data.
@@ -59,7 +57,7 @@ async def signup(user: UserCreateModel, background_tasks: BackgroundTasks, reque
     else:
         role = RoleEnum.user
 
-    hashed_password = auth_service.get_password_hash(user.password)
+    hashed_password = await auth_service.get_password_hash(user.password)
 
     user_data = user.model_dump()
     user_data.pop("password")
@@ -79,32 +77,37 @@ async def signup(user: UserCreateModel, background_tasks: BackgroundTasks, reque
 
 @router.post("/login", response_model=TokenModel)
 async def login_user(
-    user: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+    user: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)
 ):
     """
     Log in the user and generate access and refresh tokens.
 
     - **user** (OAuth2PasswordRequestForm): The login credentials.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
-    - **HTTPException**: If the email or password is invalid.
+    - **HTTPException**: If the email or password is invalid, 429 if too many
+      password checks are in progress.
 
     Returns:
     - **TokenModel**: The access and refresh tokens for the user.
     """
 
     user_login = await repository_users.get_user_by_email(user.username, db)
-    if not user_login.confirmed:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Email not confirmed')
     if user_login is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email"
         )
-    if not auth_service.verify_password(user.password, user_login.hashed_password):
+    if not user_login.confirmed:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Email not confirmed')
+    valid, new_hash = await auth_service.verify_and_update_password(user.password, user_login.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password"
         )
+    if new_hash:
+        # Hashed with outdated parameters: stored with the current ones
+        user_login.hashed_password = new_hash
 
     access_token = await auth_service.create_access_token(
         data={"sub": user_login.email}
@@ -123,13 +126,13 @@ async def login_user(
 @router.get("/refresh_token", response_model=TokenModel)
 async def refresh_token(
     credentials: HTTPAuthorizationCredentials = Security(oauth2_scheme),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Refresh the access token using a valid refresh token.
 
     - **credentials** (HTTPAuthorizationCredentials): The authorization credentials with the refresh token.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
     - **HTTPException**: If the refresh token is invalid or mismatched.
@@ -161,12 +164,15 @@ async def refresh_token(
 
 
 @router.post("/logout", status_code=status.HTTP_200_OK)
-async def logout(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def logout(
+    token: str = Depends(oauth2_scheme),
+    payload: dict = Depends(auth_service.get_token_payload),
+):
     """
     Log out the user and add the token to the blacklist.
 
     - **token** (str): The access token.
-    - **db** (Session): Database session dependency.
+    - **payload** (dict): Claims of the access token.
 
     Raises:
     - **HTTPException**: If the token is invalid.
@@ -174,17 +180,8 @@ async def logout(token: str = Depends(oauth2_scheme), db: Session = Depends(get_
     Returns:
     - **dict**: A confirmation message for successful logout.
     """
-
-    try:
-        payload = jwt.decode(
-            token, settings.jwt_secret_key, algorithms=[settings.algorithm]
-        )
-        await add_token_to_blacklist(token, db)
-        return {"detail": f"User has logged out successfully."}
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
-        )
+    await auth_service.logout(token, payload)
+    return {"detail": f"User has logged out successfully."}
 
 
 # Use RoleEnum for role validation
@@ -197,7 +194,7 @@ async def update_user_role(
     user_id: int,
     role_data: RoleUpdateModel,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update the role of a user (admin only).
@@ -205,7 +202,7 @@ async def update_user_role(
     - **user_id** (int): The ID of the user whose role needs to be updated.
     - **role_data** (RoleUpdateModel): The new role for the user.
     - **current_user** (User, optional): The current authenticated admin user.
-    - **db** (Session, optional): Dependency for the database session.
+    - **db** (AsyncSession, optional): Dependency for the database session.
 
     Raises:
     - **HTTPException**: If the user is not found or if the current user is not an admin.
@@ -228,12 +225,12 @@ async def update_user_role(
 
 
 @router.get('/confirmed_email/{token}')
-async def confirmed_email(token: str, db: Session = Depends(get_db)):
+async def confirmed_email(token: str, db: AsyncSession = Depends(get_async_db)):
     """
     Confirm a user's email.
 
     - **token** (str): The security token for email confirmation.
-    - **db** (Session): The database session.
+    - **db** (AsyncSession): The database session.
 
     Raises:
     - **HTTPException**: If the user is not found or if the user's email is already confirmed.
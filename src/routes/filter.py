@@ -1,18 +1,17 @@
 from fastapi import APIRouter, Depends, Query, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from src.database.db import get_db
-from src.schemas import PhotoWithRatingResponse
+from src.database.db import get_async_db
+from src.schemas import Page, PhotoWithRatingResponse
+from src.services.pagination import PageParams, make_page, page_params
 from src.services.filter import filter_photos_by_criteria
 from datetime import date
 from pydantic import TypeAdapter
-from sqlalchemy import func
-from src.database.models import Rating
 
 router = APIRouter(prefix="/photos", tags=["photos"])
 
 
-@router.get("/filter", response_model=List[PhotoWithRatingResponse])
+@router.get("/filter", response_model=Page[PhotoWithRatingResponse])
 async def filter_photos(
     min_rating: Optional[float] = Query(
         None, ge=0, le=5, description="Min rating (0-5)"
@@ -22,7 +21,8 @@ async def filter_photos(
     ),
     start_date: Optional[str] = Query(None, description="Start Date (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="End Date (YYYY-MM-DD)"),
-    db: Session = Depends(get_db),
+    params: PageParams = Depends(page_params()),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Filter photos based on rating and date.
@@ -31,13 +31,15 @@ async def filter_photos(
     - **max_rating** (RoleUpdateModel): The min rating limitation.
     - **start_date** (User, optional): The min date of photo creation.
     - **end_date** (User, optional): The min date of photo creation.
-    - **db** (Session): Database session dependency.
+    - **limit** (int): Page size (1-100).
+    - **cursor** (str, optional): ``next_cursor`` of the previous page.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
-    - **HTTPException**: If the photo is not found or Wrong date format used.
+    - **HTTPException**: If the photo is not found, Wrong date format used or the cursor is invalid.
 
     Returns:
-    - **dict**: A confirmation message for successful role update.
+    - **Page[PhotoWithRatingResponse]**: One page of the photos, ordered by id.
     """
     try:
         date_adapter = TypeAdapter(Optional[date])
@@ -50,8 +52,9 @@ async def filter_photos(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Wrong date format!"
         )
 
-    photos = filter_photos_by_criteria(
-        db, min_rating, max_rating, start_date_parsed, end_date_parsed
+    after = params.after(int)
+    photos = await filter_photos_by_criteria(
+        db, min_rating, max_rating, start_date_parsed, end_date_parsed, params.fetch, after[0] if after else None
     )
 
     if not photos:
@@ -59,21 +62,14 @@ async def filter_photos(
             status_code=status.HTTP_404_NOT_FOUND, detail="Photo(s) not found!"
         )
 
-    result = []
-    for photo in photos:
-        avg_rating = (
-            db.query(func.avg(Rating.rating))
-            .filter(Rating.photo_id == photo.id)
-            .scalar()
-            or 0
-        )
-        result.append(
-            {
-                "id": photo.id,
-                "url": photo.url,
-                "description": photo.description,
-                "rating": round(avg_rating, 2),
-            }
-        )
-
-    return result
+    page = make_page(photos, params, lambda photo: (photo.id,))
+    page["items"] = [
+        {
+            "id": photo.id,
+            "url": photo.url,
+            "description": photo.description,
+            "rating": round(photo.avg_rating or 0, 2),
+        }
+        for photo in page["items"]
+    ]
+    return page
@@ -0,0 +1,60 @@
+import secrets
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import Response
+from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.conf.config import settings
+from src.database.db import async_engine, get_async_db
+from src.routes.permissions import is_admin
+from src.services.auth import auth_service
+from src.services.cloudinary_client import cloudinary_client
+from src.services.metrics import CacheCollector, PoolCollector
+from src.services.qr_codes import qr_cache
+from src.services.storage import storage
+from src.services.user_cache import user_cache
+
+router = APIRouter(tags=["metrics"])
+
+REGISTRY.register(PoolCollector(lambda: async_engine.pool))
+REGISTRY.register(CacheCollector({
+    "user": lambda: user_cache,
+    "derivative": lambda: storage.derivatives,
+    "qr_code": lambda: qr_cache,
+    "cloudinary_resource": lambda: cloudinary_client,
+}))
+
+basic_auth = HTTPBasic(auto_error=False)
+
+
+async def metrics_access(
+    request: Request,
+    credentials: HTTPBasicCredentials | None = Depends(basic_auth),
+    db: AsyncSession = Depends(get_async_db),
+) -> None:
+    """
+    Let in scrapers sending ``metrics_token`` as their HTTP Basic password, and admins.
+
+    Raises:
+    - **HTTPException**: 401 without valid credentials, 403 if the user is not an admin.
+    """
+    token = settings.metrics_token
+    if token and credentials and secrets.compare_digest(credentials.password.encode(), token.encode()):
+        return
+    bearer = await auth_service.oauth2_scheme(request)
+    is_admin(await auth_service.get_current_user(request, bearer, db))
+
+
+@router.get("/metrics", include_in_schema=False, dependencies=[Depends(metrics_access)])
+def read_metrics():
+    """
+    Metrics of this worker in the Prometheus text format.
+
+    Requests per route, their latency and those in progress, SQL statements
+    per request and their time, database pool connections, Cloudinary call
+    latency and errors, cache hit ratios and event loop lag. Served to
+    admins, and to scrapers sending ``metrics_token`` (HTTP Basic password).
+    """
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
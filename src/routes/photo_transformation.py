@@ -1,33 +1,29 @@
 from typing import List, Any, Coroutine, Union
-from fastapi import APIRouter, Depends, status, UploadFile, File, HTTPException, Form, Query
+from fastapi import APIRouter, Depends, status, UploadFile, File, HTTPException, Form, Query, Request
 from fastapi.exceptions import ResponseValidationError
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-import cloudinary
-import cloudinary.uploader
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from cloudinary.exceptions import Error, AuthorizationRequired, BadRequest
-from qrcode import QRCode
-from qrcode.constants import ERROR_CORRECT_L
-from io import BytesIO
 
-from src.database.db import get_db
+from src.database.db import get_async_db
 from src.repository import photo_transformation as repository_effects
 from src.repository import photos as repository_photos
-from src.photo_effects_schemas import CropEnum, GravityEnum, PhotoEffectResponse
-from src.conf.config import settings
+from src.photo_effects_schemas import (
+    BatchTransformationModel,
+    BatchTransformationResponse,
+    CropEnum,
+    GravityEnum,
+    PhotoEffectResponse,
+    QRCodeFormatEnum,
+    TransformationHistoryResponse,
+    TransformationModel,
+)
 from src.services.auth import auth_service
+from src.services.qr_codes import MEDIA_TYPES, qr_cache, qr_digest
 from src.database.models import User
 
 router = APIRouter(prefix="/photo_effects", tags=["photo_effects"])
 
-cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True
-    )
-
-
 @router.post('/gravity_crop/{photo_id}', response_model=PhotoEffectResponse)
 async def change_size(photo_id: int,
                       aspect_ratio: str,
@@ -35,18 +31,18 @@ async def change_size(photo_id: int,
                       crop: CropEnum = Query(..., description="Choose a parameter"),
                       gravity: GravityEnum = Query(default='auto', description="Choose a parameter"),
                       current_user: User = Depends(auth_service.get_current_user),
-                      db: Session = Depends(get_db)):
+                      db: AsyncSession = Depends(get_async_db)):
     """
     Change the size of a photo.
 
     - **photo_id** (int): The ID of the photo.
-    - **height** (int): The new height of the photo.
+    - **aspect_ratio** (str): Aspect ratio of the result, e.g. ``1.5`` or ``16:9``.
     - **width** (int): The new width of the photo.
     - **crop** (CropEnum): Crop options.
     - **gravity** (GravityEnum): Gravity options.
     - **background** (str): Background options.
     - **current_user** (User): The current authenticated user.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
     - **HTTPException**: If the photo is not found or if the dimensions are invalid.
@@ -56,8 +52,8 @@ async def change_size(photo_id: int,
     """
     
     # Check validity of dimensions
-    if width <= 0 or height <= 0:
-        raise HTTPException(status_code=400, detail="Width and height must be positive numbers.")
+    if width <= 0:
+        raise HTTPException(status_code=400, detail="Width must be a positive number.")
 
     # Check gravity and crop combinations
     if gravity != 'auto' and crop not in ['fill', 'crop']:
@@ -79,7 +75,7 @@ async def coordinates_crop(photo_id: int,
                            y_coordinate: int,
                            crop: CropEnum = Query(..., description="Choose a parameter"),
                            current_user: User = Depends(auth_service.get_current_user),
-                           db: Session = Depends(get_db)):
+                           db: AsyncSession = Depends(get_async_db)):
 
     transformed_photo = await repository_effects.coordinates_crop(photo_id, aspect_ratio, width, x_coordinate,
                                                                   y_coordinate, crop.value, current_user, db)
@@ -87,10 +83,118 @@ async def coordinates_crop(photo_id: int,
     return transformed_photo
 
 
+@router.post('/transform/{photo_id}', response_model=PhotoEffectResponse)
+async def apply_transformation(photo_id: int,
+                               body: TransformationModel,
+                               current_user: User = Depends(auth_service.get_current_user),
+                               db: AsyncSession = Depends(get_async_db)):
+    """
+    Transform a photo and add the step to its history.
+
+    - **photo_id** (int): The ID of the photo.
+    - **body** (TransformationModel): crop, width, height, aspect_ratio, gravity, x and y.
+
+    Raises:
+    - **HTTPException**: If the photo is not found or the options are invalid.
+
+    Returns:
+    - **PhotoEffectResponse**: The photo with its transformed URL.
+    """
+    return await repository_effects.apply_transformation(photo_id, body.params(), current_user, db)
+
+
+@router.post('/transform_batch', response_model=BatchTransformationResponse)
+async def apply_transformation_batch(body: BatchTransformationModel,
+                                     current_user: User = Depends(auth_service.get_current_user),
+                                     db: AsyncSession = Depends(get_async_db)):
+    """
+    Apply the same transformation to several photos and add the step to their histories.
+
+    - **photo_ids** (list[int]): The IDs of the photos, at most ``transformation_batch_max_photos``.
+    - **transformation** (TransformationModel): crop, width, height, aspect_ratio, gravity, x and y.
+
+    Raises:
+    - **HTTPException**: If too many photos are sent.
+
+    Returns:
+    - **BatchTransformationResponse**: The number of photos transformed and, per photo, its
+      status code (404 if it is not found) with the transformed URL or the error.
+    """
+    items = await repository_effects.apply_transformation_batch(
+        body.photo_ids, body.transformation.params(), current_user, db
+    )
+    return {
+        'applied': sum(item['status_code'] == status.HTTP_200_OK for item in items),
+        'items': items,
+    }
+
+
+@router.post('/undo/{photo_id}', response_model=PhotoEffectResponse)
+async def undo_transformation(photo_id: int,
+                              current_user: User = Depends(auth_service.get_current_user),
+                              db: AsyncSession = Depends(get_async_db)):
+    """
+    Go back one step in the transformation history of a photo.
+
+    Raises:
+    - **HTTPException**: 404 if the photo is not found, 400 at the start of the history.
+    """
+    return await repository_effects.undo_transformation(photo_id, current_user, db)
+
+
+@router.post('/redo/{photo_id}', response_model=PhotoEffectResponse)
+async def redo_transformation(photo_id: int,
+                              current_user: User = Depends(auth_service.get_current_user),
+                              db: AsyncSession = Depends(get_async_db)):
+    """
+    Apply again the next step of the transformation history of a photo.
+
+    Raises:
+    - **HTTPException**: 404 if the photo is not found, 400 at the end of the history.
+    """
+    return await repository_effects.redo_transformation(photo_id, current_user, db)
+
+
+@router.post('/jump/{photo_id}/{position}', response_model=PhotoEffectResponse)
+async def jump_to_transformation(photo_id: int,
+                                 position: int,
+                                 current_user: User = Depends(auth_service.get_current_user),
+                                 db: AsyncSession = Depends(get_async_db)):
+    """
+    Show any step of the transformation history of a photo.
+
+    - **position** (int): Step number from the history, 0 for the photo itself.
+
+    Raises:
+    - **HTTPException**: 404 if the photo is not found, 400 if there is no such step.
+    """
+    return await repository_effects.jump_to_transformation(photo_id, position, current_user, db)
+
+
+@router.get('/history/{photo_id}', response_model=TransformationHistoryResponse)
+async def get_transformation_history(photo_id: int,
+                                     current_user: User = Depends(auth_service.get_current_user),
+                                     db: AsyncSession = Depends(get_async_db)):
+    """
+    List the transformation history of a photo and the step shown.
+
+    Raises:
+    - **HTTPException**: If the photo is not found.
+    """
+    photo, steps = await repository_effects.get_transformations(photo_id, current_user, db)
+    return {
+        'photo_id': photo.id,
+        'position': photo.transformation_position,
+        'url': photo.url,
+        'transformed_url': photo.transformed_url,
+        'transformations': steps,
+    }
+
+
 @router.post('/reset_transformation/{photo_id}')
 async def reset_transformation(photo_id: int,
                                current_user: User = Depends(auth_service.get_current_user),
-                               db: Session = Depends(get_db)):
+                               db: AsyncSession = Depends(get_async_db)):
 
     transformed_photo = await repository_effects.reset_transformation(photo_id, current_user, db)
 
@@ -100,7 +204,7 @@ async def reset_transformation(photo_id: int,
 @router.post('/save_transformation/{photo_id}')
 async def save_transformation(photo_id: int,
                               current_user: User = Depends(auth_service.get_current_user),
-                              db: Session = Depends(get_db)):
+                              db: AsyncSession = Depends(get_async_db)):
 
     transformed_photo = await repository_effects.save_transformation(photo_id, current_user, db)
 
@@ -110,54 +214,48 @@ async def save_transformation(photo_id: int,
 @router.post('/roll_back_transformations/{photo_id}')
 async def roll_back_transformations(photo_id: int,
                                     current_user: User = Depends(auth_service.get_current_user),
-                                    db: Session = Depends(get_db)):
+                                    db: AsyncSession = Depends(get_async_db)):
 
     transformed_photo = await repository_effects.roll_back_transformations(photo_id, current_user, db)
 
     return {'photo_url': transformed_photo.url, 'transformed_photo': transformed_photo.url, 'message': 'All the transformations were canceled'}
 
 
-@router.post('/get_qr_code/{photo_id}')
+@router.api_route('/get_qr_code/{photo_id}', methods=['GET', 'POST'])
 async def generate_qr(photo_id: int,
+                      request: Request,
+                      format: QRCodeFormatEnum = Query(default='png', description="Image format"),
                       current_user: User = Depends(auth_service.get_current_user),
-                      db: Session = Depends(get_db)):
+                      db: AsyncSession = Depends(get_async_db)):
 
     """
     Generate a QR code for a photo.
 
     - **photo_id** (int): The ID of the photo.
+    - **format** (QRCodeFormatEnum): ``png`` or ``svg``.
     - **current_user** (User): The current authenticated user.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
+
+    The ETag is a hash of the encoded URL, so a request with a matching
+    ``If-None-Match`` is answered 304 without loading the image; otherwise
+    the image comes from the QR code cache and is rendered only once.
 
     Raises:
     - **HTTPException**: If the photo is not found.
 
     Returns:
-    - **StreamingResponse**: The QR code as a PNG image.
+    - **Response**: The QR code of the transformed photo URL as a PNG or SVG image.
     """
     photo = await repository_photos.read_photo(photo_id, current_user, db)
-    url = photo.transformed_url
-
-    # Create the object of QR-code
-    qr = QRCode(
-        version=1,
-        error_correction=ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-
-    # Add data into QR-code
-    qr.add_data(url)
-    qr.make(fit=True)
-
-    # Generate image of qr-code
-    img = qr.make_image(fill="black", back_color="white")
-
-    #  saves image in memory buffer
-    img_io = BytesIO()
-    img.save(img_io, 'PNG')
-    img_io.seek(0)
-
-    # Returns image as StreamingResponse
-    return StreamingResponse(img_io, media_type="image/png")
-
+    if photo is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found")
+    url = photo.transformed_url or photo.url
+
+    etag = f'"{qr_digest(url, format.value)}"'
+    # Revalidated every time: the photo can be transformed again
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if etag in [tag.strip().removeprefix('W/') for tag in request.headers.get('if-none-match', '').split(',')]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    image = await qr_cache.get(url, format.value)
+    return Response(image, media_type=MEDIA_TYPES[format.value], headers=headers)
@@ -1,64 +1,92 @@
-from typing import List
-from fastapi import APIRouter, Depends, status, UploadFile, File, HTTPException, Form
-from sqlalchemy.orm import Session
-import cloudinary
-import cloudinary.uploader
+from datetime import datetime
+from secrets import token_hex
+from typing import List, Optional
+from fastapi import APIRouter, Depends, status, HTTPException, Form, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from cloudinary.exceptions import Error, AuthorizationRequired, BadRequest
 
-from src.database.db import get_db
+from src.database.db import get_async_db
 from src.repository import photos as repository_photos
-from src.schemas import PhotoResponse, PhotoModel, TagsPhoto, TagModel
-from src.conf.config import settings
+from src.repository import blobs as repository_blobs
+from src.schemas import Page, PhotoFeedItem, PhotoResponse, PhotoModel, TagsPhoto, TagModel
 from src.services.auth import auth_service
 from src.database.models import User
 from src.services.average_rating import get_average_rating
+from src.services.pagination import PageParams, make_page, page_params
+from src.services.storage import storage
+from src.services.upload import receive_upload, upload_form
 
 router = APIRouter(prefix="/photos", tags=["photos"])
 
-cloudinary.config(
-    cloud_name=settings.cloudinary_name,
-    api_key=settings.cloudinary_api_key,
-    api_secret=settings.cloudinary_api_secret,
-    secure=True,
-)
+def create_public_id(user_name: str, filename: str) -> str:
+    """Cloudinary public id of a new upload; the random suffix keeps earlier uploads intact."""
+    clean_filename = filename.replace(".", "")
+    return f"PhotoShare/{user_name}{clean_filename}{token_hex(4)}"
 
-# TODO: fetch all photos of all users
+
+@router.get("/feed", response_model=Page[PhotoFeedItem])
+async def get_feed(
+    params: PageParams = Depends(page_params()),
+    tag: Optional[str] = Query(None, description="Only photos with this tag"),
+    user_id: Optional[int] = Query(None, description="Only photos of this user"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Retrieve one page of the photos of all users, newest first.
+
+    - **limit** (int): Page size (1-100).
+    - **cursor** (str, optional): ``next_cursor`` of the previous page.
+    - **tag** (str, optional): Only photos with this tag.
+    - **user_id** (int, optional): Only photos of this user.
+    - **db** (AsyncSession): Database session dependency.
+
+    Raises:
+    - **HTTPException**: 400 error if the cursor is invalid.
+
+    Returns:
+    - **Page[PhotoFeedItem]**: The photos and the cursor of the next page (null on the last page).
+    """
+    photos = await repository_photos.get_feed(db, params.fetch, params.after(datetime, int), tag, user_id)
+    return make_page(photos, params, lambda photo: (photo.created_at, photo.id))
 
 
-@router.post("/post_photo", response_model=PhotoResponse)
+@router.post("/post_photo", response_model=PhotoResponse, openapi_extra=upload_form(description="string"))
 async def create_photo(
-    file: UploadFile = File(),
-    description: str = Form(),
+    request: Request,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Upload a new photo to Cloudinary and save it in the database.
+
+    The multipart form is streamed to storage as it arrives.
+
     Args:
-    - **file** (UploadFile): The photo file to be uploaded.
-    - **description** (str): Description of the photo.
+    - **file** (form file): The photo file to be uploaded.
+    - **description** (form field): Description of the photo.
     - **current_user** (User): The current authenticated user.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Returns:
     - **PhotoResponse**: The created photo details.
     """
-    # Create a clean file identifier
-    clean_description = description[:7].replace(" ", "")
-    clean_filename = file.filename.replace(".", "")
     user_name = current_user.username
-    public_id = f"PhotoShare/{user_name}{clean_description}{clean_filename}"
 
     try:
         # Upload the file
-        r = cloudinary.uploader.upload(file.file, public_id=public_id, overwrite=True)
-
-        # Generate the Cloudinary image URL
-        url = cloudinary.CloudinaryImage(public_id).build_url(
-            version=r.get("version")
+        upload = await receive_upload(
+            request, current_user.id, lambda filename: create_public_id(user_name, filename),
+            required=("description",),
         )
 
-        return await repository_photos.create_photo(description, url, current_user, db)
+        async with repository_blobs.discard_on_error(upload, db):
+            # Reuse the stored file when the same image was uploaded before
+            blob = await repository_blobs.acquire_blob(upload, db)
+
+            # Generate the image URL
+            url = storage.url(blob.public_id, version=blob.version)
+
+            return await repository_photos.create_photo(upload.fields["description"], url, current_user, db, blob)
     except AuthorizationRequired as e:
         print(f"Required authorization: {e}.")
     except BadRequest:
@@ -71,7 +99,7 @@ async def create_photo(
 async def read_photo(
     photo_id: int,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Retrieve details of a photo by its ID.
@@ -79,7 +107,7 @@ async def read_photo(
     Args:
     - **photo_id** (int): ID of the photo.
     - **current_user** (User): The current authenticated user.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Returns:
     - **PhotoResponse**: The photo details.
@@ -93,48 +121,56 @@ async def read_photo(
     return photo
 
 
-@router.put("/update_photo/{photo_id}", response_model=PhotoResponse)
+@router.put("/update_photo/{photo_id}", response_model=PhotoResponse, openapi_extra=upload_form(description="string"))
 async def update_photo(
     photo_id: int,
-    file: UploadFile = File(),
-    description: str = Form(),
+    request: Request,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update the photo and its description.
 
     - **photo_id** (int): ID of the photo.
-    - **file** (UploadFile): The new photo file to be uploaded.
-    - **description** (str): New description for the photo.
-    - **db** (Session): Database session dependency.
+    - **file** (form file): The new photo file to be uploaded.
+    - **description** (form field): New description for the photo.
+    - **db** (AsyncSession): Database session dependency.
     - **current_user** (User): The current authenticated user.
 
+    Raises:
+    - **HTTPException**: 404 error if the user has no photo with this ID, checked before the upload.
+
     Returns:
     - **PhotoResponse**: The updated photo details.
     """
 
-    # Create a clean file identifier
-    clean_description = description[:7].replace(" ", "")
-    clean_filename = file.filename.replace(".", "")
     user_name = current_user.username
-    public_id = f"PhotoShare/{user_name}{clean_description}{clean_filename}"
+
+    if await repository_photos.get_photo(photo_id, current_user, db) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found"
+        )
 
     try:
         # Upload the file
-        r = cloudinary.uploader.upload(file.file, public_id=public_id, overwrite=True)
-        # Generate the Cloudinary image URL
-        url = cloudinary.CloudinaryImage(public_id).build_url(
-            version=r.get("version")
+        upload = await receive_upload(
+            request, current_user.id, lambda filename: create_public_id(user_name, filename),
+            required=("description",),
         )
-        photo = await repository_photos.update_photo(
-            photo_id, url, description, current_user, db
-        )
-
-        if photo is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found"
+        async with repository_blobs.discard_on_error(upload, db):
+            # Reuse the stored file when the same image was uploaded before
+            blob = await repository_blobs.acquire_blob(upload, db)
+            # Generate the image URL
+            url = storage.url(blob.public_id, version=blob.version)
+            photo = await repository_photos.update_photo(
+                photo_id, url, upload.fields["description"], current_user, db, blob
             )
+
+            if photo is None:
+                # Deleted while the file was uploading
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found"
+                )
         return photo
 
     except AuthorizationRequired as e:
@@ -149,14 +185,14 @@ async def update_photo(
 async def delete_photo(
     photo_id: int,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Delete a photo by its ID.
 
     - **photo_id** (int): The ID of the photo.
     - **current_user** (User): The current authenticated user.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
     - **HTTPException**: If the photo is not found.
@@ -175,7 +211,7 @@ async def change_description(
     photo_id: int,
     description: str = Form(),
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update the description of a photo.
@@ -183,7 +219,7 @@ async def change_description(
     - **photo_id** (int): The ID of the photo.
     - **description** (str): New description for the photo.
     - **current_user** (User): The current authenticated user.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
     - **HTTPException**: If the photo is not found.
@@ -202,64 +238,65 @@ async def change_description(
     return photo
 
 
-@router.get("/get_users_photos/{user_id}", response_model=List[PhotoResponse])
+@router.get("/get_users_photos/{user_id}", response_model=Page[PhotoResponse])
 async def get_users_photos(
     user_id: int,
+    params: PageParams = Depends(page_params()),
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Retrieve all photos posted by a specific user.
+    Retrieve the photos posted by a specific user, newest first.
 
     - **user_id** (int): The ID of the user.
+    - **limit** (int): Page size (1-100).
+    - **cursor** (str, optional): ``next_cursor`` of the previous page.
     - **current_user** (User): The current authenticated user.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
-    - **HTTPException**: If the user is not found.
+    - **HTTPException**: If the user is not found or the cursor is invalid.
 
     Returns:
-    - **List[PhotoResponse]**: List of the user's photos.
+    - **Page[PhotoResponse]**: One page of the user's photos, empty if they posted none.
     """
 
-    photos = await repository_photos.get_users_photos(user_id, current_user, db)
-    if len(photos) == 0:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User didn't post any photos"
-        )
-    return photos
+    photos = await repository_photos.get_users_photos(
+        user_id, current_user, db, params.fetch, params.after(datetime, int)
+    )
+    return make_page(photos, params, lambda photo: (photo.created_at, photo.id))
 
 
-@router.get("/get_my_photos/", response_model=List[PhotoResponse])
+@router.get("/get_my_photos/", response_model=Page[PhotoResponse])
 async def get_my_photos(
+    params: PageParams = Depends(page_params()),
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Retrieve all photos posted by the current user.
+    Retrieve the photos posted by the current user, newest first.
 
+    - **limit** (int): Page size (1-100).
+    - **cursor** (str, optional): ``next_cursor`` of the previous page.
     - **current_user** (User): The current authenticated user.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Returns:
-    - **List[PhotoResponse]**: List of the user's photos.
+    - **Page[PhotoResponse]**: One page of the user's photos, empty if they posted none.
     """
 
-
-    photos = await repository_photos.get_users_photos(current_user.id, current_user, db)
-    if len(photos) == 0:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User didn't post any photos"
-        )
-    return photos
+    photos = await repository_photos.get_users_photos(
+        current_user.id, current_user, db, params.fetch, params.after(datetime, int)
+    )
+    return make_page(photos, params, lambda photo: (photo.created_at, photo.id))
 
 @router.get("/{photo_id}/average-rating")
-async def average_rating(photo_id: int, db: Session = Depends(get_db)):
+async def average_rating(photo_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Retrieve the average rating for a photo.
 
     - **photo_id** (int): The ID of the photo.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
     - **HTTPException**: 404 error if the photo is not found or has no ratings.
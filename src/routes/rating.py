@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from src.database.db import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database.db import get_async_db
 from src.schemas import Rating, RatingCreate
 from src.database.models import User, Photo
-from src.services.rating import add_rating
+from src.services.rating import add_rating, delete_rating
 from src.services.auth import auth_service
+from src.routes.permissions import is_moderator_or_admin
 
 router = APIRouter(prefix="/photos", tags=["photos"])
 
@@ -13,7 +14,7 @@ router = APIRouter(prefix="/photos", tags=["photos"])
 async def rate_photo(
     photo_id: int,
     rating: RatingCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -21,7 +22,7 @@ async def rate_photo(
 
     - **photo_id** (int): The ID of the photo to rate.
     - **rating** (RatingCreate): The rating data.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
     - **current_user** (User): The current authenticated user.
 
     Raises:
@@ -31,7 +32,7 @@ async def rate_photo(
     - **Rating**: The created rating for the photo.
     """
 
-    photo = db.query(Photo).filter(Photo.id == photo_id).first()
+    photo = await db.get(Photo, photo_id)
     if not photo:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found!"
@@ -51,3 +52,28 @@ async def rate_photo(
         )
 
     return result
+
+
+@router.delete("/ratings/{rating_id}", response_model=Rating)
+async def remove_rating(
+    rating_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    Delete a rating (moderators and admins only).
+
+    - **rating_id** (int): The ID of the rating to delete.
+    - **db** (AsyncSession): Database session dependency.
+    - **current_user** (User): The current authenticated user.
+
+    Raises:
+    - **HTTPException**: If the rating is not found or the user is not a moderator or admin.
+
+    Returns:
+    - **Rating**: The deleted rating.
+    """
+
+    is_moderator_or_admin(current_user)
+
+    return await delete_rating(db=db, rating_id=rating_id)
@@ -1,29 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from src.schemas import PhotoResponse
+from src.schemas import Page, PhotoResponse
+from src.services.pagination import PageParams, make_page, page_params
 from src.services.search import search_photos
-from src.database.db import get_db
+from src.database.db import get_async_db
 
 router = APIRouter(prefix="/photos", tags=["photos"])
 
 
-@router.get("/search", response_model=List[PhotoResponse])
+@router.get("/search", response_model=Page[PhotoResponse])
 async def search_photos_route(
-    tag: str = None, keyword: str = None, db: Session = Depends(get_db)
+    tag: str = None,
+    keyword: str = None,
+    params: PageParams = Depends(page_params()),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Search for photos by tag or keyword.
 
     - **tag** (str, optional): Tag to filter photos by.
-    - **keyword** (str, optional): Keyword to filter photos by.
-    - **db** (Session): Database session dependency.
+    - **keyword** (str, optional): Words to look for in descriptions and tag names,
+      prefix matching, best matches first.
+    - **limit** (int): Page size (1-100).
+    - **cursor** (str, optional): ``next_cursor`` of the previous page.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
-    - **HTTPException**: 400 error if neither 'tag' nor 'keyword' is provided.
+    - **HTTPException**: 400 error if neither 'tag' nor 'keyword' is provided, or the cursor is invalid.
 
     Returns:
-    - **List[PhotoResponse]**: List of photos matching the search criteria.
+    - **Page[PhotoResponse]**: One page of the photos matching the search criteria.
     """
 
     if not tag and not keyword:
@@ -32,6 +39,10 @@ async def search_photos_route(
             detail="At least one of 'tag' or 'keyword' must be provided",
         )
 
-    photos = await search_photos(tag, keyword, db)
+    if keyword:
+        # Ranked results: the cursor holds the rank and id of the last photo
+        photos = await search_photos(tag, keyword, db, params.fetch, params.after((int, float), int))
+        return make_page(photos, params, lambda photo: (photo.search_rank, photo.id))
 
-    return photos
+    photos = await search_photos(tag, keyword, db, params.fetch, params.after(int))
+    return make_page(photos, params, lambda photo: (photo.id,))
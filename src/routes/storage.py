@@ -0,0 +1,60 @@
+import asyncio
+from pathlib import PurePosixPath
+
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import FileResponse, Response
+from cloudinary.exceptions import BadRequest
+
+from src.conf.config import settings
+from src.services.storage import VERSION_PREFIX, LocalStorage, storage
+from src.services.upload import SNIFF_BYTES, sniff_image_type
+
+router = APIRouter(prefix="/storage", tags=["storage"])
+
+
+@router.get("/files/{path:path}", response_class=FileResponse)
+async def read_file(path: str):
+    """
+    Serve an image of the local storage backend.
+
+    - **path** (str): ``[v<version>/]<public id>``, as built by ``storage.url``.
+
+    Versioned URLs never change and are cached for a year. With
+    ``storage_local_accel_redirect`` set the file is sent by nginx
+    (``X-Accel-Redirect``), otherwise by ``FileResponse``, which uses
+    ``sendfile`` on servers supporting the ASGI pathsend extension.
+
+    Raises:
+    - **HTTPException**: 404 if the file does not exist or storage is not local.
+    """
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    key = VERSION_PREFIX.sub("", path)
+    try:
+        file_path = storage.path(key)
+    except BadRequest:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    if any(part.startswith(".") for part in PurePosixPath(key).parts):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+
+    def read_head() -> bytes | None:
+        try:
+            with open(file_path, "rb") as file:
+                return file.read(SNIFF_BYTES)
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            return None
+
+    # Off the event loop, like every file system call of LocalStorage
+    head = await asyncio.to_thread(read_head)
+    if head is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    media_type = sniff_image_type(head) or "application/octet-stream"
+    storage.derivatives.touch(key)
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable" if key != path else "no-cache",
+        "X-Content-Type-Options": "nosniff",
+    }
+    if settings.storage_local_accel_redirect:
+        headers["X-Accel-Redirect"] = settings.storage_local_accel_redirect.rstrip("/") + "/" + key
+        return Response(media_type=media_type, headers=headers)
+    return FileResponse(file_path, media_type=media_type, headers=headers)
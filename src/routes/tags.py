@@ -1,12 +1,13 @@
 from typing import List
 from fastapi import APIRouter, Depends, status, UploadFile, File, HTTPException, Form
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.db import get_db
+from src.database.db import get_async_db
 from src.database.models import User
 from src.repository import tags as repository_tags
-from src.schemas import PhotoResponse, PhotoModel, TagsPhoto, TagModel
+from src.schemas import Page, PhotoResponse, PhotoModel, TagsPhoto, TagModel
 from src.services.auth import auth_service
+from src.services.pagination import PageParams, make_page, page_params
 
 
 router = APIRouter(prefix="/tags", tags=["tags"])
@@ -17,14 +18,14 @@ async def add_tags(
     photo_id: int,
     body: TagsPhoto,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Add multiple tags to a photo (max 5).
 
     - **photo_id** (int): The ID of the photo to update.
     - **body** (TagsPhoto): The tags to add.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
     - **current_user** (User): The current authenticated user.
 
     Raises:
@@ -47,14 +48,14 @@ async def add_tags(
 async def remove_tags(
     photo_id: int,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Remove all tags from a photo.
 
     - **photo_id** (int): The ID of the photo to update.
     - **current_user** (User): The current authenticated user.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
     - **HTTPException**: If the photo is not found.
@@ -76,14 +77,14 @@ async def add_tag(
     photo_id: int,
     tag: str = Form(),
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Add a single tag to a photo.
 
     - **photo_id** (int): The ID of the photo to update.
     - **tag** (str): The tag to add.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
     - **current_user** (User): The current authenticated user.
 
     Raises:
@@ -106,14 +107,14 @@ async def remove_tag(
     photo_id: int,
     tag: str = Form(),
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Remove a single tag from a photo.
 
     - **photo_id** (int): The ID of the photo to update.
     - **tag** (str): The tag to remove.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
     - **current_user** (User): The current authenticated user.
 
     Raises:
@@ -131,25 +132,31 @@ async def remove_tag(
     return photo
 
 
-@router.get("/search_photos/by_tag", response_model=List[PhotoResponse])
-async def search_photos_by_tag(tag: str, db: Session = Depends(get_db)):
+@router.get("/search_photos/by_tag", response_model=Page[PhotoResponse])
+async def search_photos_by_tag(
+    tag: str,
+    params: PageParams = Depends(page_params()),
+    db: AsyncSession = Depends(get_async_db),
+):
     """
-    Search for photos by tag.
+    Search for photos by tag, newest first.
 
     - **tag** (str): The tag to search for.
-    - **db** (Session): Database session dependency.
+    - **limit** (int): Page size (1-100).
+    - **cursor** (str, optional): ``next_cursor`` of the previous page.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
-    - **HTTPException**: If no photos are found.
+    - **HTTPException**: If no photos are found or the cursor is invalid.
 
     Returns:
-    - **List[PhotoResponse]**: A list of photos with the specified tag.
+    - **Page[PhotoResponse]**: One page of the photos with the specified tag.
     """
 
-    photos = await repository_tags.search_photos(tag, db)
-    print(photos)
+    after = params.after(int)
+    photos = await repository_tags.search_photos(tag, db, params.fetch, after[0] if after else None)
     if photos is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Photos not found"
         )
-    return photos
+    return make_page(photos, params, lambda photo: (photo.id,))
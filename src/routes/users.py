@@ -1,14 +1,12 @@
-import cloudinary
-import cloudinary.uploader
-
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import User
-from src.database.db import get_db
+from src.database.db import get_async_db
 from src.services.auth import auth_service
+from src.services.storage import storage
+from src.services.upload import receive_upload, upload_form
 from src.schemas import UserAverageRating, UserDbModel, UserProfilePublic, UserProfileEdit
-from src.conf.config import settings
 from src.repository import users as repository_users
 from src.services.average_rating import get_user_rating
 
@@ -32,14 +30,14 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
 @router.put("/me/", response_model=UserDbModel)
 async def update_my_profile(update_data: UserProfileEdit,
                             current_user: User = Depends(auth_service.get_current_user),
-                            db: Session = Depends(get_db)):
+                            db: AsyncSession = Depends(get_async_db)):
     """
     Update the current authenticated user's profile.
 
     Arguments:
     - **update_data** (UserProfileEdit): The updated user profile data.
     - **current_user** (User): The current authenticated user.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
     - **HTTPException**: If the user does not exist or if the username is not at least 5 characters long or if the phone number is not at least 10 characters long and consists only of digits.
@@ -63,16 +61,16 @@ async def update_my_profile(update_data: UserProfileEdit,
     return updated_user
 
 
-@router.patch('/avatar', response_model=UserDbModel)
-async def update_avatar_user(file: UploadFile = File(), current_user: User = Depends(auth_service.get_current_user),
-                             db: Session = Depends(get_db)):
+@router.patch('/avatar', response_model=UserDbModel, openapi_extra=upload_form())
+async def update_avatar_user(request: Request, current_user: User = Depends(auth_service.get_current_user),
+                             db: AsyncSession = Depends(get_async_db)):
     """
     Update the current authenticated user's avatar.
 
     Arguments:
-    - **file** (UploadFile): The avatar image to upload.
+    - **file** (form file): The avatar image to upload, streamed to storage.
     - **current_user** (User): The current authenticated user.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
     - **HTTPException**: If the user does not exist.
@@ -80,29 +78,25 @@ async def update_avatar_user(file: UploadFile = File(), current_user: User = Dep
     Returns:
     - **UserDbModel**: The updated user profile.
     """
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True
-    )
-
-    r = cloudinary.uploader.upload(file.file, public_id=f'PhotoShare/{current_user.username}', overwrite=True)
-    src_url = cloudinary.CloudinaryImage(f'PhotoShare/{current_user.username}') \
-        .build_url(width=250, height=250, crop='fill', version=r.get('version'))
+    public_id = f'PhotoShare/{current_user.username}'
+    upload = await receive_upload(request, current_user.id, lambda filename: public_id)
+    # Renditions of the previous avatar
+    await storage.invalidate(public_id, saved=True)
+    src_url = await storage.transform_saved(public_id, upload.result.get('version'), width=250, height=250,
+                                            crop='fill')
     user = await repository_users.update_avatar(current_user.email, src_url, db)
     return user
 
 
 @router.get("/profile/{user_id}", response_model=UserProfilePublic)
-async def get_user_profile(user_id: int, db: Session = Depends(get_db)):
+async def get_user_profile(user_id: int, db: AsyncSession = Depends(get_async_db)):
 
     """
     Get the public profile of a user.
 
     Arguments:
     - **user_id** (int): The ID of the user to get the profile for.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
     - **HTTPException**: If the user is not found.
@@ -123,13 +117,13 @@ async def get_user_profile(user_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/{user_id}/rating", response_model=UserAverageRating)
-async def get_user_avg_rating(user_id: int, db: Session = Depends(get_db)):
+async def get_user_avg_rating(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Get the average rating of a user.
     
     Arguments:
     - **user_id** (int): The ID of the user to get the rating for.
-    - **db** (Session): Database session dependency.
+    - **db** (AsyncSession): Database session dependency.
 
     Raises:
     - **HTTPException**: If the user is not found.
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, EmailStr, conlist
 from datetime import datetime
-from typing import List, Optional
+from typing import Generic, List, Optional, TypeVar
 from enum import Enum
 
 
@@ -119,6 +119,23 @@ class PhotoResponse(PhotoModel):
     tags: List[TagModel]
 
 
+class PhotoFeedItem(PhotoResponse):
+    user_id: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    """One page of a list; ``next_cursor`` is passed as ``cursor`` to get the next one (null on the last page)."""
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
 class UserStatistics(BaseModel):
     user_id: int
     username: str
@@ -127,6 +144,14 @@ class UserStatistics(BaseModel):
     rating: float
     average_rating_given: float
 
+class SlowQuery(BaseModel):
+    """A statement of the slow query log, literals replaced by ``?``."""
+    sql: str
+    duration_ms: float
+    path: Optional[str] = None
+    at: datetime
+
+
 class UserAverageRating(BaseModel):
     user_id: int
     rating: float
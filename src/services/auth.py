@@ -1,18 +1,22 @@
 from typing import Optional
 from jose import jwt
 from jose.exceptions import ExpiredSignatureError, JWTError
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, Request, status, Depends
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
+import time
 from datetime import datetime, timedelta, timezone
+from uuid import uuid4
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
-from src.database.db import get_db
+from src.database.db import get_async_db
 from src.database.models import User
-from src.repository.token_blacklist import add_token_to_blacklist
+from src.repository.token_blacklist import add_token_to_blacklist, is_token_blacklisted
 
 from src.repository import users as repository_users
+from src.services.password_hasher import password_hasher
+from src.services.user_cache import user_cache, user_to_fields
 
 from src.conf.config import settings
 
@@ -20,25 +24,20 @@ from src.exceptions import CredentialsException, UserBlockedException
 
 
 class Auth:
-    if settings.hashing_scheme == "argon2":
-        password_context = CryptContext(
-            schemes=["argon2"],
-            argon2__time_cost=4,
-            argon2__memory_cost=131072,
-            argon2__parallelism=4
-        )
-    else:
-        password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    password_hasher = password_hasher
 
     JWT_SECRET_KEY = settings.jwt_secret_key
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        return self.password_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.password_hasher.verify(plain_password, hashed_password)
+
+    async def verify_and_update_password(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        return await self.password_hasher.verify_and_update(plain_password, hashed_password)
 
-    def get_password_hash(self, password: str) -> str:
-        return self.password_context.hash(password)
+    async def get_password_hash(self, password: str) -> str:
+        return await self.password_hasher.hash(password)
 
     async def create_token(
             self,
@@ -51,7 +50,9 @@ class Auth:
             expire = datetime.now(timezone.utc) + timedelta(seconds=expires_delta)
         else:
             expire = datetime.now(timezone.utc) + default_timedelta
-        to_encode.update({"iat": datetime.now(timezone.utc), "exp": expire, "scope": scope})
+        to_encode.update(
+            {"iat": datetime.now(timezone.utc), "exp": expire, "scope": scope, "jti": uuid4().hex}
+        )
         encoded_token = jwt.encode(to_encode, self.JWT_SECRET_KEY, algorithm=self.ALGORITHM)
         return encoded_token
 
@@ -86,24 +87,61 @@ class Auth:
         token = jwt.encode(to_encode, self.JWT_SECRET_KEY, algorithm=self.ALGORITHM)
         return token
 
-    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    async def get_token_payload(self, request: Request, token: str = Depends(oauth2_scheme)) -> dict:
+        """
+        Claims of the bearer token.
+
+        Reuses the claims decoded and checked against the blacklist by
+        AuthMiddleware; decodes and checks the token itself otherwise.
+
+        :param request: Current request.
+        :type request: Request
+        :param token: Bearer token.
+        :type token: str
+        :return: Token claims.
+        :rtype: dict
+        """
+        if getattr(request.state, "token", None) == token:
+            return request.state.token_payload
         try:
             payload = jwt.decode(token, self.JWT_SECRET_KEY, algorithms=[self.ALGORITHM])
-            if payload["scope"] == "access_token":
-                email = payload["sub"]
-                if email is None:
-                    raise CredentialsException
-            else:
-                raise CredentialsException
         except ExpiredSignatureError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired")
         except JWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token is invalid")
+        if await is_token_blacklisted(token, payload):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail="Token is blacklisted. Please log in again."
+            )
+        return payload
 
-        user = await repository_users.get_user_by_email(email, db)
-        if user is None:
+    async def get_current_user(
+            self,
+            request: Request,
+            token: str = Depends(oauth2_scheme),
+            db: AsyncSession = Depends(get_async_db)):
+        payload = await self.get_token_payload(request, token)
+        if payload.get("scope") != "access_token":
+            raise CredentialsException
+        email = payload.get("sub")
+        if email is None:
             raise CredentialsException
-        elif user.allowed is False:
+
+        iat = payload.get("iat")
+        fields = await user_cache.get(email, iat)
+        if fields is not None:
+            user = User(**fields)
+            make_transient_to_detached(user)
+            # Attached to the request session without a SELECT
+            user = await db.merge(user, load=False)
+        else:
+            loaded_at = time.monotonic()
+            user = await repository_users.get_user_by_email(email, db)
+            if user is None:
+                raise CredentialsException
+            await user_cache.set(email, iat, user_to_fields(user), loaded_at)
+
+        if user.allowed is False:
             raise UserBlockedException
         return user
 
@@ -125,8 +163,8 @@ class Auth:
             raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                                 detail="Invalid token for email verification")
 
-    async def logout(self, token: str, db: Session) -> None:
-        await add_token_to_blacklist(token, db)
+    async def logout(self, token: str, payload: dict) -> None:
+        await add_token_to_blacklist(token, payload)
 
 
 auth_service = Auth()
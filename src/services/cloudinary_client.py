@@ -0,0 +1,350 @@
+import asyncio
+import random
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, BinaryIO
+from uuid import uuid4
+
+import httpx
+from cloudinary import utils as cloudinary_utils
+from cloudinary.exceptions import (
+    AlreadyExists,
+    AuthorizationRequired,
+    BadRequest,
+    GeneralError,
+    NotAllowed,
+    NotFound,
+    RateLimited,
+)
+
+from src.conf.config import settings
+from src.services.image_engine import PROBE_BYTES, probe_image, transform_image
+from src.services.metrics import CLOUDINARY_ERRORS, CLOUDINARY_REQUEST_SECONDS
+from src.services.multipart import MultipartReader
+from src.settings import logger
+
+EXCEPTION_BY_STATUS = {
+    400: BadRequest,
+    401: AuthorizationRequired,
+    403: NotAllowed,
+    404: NotFound,
+    409: AlreadyExists,
+    420: RateLimited,
+    429: RateLimited,
+}
+RETRY_STATUSES = {420, 429, 500, 502, 503, 504}
+# Delivery URL transformation parameters, by their abbreviation
+TRANSFORMATION_PARAMS = {
+    "c": "crop", "w": "width", "h": "height", "g": "gravity", "ar": "aspect_ratio", "x": "x", "y": "y", "b": "background",
+}
+
+
+class CloudinaryClient:
+    """
+    Asynchronous Cloudinary client.
+
+    Talks to the Upload and Admin APIs over a pooled ``httpx.AsyncClient``
+    instead of the blocking SDK calls. Every request has a timeout, is retried
+    with exponential backoff and full jitter on network errors, rate limiting
+    and 5xx responses, and at most ``max_concurrency`` requests are in flight.
+    Errors are raised as the SDK's ``cloudinary.exceptions`` classes.
+
+    Admin API details of images (rate limited by Cloudinary) are cached for
+    ``resource_ttl`` seconds and dropped when the image is uploaded again or
+    destroyed through this client.
+    """
+
+    def __init__(
+        self,
+        cloud_name: str,
+        api_key: str,
+        api_secret: str,
+        timeout: float = 30,
+        connect_timeout: float = 5,
+        max_retries: int = 3,
+        backoff: float = 0.2,
+        max_concurrency: int = 16,
+        transport: httpx.AsyncBaseTransport | None = None,
+        resource_ttl: float = 300,
+        resource_cache_size: int = 10000,
+    ):
+        self.cloud_name = cloud_name
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.resource_ttl = resource_ttl
+        self.resource_cache_size = resource_cache_size
+        self._resources: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        # Lookups of the resource cache
+        self.hits = 0
+        self.misses = 0
+        self.http = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_concurrency, max_keepalive_connections=max_concurrency
+            ),
+            transport=transport,
+        )
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+    def _signed(self, params: dict) -> dict:
+        return cloudinary_utils.sign_request(
+            params,
+            {"api_key": self.api_key, "api_secret": self.api_secret, "signature_algorithm": "sha1"},
+        )
+
+    def _api_url(self, action: str) -> str:
+        return cloudinary_utils.cloudinary_api_url(
+            action, resource_type="image", cloud_name=self.cloud_name
+        )
+
+    async def _send(
+        self, method: str, url: str, rewind: BinaryIO | None = None, retry: bool = True,
+        action: str = "other", **kwargs
+    ) -> httpx.Response:
+        # A slot of the semaphore is taken per attempt, never across a backoff sleep
+        max_retries = self.max_retries if retry else 0
+        started = time.perf_counter()
+        try:
+            for attempt in range(max_retries + 1):
+                if rewind is not None:
+                    rewind.seek(0)
+                try:
+                    async with self.semaphore:
+                        response = await self.http.request(method, url, **kwargs)
+                except httpx.TransportError as e:
+                    CLOUDINARY_ERRORS.labels(action, "transport").inc()
+                    if attempt == max_retries:
+                        raise GeneralError(f"Cloudinary request failed: {e!r}") from e
+                else:
+                    if response.status_code < 400:
+                        return response
+                    CLOUDINARY_ERRORS.labels(action, str(response.status_code)).inc()
+                    if response.status_code not in RETRY_STATUSES or attempt == max_retries:
+                        raise self._error(response)
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+                logger.debug(f"Cloudinary {method} {url} retry {attempt + 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+        finally:
+            CLOUDINARY_REQUEST_SECONDS.labels(action).observe(time.perf_counter() - started)
+
+    async def _request(self, method: str, url: str, **kwargs) -> dict:
+        return (await self._send(method, url, **kwargs)).json()
+
+    @staticmethod
+    def _error(response: httpx.Response) -> Exception:
+        try:
+            message = response.json()["error"]["message"]
+        except (ValueError, KeyError, TypeError):
+            message = response.text
+        return EXCEPTION_BY_STATUS.get(response.status_code, GeneralError)(message)
+
+    async def upload(self, file: BinaryIO, public_id: str, overwrite: bool = True) -> dict:
+        """
+        Upload an image.
+
+        :param file: Seekable file object, read again when the upload is retried.
+        :return: Upload API response (``public_id``, ``version``, ``width``...).
+        """
+        params = self._signed(
+            cloudinary_utils.build_upload_params(public_id=public_id, overwrite=overwrite)
+        )
+        self._resources.pop(public_id, None)
+        return await self._request(
+            "POST", self._api_url("upload"), rewind=file, action="upload",
+            data=params, files={"file": (public_id.rsplit("/", 1)[-1], file)},
+        )
+
+    async def upload_stream(
+        self, chunks: AsyncIterator[bytes], public_id: str, filename: str | None = None, overwrite: bool = True
+    ) -> dict:
+        """
+        Upload an image from an async stream of chunks.
+
+        The multipart body is written around the chunks as they arrive, so the
+        image is never held in memory as a whole. A stream cannot be replayed,
+        so the request is not retried; exceptions raised by ``chunks`` abort
+        the upload and propagate to the caller.
+        """
+        params = self._signed(
+            cloudinary_utils.build_upload_params(public_id=public_id, overwrite=overwrite)
+        )
+        self._resources.pop(public_id, None)
+        boundary = uuid4().hex
+        filename = (filename or public_id.rsplit("/", 1)[-1]).replace('"', "")
+
+        async def body():
+            for name, value in params.items():
+                yield (
+                    f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+                ).encode()
+            yield (
+                f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                f"Content-Type: application/octet-stream\r\n\r\n"
+            ).encode()
+            async for chunk in chunks:
+                yield chunk
+            yield f"\r\n--{boundary}--\r\n".encode()
+
+        return await self._request(
+            "POST", self._api_url("upload"), retry=False, action="upload", content=body(),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        )
+
+    async def destroy(self, public_id: str) -> dict:
+        params = self._signed({"public_id": public_id, "timestamp": str(int(time.time()))})
+        self._resources.pop(public_id, None)
+        return await self._request("POST", self._api_url("destroy"), action="destroy", data=params)
+
+    async def resource(self, public_id: str) -> dict:
+        """Admin API details of an image (``version``, ``width``, ``format``...), cached."""
+        cached = self._resources.get(public_id)
+        if cached is not None:
+            expires_at, details = cached
+            if expires_at > time.monotonic():
+                self.hits += 1
+                return details
+            del self._resources[public_id]
+        self.misses += 1
+        url = cloudinary_utils.base_api_url(
+            ["resources", "image", "upload", public_id], cloud_name=self.cloud_name
+        )
+        details = await self._request("GET", url, action="resource", auth=(self.api_key, self.api_secret))
+        self._resources[public_id] = (time.monotonic() + self.resource_ttl, details)
+        while len(self._resources) > self.resource_cache_size:
+            self._resources.popitem(last=False)
+        return details
+
+    async def download(self, public_id: str) -> bytes:
+        """Content of an image, from its delivery URL."""
+        try:
+            return await self.fetch(self.url(public_id))
+        except NotFound:
+            raise NotFound(f"Resource not found - {public_id}")
+
+    async def fetch(self, url: str) -> bytes:
+        """Content of a delivery URL, such as an image transformed by Cloudinary."""
+        return (await self._send("GET", url, action="download")).content
+
+    def url(self, public_id: str, **options) -> str:
+        """Delivery URL of an image, with optional transformation options."""
+        url, _ = cloudinary_utils.cloudinary_url(
+            public_id, cloud_name=self.cloud_name, secure=True, **options
+        )
+        return url
+
+
+class FakeCloudinary(httpx.AsyncBaseTransport):
+    """
+    In-memory stand-in for the Cloudinary API, used as an httpx transport.
+
+    Lets the application and the benchmarks run offline through the same
+    client code; ``latency`` simulates the network round trip. Uploads are
+    parsed as they stream in and kept in memory, and delivery URLs
+    (``res.cloudinary.com/<cloud>/image/upload/...``) are served from them,
+    transformations rendered by the local image engine.
+    """
+
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+        self.images: dict[str, dict] = {}
+        self.content: dict[str, bytes] = {}
+
+    def transport(self) -> httpx.AsyncBaseTransport:
+        return self
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        path = request.url.path
+        if path.endswith("/image/upload"):
+            return await self._upload(request)
+        await request.aread()
+        if path.endswith("/image/destroy"):
+            fields = dict(httpx.QueryParams(request.content.decode()))
+            found = self.images.pop(fields["public_id"], None)
+            self.content.pop(fields["public_id"], None)
+            return httpx.Response(200, json={"result": "ok" if found else "not found"})
+        if "/resources/image/upload/" in path:
+            public_id = path.split("/resources/image/upload/", 1)[1]
+            if public_id not in self.images:
+                return httpx.Response(404, json={"error": {"message": f"Resource not found - {public_id}"}})
+            return httpx.Response(200, json=self.images[public_id])
+        if request.method == "GET" and "/image/upload/" in path:
+            return await self._deliver(path.split("/image/upload/", 1)[1])
+        return httpx.Response(404, json={"error": {"message": "Unknown endpoint"}})
+
+    async def _deliver(self, path: str) -> httpx.Response:
+        """An image from its delivery path: ``[transformation/][v<version>/]<public_id>[.<format>]``."""
+        segments = path.split("/")
+        segments[-1] = segments[-1].rsplit(".", 1)[0]
+        for start in range(len(segments)):
+            public_id = "/".join(segments[start:])
+            if public_id in self.content:
+                break
+        else:
+            return httpx.Response(404, json={"error": {"message": f"Resource not found - {path}"}})
+        options = {}
+        for segment in segments[:start]:
+            if segment[:1] == "v" and segment[1:].isdigit():
+                continue
+            for param in segment.split(","):
+                name, _, value = param.partition("_")
+                if name not in TRANSFORMATION_PARAMS:
+                    return httpx.Response(400, json={"error": {"message": f"Unsupported transformation: {param}"}})
+                options[TRANSFORMATION_PARAMS[name]] = int(value) if value.isdigit() else value
+        content = self.content[public_id]
+        if options:
+            try:
+                content, _ = await asyncio.to_thread(transform_image, content, options)
+            except ValueError as e:
+                return httpx.Response(400, json={"error": {"message": str(e)}})
+        return httpx.Response(200, content=content)
+
+    async def _upload(self, request: httpx.Request) -> httpx.Response:
+        boundary = request.headers["content-type"].split("boundary=", 1)[1].strip('"')
+        reader = MultipartReader(boundary.encode(), request.stream)
+        fields, chunks = {}, []
+        while part := await reader.next_part():
+            if part.name == "file":
+                async for chunk in reader.iter_data():
+                    chunks.append(chunk)
+            else:
+                fields[part.name] = (await reader.read(4096)).decode()
+        public_id = fields["public_id"]
+        content = b"".join(chunks)
+        image = {
+            "public_id": public_id,
+            "version": int(time.time() * 1000),
+            "bytes": len(content),
+            "format": "jpg",
+            "resource_type": "image",
+            **(probe_image(content[:PROBE_BYTES]) or {}),
+        }
+        self.images[public_id] = image
+        self.content[public_id] = content
+        return httpx.Response(200, json=image)
+
+
+def create_cloudinary_client() -> CloudinaryClient:
+    transport = None
+    if settings.cloudinary_fake:
+        transport = FakeCloudinary(settings.cloudinary_fake_latency).transport()
+    return CloudinaryClient(
+        settings.cloudinary_name,
+        settings.cloudinary_api_key,
+        settings.cloudinary_api_secret,
+        timeout=settings.cloudinary_timeout,
+        connect_timeout=settings.cloudinary_connect_timeout,
+        max_retries=settings.cloudinary_max_retries,
+        max_concurrency=settings.cloudinary_max_concurrency,
+        transport=transport,
+        resource_ttl=settings.cloudinary_resource_ttl,
+    )
+
+
+cloudinary_client = create_cloudinary_client()
@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import json
+import re
+from collections import OrderedDict
+from enum import Enum
+from typing import Awaitable, Callable
+
+from src.services.image_engine import parse_aspect_ratio
+
+HASH_LENGTH = 16
+# Key suffixes of transformed images: "_t" previews held in the cache, "_s" saved
+# transformations (a photo's new original); nested when a saved image is transformed again
+DERIVED_SUFFIX = re.compile(rf"(_[ts][0-9a-f]{{{HASH_LENGTH}}})+$")
+PREVIEW_SUFFIX = re.compile(rf"_t[0-9a-f]{{{HASH_LENGTH}}}$")
+SAVED_SUFFIX = re.compile(rf"_s[0-9a-f]{{{HASH_LENGTH}}}$")
+
+
+def canonical_options(options: dict) -> dict:
+    """Transformation options without unset values, enums and ratios in one spelling."""
+    canonical = {}
+    for name, value in options.items():
+        if isinstance(value, Enum):
+            value = value.value
+        if value is None or value == "":
+            continue
+        if name == "aspect_ratio":
+            try:
+                value = round(parse_aspect_ratio(value), 6)
+            except ValueError:
+                # Left as given, the engine rejects it
+                pass
+        canonical[name] = value
+    return canonical
+
+
+def derivative_key(key: str, version: int | None, options: dict) -> str:
+    """Storage key of an image transformed with ``options``: the source key and a hash of its version and options."""
+    params = json.dumps([key, version, canonical_options(options)], sort_keys=True, default=str)
+    return f"{key}_t{hashlib.sha256(params.encode()).hexdigest()[:HASH_LENGTH]}"
+
+
+def is_preview(key: str) -> bool:
+    return PREVIEW_SUFFIX.search(key) is not None
+
+
+def is_saved(key: str) -> bool:
+    return SAVED_SUFFIX.search(key) is not None
+
+
+def saved_key(key: str) -> str:
+    """Key a preview is kept under once saved as a photo."""
+    return key[:-HASH_LENGTH - 2] + "_s" + key[-HASH_LENGTH:]
+
+
+def is_derived_from(key: str, source: str, saved: bool = False) -> bool:
+    """
+    Whether ``key`` is a transformation of ``source``.
+
+    :param saved: Include saved transformations; otherwise only previews (and
+        their own transformations) match.
+    """
+    if not key.startswith(source + "_"):
+        return False
+    suffix = key[len(source):]
+    return DERIVED_SUFFIX.fullmatch(suffix) is not None and (saved or suffix.startswith("_t"))
+
+
+class DerivativeCache:
+    """
+    Index of the transformation previews kept in storage, least recently used first.
+
+    Storage holds the files; this index bounds them to ``max_entries`` and
+    ``max_bytes``, returning the keys to remove from storage when a new
+    derivative pushes older ones out. Concurrent requests for the same
+    derivative share one rendering. The index is per process: it is filled
+    from storage at startup and entries made by other workers are adopted
+    when requested.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._rendering: dict[str, asyncio.Future] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def get(self, key: str) -> dict | None:
+        """Stored ``version`` and ``bytes`` of a derivative, marking it as recently used."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def touch(self, key: str) -> None:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+
+    def add(self, key: str, version: int | None, size: int) -> list[str]:
+        """
+        Index a stored derivative.
+
+        :return: Keys evicted to stay within the limits, to be removed from storage.
+        """
+        self.discard(key)
+        self._entries[key] = {"version": version, "bytes": size}
+        self.bytes += size
+        evicted = []
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self.bytes > self.max_bytes
+        ):
+            old_key, old_entry = self._entries.popitem(last=False)
+            self.bytes -= old_entry["bytes"]
+            evicted.append(old_key)
+        self.evictions += len(evicted)
+        return evicted
+
+    def discard(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.bytes -= entry["bytes"]
+        return True
+
+    def drop_source(self, source: str) -> list[str]:
+        """Forget the previews of an image; returns their keys."""
+        keys = [key for key in self._entries if is_derived_from(key, source)]
+        for key in keys:
+            self.discard(key)
+        return keys
+
+    async def shared(self, key: str, render: Callable[[], Awaitable[dict]]) -> dict:
+        """Run ``render`` once for concurrent requests of the same derivative."""
+        future = self._rendering.get(key)
+        if future is None:
+            future = asyncio.ensure_future(render())
+            self._rendering[key] = future
+
+            def done(finished: asyncio.Future) -> None:
+                self._rendering.pop(key, None)
+                # Retrieved here too, in case every waiter was cancelled
+                if not finished.cancelled():
+                    finished.exception()
+
+            future.add_done_callback(done)
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
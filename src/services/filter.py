@@ -1,29 +1,40 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from typing import List, Optional
-from src.database.models import Photo, Rating
+from src.database.models import Photo
 
 
-def filter_photos_by_criteria(
-    db: Session,
+async def filter_photos_by_criteria(
+    db: AsyncSession,
     min_rating: Optional[float],
     max_rating: Optional[float],
     start_date: Optional[str],
     end_date: Optional[str],
+    limit: int = 20,
+    after_id: Optional[int] = None,
 ) -> List[Photo]:
-    query = db.query(Photo)
+    """
+    Return one page of photos matching the criteria, ordered by id.
+
+    The average rating comes with every row (Photo.avg_rating), and the page
+    starts right after ``after_id`` (keyset pagination), so the cost is
+    bounded by ``limit`` rather than by the number of matching photos.
+    """
+    query = select(Photo)
 
     if start_date:
         query = query.filter(Photo.created_at >= start_date)
     if end_date:
         query = query.filter(Photo.created_at <= end_date)
 
-    if min_rating is not None or max_rating is not None:
-        query = query.outerjoin(Rating).group_by(Photo.id)
+    # unrated photos have avg_rating NULL and never match a rating bound
+    if min_rating is not None:
+        query = query.filter(Photo.avg_rating >= min_rating)
+    if max_rating is not None:
+        query = query.filter(Photo.avg_rating <= max_rating)
 
-        if min_rating is not None:
-            query = query.having(func.avg(Rating.rating) >= min_rating)
-        if max_rating is not None:
-            query = query.having(func.avg(Rating.rating) <= max_rating)
+    if after_id is not None:
+        query = query.filter(Photo.id > after_id)
 
-    return query.all()
+    result = await db.execute(query.order_by(Photo.id).limit(limit))
+    return list(result.scalars().all())
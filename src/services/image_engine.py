@@ -0,0 +1,288 @@
+import asyncio
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from cloudinary.exceptions import BadRequest, GeneralError
+from fastapi import HTTPException, status
+from PIL import Image, ImageColor, ImageOps
+
+MAX_OUTPUT_SIDE = 10000
+OUTPUT_FORMATS = {"JPEG": "jpeg", "PNG": "png", "WEBP": "webp"}
+SAVE_OPTIONS = {
+    "JPEG": {"quality": 85},
+    "PNG": {"compress_level": 6},
+    "WEBP": {"quality": 85, "method": 4},
+}
+GRAVITY_ANCHORS = {
+    "north_west": (0, 0), "north": (0.5, 0), "north_east": (1, 0),
+    "west": (0, 0.5), "center": (0.5, 0.5), "east": (1, 0.5),
+    "south_west": (0, 1), "south": (0.5, 1), "south_east": (1, 1),
+}
+# Modes scaling the image to cover the box, then cropping the overflow
+FILL_MODES = {"fill", "lfill", "fill_pad", "thumb", "auto"}
+PAD_MODES = {"pad", "lpad", "mpad"}
+AUTO_STEPS = 9
+# Image headers (with their EXIF data) are looked for in this many first bytes
+PROBE_BYTES = 256 * 1024
+
+
+def parse_aspect_ratio(value) -> float | None:
+    """``1.5``, ``"1.5"`` or ``"16:9"`` as width / height."""
+    if value in (None, ""):
+        return None
+    try:
+        if isinstance(value, str) and ":" in value:
+            width, height = value.split(":", 1)
+            ratio = float(width) / float(height)
+        else:
+            ratio = float(value)
+    except (ValueError, ZeroDivisionError):
+        raise ValueError(f"Invalid aspect ratio: {value}")
+    if not 0 < ratio < 100:
+        raise ValueError(f"Invalid aspect ratio: {value}")
+    return ratio
+
+
+def parse_background(value: str | None) -> tuple:
+    """Cloudinary-style background (``white``, ``#ffcc00``, ``rgb:ffcc00``), white by default."""
+    if not value:
+        return 255, 255, 255
+    if value.startswith("rgb:"):
+        value = "#" + value[4:]
+    try:
+        return ImageColor.getrgb(value)[:3]
+    except ValueError:
+        raise ValueError(f"Invalid background: {value}")
+
+
+def target_size(width: int, height: int, options: dict) -> tuple[int, int]:
+    """Box requested by ``width``/``height``/``aspect_ratio``, the source ratio filling in the gaps."""
+    box_width, box_height = options.get("width"), options.get("height")
+    ratio = parse_aspect_ratio(options.get("aspect_ratio"))
+    if box_width and not box_height and ratio:
+        box_height = box_width / ratio
+    elif box_height and not box_width and ratio:
+        box_width = box_height * ratio
+    elif not box_width and not box_height:
+        if not ratio:
+            return width, height
+        if width / height > ratio:
+            box_width, box_height = height * ratio, height
+        else:
+            box_width, box_height = width, width / ratio
+    if not box_height:
+        box_height = box_width * height / width
+    if not box_width:
+        box_width = box_height * width / height
+    box = max(1, round(box_width)), max(1, round(box_height))
+    if max(box) > MAX_OUTPUT_SIDE:
+        raise ValueError(f"Requested size is larger than {MAX_OUTPUT_SIDE} pixels")
+    return box
+
+
+def scale_for(mode: str, width: int, height: int, box: tuple[int, int]) -> float:
+    """Factor the source is resized by before cropping or padding."""
+    fit = min(box[0] / width, box[1] / height)
+    cover = max(box[0] / width, box[1] / height)
+    return {
+        "fit": fit,
+        "pad": fit,
+        "lfit": min(1.0, fit),
+        "lpad": min(1.0, fit),
+        "mfit": max(1.0, fit),
+        "lfill": min(1.0, cover),
+        "crop": 1.0,
+        "mpad": 1.0,
+    }.get(mode, cover)
+
+
+def window(size: tuple[int, int], crop_size: tuple[int, int], anchor: tuple[float, float]) -> tuple:
+    left = round((size[0] - crop_size[0]) * anchor[0])
+    top = round((size[1] - crop_size[1]) * anchor[1])
+    return left, top, left + crop_size[0], top + crop_size[1]
+
+
+def auto_anchor(image: Image.Image, crop_size: tuple[int, int]) -> tuple[float, float]:
+    """
+    Anchor of the most detailed window (highest entropy) along the overflowing axis.
+
+    Stands in for Cloudinary's content-aware gravities (auto, faces, body...).
+    """
+    sample = image.convert("L")
+    sample.thumbnail((256, 256))
+    scale = sample.width / image.width
+    sample_crop = max(1, round(crop_size[0] * scale)), max(1, round(crop_size[1] * scale))
+    horizontal = image.width - crop_size[0] >= image.height - crop_size[1]
+    best, best_entropy = (0.5, 0.5), -1.0
+    for step in range(AUTO_STEPS):
+        fraction = step / (AUTO_STEPS - 1)
+        anchor = (fraction, 0.5) if horizontal else (0.5, fraction)
+        entropy = sample.crop(window(sample.size, sample_crop, anchor)).entropy()
+        if entropy > best_entropy + 1e-6:
+            best, best_entropy = anchor, entropy
+    return best
+
+
+def anchor_for(image: Image.Image, crop_size: tuple[int, int], gravity: str | None) -> tuple[float, float]:
+    if gravity in GRAVITY_ANCHORS:
+        return GRAVITY_ANCHORS[gravity]
+    if gravity and (gravity.startswith("auto") or gravity.startswith("face") or gravity == "body"):
+        return auto_anchor(image, crop_size)
+    return GRAVITY_ANCHORS["center"]
+
+
+def open_image(source: bytes | str) -> Image.Image:
+    try:
+        return Image.open(source if isinstance(source, str) else BytesIO(source))
+    except (Image.UnidentifiedImageError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Unsupported image: {e}")
+
+
+def probe_image(head: bytes) -> dict | None:
+    """
+    ``width``, ``height`` and ``format`` (Cloudinary's spelling: ``jpg``...) read
+    from the first bytes of an image; None while the header is incomplete.
+    Only the header is parsed, nothing is decoded.
+    """
+    try:
+        with Image.open(BytesIO(head)) as image:
+            image_format = image.format or ""
+            return {
+                "width": image.width,
+                "height": image.height,
+                "format": "jpg" if image_format == "JPEG" else image_format.lower() or None,
+            }
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+def transform_image(source: bytes | str, options: dict) -> tuple[bytes, str]:
+    """
+    Apply Cloudinary-style crop options to an image; runs in a worker process.
+
+    Supports the ``CropEnum`` modes (fill, lfill, fill_pad, crop, thumb, auto,
+    scale, fit, lfit, mfit, pad, lpad, mpad) with ``GravityEnum`` anchors,
+    ``width``, ``height``, ``aspect_ratio``, ``x``/``y`` for ``crop`` and
+    ``background`` for the pad modes. JPEG sources are decoded at reduced
+    size when the result is much smaller.
+
+    :param source: Encoded image, or the path of an image file.
+    :return: Encoded result and its format (``jpeg``, ``png`` or ``webp``).
+    :raises ValueError: Invalid options, or an image that cannot be decoded
+        (truncated or corrupt data, too many pixels).
+    """
+    try:
+        return _transform_image(source, options)
+    except FileNotFoundError:
+        raise
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        # Pillow decodes lazily: broken data only fails in resize, crop or save
+        raise ValueError(f"Unsupported image: {e}")
+
+
+def _transform_image(source: bytes | str, options: dict) -> tuple[bytes, str]:
+    mode = options.get("crop") or "scale"
+    gravity = options.get("gravity")
+    image = open_image(source)
+    output_format = image.format if image.format in OUTPUT_FORMATS else "PNG"
+
+    box = target_size(*image.size, options)
+    scale = scale_for(mode, *image.size, box)
+    if image.format == "JPEG" and scale < 0.5:
+        side = math.ceil(max(image.size) * scale)
+        image.draft("RGB", (side, side))
+    image = ImageOps.exif_transpose(image)
+    # The box follows the decoded (possibly drafted and rotated) image
+    box = target_size(*image.size, options)
+    scale = scale_for(mode, *image.size, box)
+
+    if mode == "scale":
+        if box != image.size:
+            image = image.resize(box, Image.Resampling.LANCZOS, reducing_gap=3.0)
+    elif mode == "crop":
+        crop_size = min(box[0], image.width), min(box[1], image.height)
+        if options.get("x") is not None or options.get("y") is not None:
+            left = min(max(0, int(options.get("x") or 0)), image.width - crop_size[0])
+            top = min(max(0, int(options.get("y") or 0)), image.height - crop_size[1])
+            image = image.crop((left, top, left + crop_size[0], top + crop_size[1]))
+        else:
+            image = image.crop(window(image.size, crop_size, anchor_for(image, crop_size, gravity)))
+    else:
+        size = max(1, round(image.width * scale)), max(1, round(image.height * scale))
+        if size != image.size:
+            image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        if mode in FILL_MODES:
+            crop_size = min(box[0], image.width), min(box[1], image.height)
+            if mode == "lfill" and scale == 1.0:
+                # Not upscaled: keep the requested ratio within the source
+                ratio = box[0] / box[1]
+                crop_size = min(image.width, round(image.height * ratio)), min(image.height, round(image.width / ratio))
+            image = image.crop(window(image.size, crop_size, anchor_for(image, crop_size, gravity)))
+        elif mode in PAD_MODES:
+            canvas_size = max(box[0], image.width), max(box[1], image.height)
+            if canvas_size != image.size:
+                anchor = GRAVITY_ANCHORS.get(gravity, GRAVITY_ANCHORS["center"])
+                canvas = Image.new("RGB", canvas_size, parse_background(options.get("background")))
+                image = image.convert("RGBA")
+                canvas.paste(image, window(canvas_size, image.size, anchor)[:2], image)
+                image = canvas
+
+    if output_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    output = BytesIO()
+    image.save(output, output_format, **SAVE_OPTIONS[output_format])
+    return output.getvalue(), OUTPUT_FORMATS[output_format]
+
+
+class ImageEngine:
+    """
+    Image transformations on a pool of worker processes.
+
+    Decoding and resampling hold the GIL, so they run in ``workers``
+    processes (one per core by default) instead of threads; at most
+    ``max_queue`` more transformations may wait, further ones are rejected
+    with 429. The pool is started on first use.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers or os.cpu_count() or 1
+        self.capacity = self.workers + max_queue
+        self.pending = 0
+        self.executor: ProcessPoolExecutor | None = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self.executor
+
+    async def transform(self, source: bytes | str, options: dict) -> tuple[bytes, str]:
+        """Run ``transform_image`` in the pool; invalid images or options raise ``BadRequest``."""
+        if self.pending >= self.capacity:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many image transformations in progress, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor(), transform_image, source, options
+            )
+        except ValueError as e:
+            raise BadRequest(str(e))
+        except BrokenProcessPool as e:
+            self.executor = None
+            raise GeneralError(f"Image worker crashed: {e!r}")
+        finally:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from typing import Callable, Iterable
+
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Its _count series are the request counts per route and status
+HTTP_REQUEST_SECONDS = Histogram(
+    "photoshare_http_request_seconds",
+    "Time to handle an HTTP request, until its response is sent",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_PROGRESS = Gauge(
+    "photoshare_http_requests_in_progress",
+    "HTTP requests being handled",
+    ["method"],
+)
+CLOUDINARY_REQUEST_SECONDS = Histogram(
+    "photoshare_cloudinary_request_seconds",
+    "Time of a Cloudinary API call, retries included",
+    ["action"],
+    buckets=LATENCY_BUCKETS,
+)
+CLOUDINARY_ERRORS = Counter(
+    "photoshare_cloudinary_errors",
+    "Failed Cloudinary API attempts, by HTTP status or 'transport'",
+    ["action", "reason"],
+)
+EVENT_LOOP_LAG = Gauge(
+    "photoshare_event_loop_lag_seconds",
+    "Delay of the last event loop lag probe past its due time",
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "photoshare_event_loop_lag_probe_seconds",
+    "Delays of the event loop lag probes past their due time",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+
+async def monitor_event_loop_lag(interval: float) -> None:
+    """
+    Measure how late the event loop runs a callback scheduled ``interval`` seconds ahead.
+
+    A busy loop (blocking calls, CPU-bound work in a handler) delays every
+    request by about the same lag.
+    """
+    while True:
+        due = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lag = max(time.perf_counter() - due, 0)
+        EVENT_LOOP_LAG.set(lag)
+        EVENT_LOOP_LAG_SECONDS.observe(lag)
+
+
+class PoolCollector(Collector):
+    """Connections of a SQLAlchemy pool, read when scraped."""
+
+    def __init__(self, pool: Callable[[], object]):
+        self.pool = pool
+
+    def collect(self) -> Iterable[GaugeMetricFamily]:
+        pool = self.pool()
+        for name, documentation, method in (
+            ("size", "Connections the pool keeps open", "size"),
+            ("checked_out", "Connections in use", "checkedout"),
+            ("checked_in", "Idle connections in the pool", "checkedin"),
+            ("overflow", "Connections opened beyond the pool size", "overflow"),
+        ):
+            if hasattr(pool, method):
+                yield GaugeMetricFamily(f"photoshare_db_pool_{name}", documentation, value=getattr(pool, method)())
+
+
+class CacheCollector(Collector):
+    """
+    Hits, misses and hit ratio of in-process caches, read when scraped.
+
+    The caches only count (``hits``, ``misses`` attributes), so serving a
+    request costs nothing more than before.
+    """
+
+    def __init__(self, caches: dict[str, Callable[[], object]]):
+        self.caches = caches
+
+    def collect(self) -> Iterable[CounterMetricFamily | GaugeMetricFamily]:
+        hits = CounterMetricFamily("photoshare_cache_hits", "Cache lookups answered from the cache", labels=["cache"])
+        misses = CounterMetricFamily("photoshare_cache_misses", "Cache lookups not in the cache", labels=["cache"])
+        ratio = GaugeMetricFamily("photoshare_cache_hit_ratio", "Hits over lookups since start", labels=["cache"])
+        for name, cache in self.caches.items():
+            cache = cache()
+            hits.add_metric([name], cache.hits)
+            misses.add_metric([name], cache.misses)
+            lookups = cache.hits + cache.misses
+            ratio.add_metric([name], cache.hits / lookups if lookups else 0)
+        yield hits
+        yield misses
+        yield ratio
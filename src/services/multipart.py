@@ -0,0 +1,106 @@
+from collections import deque
+from typing import AsyncIterator
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+
+class Part:
+    """Headers of one part of a multipart/form-data body."""
+
+    def __init__(self, headers: dict[str, str]):
+        self.headers = headers
+        _, options = parse_options_header(headers.get("content-disposition", ""))
+        self.name = options.get(b"name", b"").decode()
+        filename = options.get(b"filename")
+        self.filename = filename.decode() if filename is not None else None
+        self.content_type = headers.get("content-type")
+
+
+class MultipartReader:
+    """
+    Pull-based reader over a streamed multipart/form-data body.
+
+    Only the chunk being parsed is held in memory: part data is handed out
+    as it arrives from ``stream``, nothing is spooled.
+    """
+
+    def __init__(self, boundary: bytes, stream: AsyncIterator[bytes]):
+        self.stream = stream.__aiter__()
+        self.events: deque = deque()
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: dict[str, str] = {}
+        self._in_part_data = False
+        self._finished = False
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.decode("latin-1").lower()] = self._header_value.decode("latin-1")
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self):
+        self.events.append(("part", Part(self._headers)))
+
+    def _on_part_data(self, data, start, end):
+        self.events.append(("data", bytes(data[start:end])))
+
+    def _on_part_end(self):
+        self.events.append(("end", None))
+
+    async def _next_event(self):
+        while not self.events:
+            if self._finished:
+                return None
+            try:
+                chunk = await self.stream.__anext__()
+            except StopAsyncIteration:
+                self._finished = True
+                self.parser.finalize()
+                continue
+            self.parser.write(chunk)
+        return self.events.popleft()
+
+    async def next_part(self) -> Part | None:
+        """Skip the rest of the current part and return the headers of the next one."""
+        while (event := await self._next_event()) is not None:
+            kind, value = event
+            if kind == "part":
+                self._in_part_data = True
+                return value
+        return None
+
+    async def iter_data(self) -> AsyncIterator[bytes]:
+        """Data of the current part, chunk by chunk."""
+        while self._in_part_data and (event := await self._next_event()) is not None:
+            kind, value = event
+            if kind == "data":
+                if value:
+                    yield value
+            elif kind == "end":
+                self._in_part_data = False
+
+    async def read(self, max_size: int) -> bytes:
+        """Whole data of the current part, at most ``max_size`` bytes."""
+        data = b""
+        async for chunk in self.iter_data():
+            data += chunk
+            if len(data) > max_size:
+                raise ValueError(f"Form field larger than {max_size} bytes")
+        return data
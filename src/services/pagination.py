@@ -0,0 +1,91 @@
+import base64
+import json
+from datetime import datetime
+from typing import Callable, Optional, Sequence
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import Select, tuple_
+
+# Largest page any list endpoint returns
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(*values) -> str:
+    """
+    Opaque cursor holding the sort key of the last row of a page.
+
+    Datetimes are kept with their microseconds so the next page starts
+    exactly after that row.
+    """
+    payload = [{"dt": value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: type) -> list:
+    """Values of a cursor made by ``encode_cursor``; 400 unless it holds one value of each of ``types``."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError(cursor)
+        values = [
+            datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value
+            for value in payload
+        ]
+    except (ValueError, TypeError, KeyError):
+        values = None
+    if values is None or not all(isinstance(value, kind) for value, kind in zip(values, types)):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values
+
+
+class PageParams:
+    """``limit`` and ``cursor`` of a list request."""
+
+    def __init__(self, limit: int, cursor: str | None = None):
+        self.limit = limit
+        self.cursor = cursor
+
+    @property
+    def fetch(self) -> int:
+        """Rows to fetch: one more than the page, telling whether another page follows."""
+        return self.limit + 1
+
+    def after(self, *types: type) -> list | None:
+        """Sort key of the last row of the previous page (a value of each of ``types``), None on the first page."""
+        return decode_cursor(self.cursor, *types) if self.cursor else None
+
+
+def page_params(default: int = 20, maximum: int = MAX_PAGE_SIZE) -> Callable[..., PageParams]:
+    """Dependency reading the ``limit`` (capped at ``maximum``) and ``cursor`` query parameters."""
+
+    def dependency(
+        limit: int = Query(default, ge=1, le=maximum, description=f"Page size (1-{maximum})"),
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    ) -> PageParams:
+        return PageParams(limit, cursor)
+
+    return dependency
+
+
+def keyset(query: Select, columns: Sequence, after: list | None, descending: bool = False) -> Select:
+    """
+    Order ``query`` by ``columns`` (the last one unique) and start it after the key ``after``.
+
+    Combined with a limit, every page costs the same however deep it is,
+    given an index on the columns.
+    """
+    if after is not None:
+        key, bound = (columns[0], after[0]) if len(columns) == 1 else (tuple_(*columns), tuple_(*after))
+        query = query.filter(key < bound if descending else key > bound)
+    return query.order_by(*(column.desc() if descending else column for column in columns))
+
+
+def make_page(rows: Sequence, params: PageParams, key: Callable[..., tuple]) -> dict:
+    """
+    ``items`` and ``next_cursor`` of a page from ``params.fetch`` rows.
+
+    :param key: Sort key of a row, stored in the cursor of the next page.
+    """
+    items = list(rows[:params.limit])
+    next_cursor = encode_cursor(*key(items[-1])) if len(rows) > params.limit else None
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,79 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from src.conf.config import settings
+
+
+def create_password_context(scheme: str) -> CryptContext:
+    """
+    Password context hashing with ``scheme``.
+
+    The other scheme is still verified and flagged for rehash, so are hashes
+    made with different cost parameters.
+    """
+    schemes = ["argon2", "bcrypt"] if scheme == "argon2" else ["bcrypt", "argon2"]
+    return CryptContext(
+        schemes=schemes,
+        deprecated="auto",
+        argon2__time_cost=settings.argon2_time_cost,
+        argon2__memory_cost=settings.argon2_memory_cost,
+        argon2__parallelism=settings.argon2_parallelism,
+    )
+
+
+class PasswordHasher:
+    """
+    Password hashing on a dedicated thread pool.
+
+    argon2 and bcrypt release the GIL, so the event loop keeps serving other
+    requests while a hash is computed. ``workers`` bounds the memory used by
+    argon2 (``workers * memory_cost``); at most ``max_queue`` more calls
+    may wait for a worker, further calls are rejected with 429.
+    """
+
+    def __init__(self, context: CryptContext, workers: int, max_queue: int):
+        self.context = context
+        self.capacity = workers + max_queue
+        self.pending = 0
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.capacity:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many password checks in progress, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, password, hashed_password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """
+        Check a password and rehash it when its hash uses outdated parameters.
+
+        :return: Whether the password matches, and the new hash to store or None.
+        :rtype: tuple[bool, str | None]
+        """
+        return await self._run(self.context.verify_and_update, password, hashed_password)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(
+    create_password_context(settings.hashing_scheme),
+    settings.password_hash_workers,
+    settings.password_hash_queue,
+)
@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from io import BytesIO
+
+import httpx
+from cloudinary.exceptions import Error, NotFound
+from qrcode import QRCode
+from qrcode.constants import ERROR_CORRECT_L
+
+from src.conf.config import settings
+from src.services.storage import StorageBackend, storage
+from src.settings import logger
+
+# Part of the cache key: bump it when the rendering below changes
+RENDER_VERSION = 1
+BOX_SIZE = 10
+BORDER = 4
+MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+STORAGE_FOLDER = "QRCodes"
+
+
+def make_qr(data: str) -> QRCode:
+    qr = QRCode(version=1, error_correction=ERROR_CORRECT_L, box_size=BOX_SIZE, border=BORDER)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr
+
+
+def render_png(data: str) -> bytes:
+    output = BytesIO()
+    make_qr(data).make_image(fill="black", back_color="white").save(output, "PNG")
+    return output.getvalue()
+
+
+def render_svg(data: str) -> bytes:
+    """QR code as an SVG path, one subpath per run of dark modules in a row."""
+    matrix = make_qr(data).get_matrix()
+    size = len(matrix)
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < size and row[x]:
+                x += 1
+            path.append(f"M{start} {y}h{x - start}v1h-{x - start}z")
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" '
+        f'width="{size * BOX_SIZE}" height="{size * BOX_SIZE}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/><path d="{"".join(path)}"/></svg>'
+    ).encode()
+
+
+RENDERERS = {"png": render_png, "svg": render_svg}
+
+
+def qr_digest(data: str, kind: str) -> str:
+    """Hash identifying the QR code image of ``data``; also its ETag, since the rendering is deterministic."""
+    return hashlib.sha256(f"{RENDER_VERSION}:{kind}:{data}".encode()).hexdigest()[:32]
+
+
+class QRCodeCache:
+    """
+    QR code images keyed by a hash of their content and format.
+
+    Recently served images are kept in an in-process LRU of ``max_entries``;
+    behind it, given a ``storage`` backend, every image rendered is also kept in
+    storage under ``QRCodes/`` so that other workers and restarts do not
+    render it again. Images are rendered in a thread, off the event loop,
+    and concurrent requests for the same one share a single rendering.
+    Stored images live as long as a photo shows their URL: ``forget`` drops
+    them when it no longer does.
+    """
+
+    def __init__(self, max_entries: int, storage: StorageBackend | None = None):
+        self.max_entries = max_entries
+        self.storage = storage
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._loading: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.renders = 0
+
+    def key(self, digest: str) -> str:
+        return f"{STORAGE_FOLDER}/{digest}"
+
+    async def get(self, data: str, kind: str = "png") -> bytes:
+        digest = qr_digest(data, kind)
+        image = self._entries.get(digest)
+        if image is not None:
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return image
+        self.misses += 1
+        future = self._loading.get(digest)
+        if future is None:
+            future = asyncio.ensure_future(self._load(data, kind, digest))
+            self._loading[digest] = future
+
+            def done(finished: asyncio.Future) -> None:
+                self._loading.pop(digest, None)
+                # Retrieved here too, in case every waiter was cancelled
+                if not finished.cancelled():
+                    finished.exception()
+
+            future.add_done_callback(done)
+        return await asyncio.shield(future)
+
+    async def forget(self, data: str) -> None:
+        """Drop the QR code images of ``data``, in every format, from memory and storage."""
+        for kind in RENDERERS:
+            digest = qr_digest(data, kind)
+            self._entries.pop(digest, None)
+            if self.storage is None:
+                continue
+            try:
+                await self.storage.delete(self.key(digest))
+            except NotFound:
+                pass
+            except (Error, httpx.HTTPError) as e:
+                logger.warning(f"QR code {digest} was not removed from storage: {e}")
+
+    async def _load(self, data: str, kind: str, digest: str) -> bytes:
+        image = await self._fetch(digest)
+        if image is None:
+            image = await asyncio.to_thread(RENDERERS[kind], data)
+            self.renders += 1
+            await self._store(digest, image)
+        self._entries[digest] = image
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return image
+
+    async def _fetch(self, digest: str) -> bytes | None:
+        if self.storage is None:
+            return None
+        try:
+            return bytes(await self.storage.get(self.key(digest)))
+        except NotFound:
+            return None
+        except (Error, httpx.HTTPError) as e:
+            logger.warning(f"QR code {digest} was not read from storage: {e}")
+            return None
+
+    async def _store(self, digest: str, image: bytes) -> None:
+        if self.storage is None:
+            return
+
+        async def chunks():
+            yield image
+
+        try:
+            await self.storage.put(chunks(), self.key(digest))
+        except (Error, httpx.HTTPError) as e:
+            logger.warning(f"QR code {digest} was not stored: {e}")
+
+
+qr_cache = QRCodeCache(settings.qr_cache_entries, storage if settings.qr_cache_storage else None)
@@ -0,0 +1,145 @@
+import heapq
+import re
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from prometheus_client import Histogram
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.conf.config import settings
+
+# Slowest statements kept per request
+SLOWEST_PER_REQUEST = 3
+MAX_SQL_LENGTH = 1000
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$.])-?\d+(?:\.\d+)?\b")
+_PARAMETER = re.compile(r"\$\d+|%\(\w+\)s|(?<!:):\w+\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"\bVALUES\s*\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*", re.IGNORECASE)
+_POSTCOMPILE = re.compile(r"\(__\[POSTCOMPILE_\w+\]\)")
+_SPACE = re.compile(r"\s+")
+
+DB_STATEMENT_SECONDS = Histogram(
+    "photoshare_db_statement_seconds",
+    "Time of one SQL statement",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+DB_REQUEST_STATEMENTS = Histogram(
+    "photoshare_db_statements_per_request",
+    "SQL statements run by one request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+DB_REQUEST_SECONDS = Histogram(
+    "photoshare_db_seconds_per_request",
+    "Time one request spent in SQL statements",
+    ["route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    Statement with its literals and bound parameters replaced by ``?``.
+
+    Lists of values (``IN (...)``, multi-row ``VALUES``) collapse to one
+    placeholder, so statements differing only in their values read the same.
+    """
+    sql = _SPACE.sub(" ", statement).strip()
+    sql = _STRING.sub("?", sql)
+    sql = _POSTCOMPILE.sub("(?)", sql)
+    sql = _PARAMETER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (?)", sql)
+    sql = _VALUES_LIST.sub("VALUES (?)", sql)
+    return sql[:MAX_SQL_LENGTH]
+
+
+OPERATIONS = {"select", "insert", "update", "delete", "with"}
+
+
+def operation(statement: str) -> str:
+    """First keyword of a statement (select, insert, ...), the label of its timing."""
+    word = statement.lstrip()[:7].lower().split(None, 1)
+    return word[0] if word and word[0] in OPERATIONS else "other"
+
+
+class QueryStats:
+    """Statements run while handling one request: count, total time and the slowest ones."""
+
+    __slots__ = ("count", "seconds", "slowest")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        # Min-heap of (seconds, statement), the fastest of the slowest on top
+        self.slowest: list[tuple[float, str]] = []
+
+    def add(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        if len(self.slowest) < SLOWEST_PER_REQUEST:
+            heapq.heappush(self.slowest, (seconds, statement))
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, statement))
+
+    def slowest_statements(self) -> list[dict]:
+        return [
+            {"sql": normalize_sql(statement), "duration_ms": round(seconds * 1000, 3)}
+            for seconds, statement in sorted(self.slowest, reverse=True)
+        ]
+
+
+current_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+current_path: ContextVar[str | None] = ContextVar("query_path", default=None)
+
+
+class SlowQueryLog:
+    """The last ``max_entries`` statements that took ``threshold_ms`` or more, for /admin/debug/slow_queries."""
+
+    def __init__(self, max_entries: int, threshold_ms: float):
+        self.threshold = threshold_ms / 1000
+        self.entries: deque[dict] = deque(maxlen=max_entries)
+
+    def add(self, statement: str, seconds: float) -> None:
+        self.entries.append({
+            "sql": normalize_sql(statement),
+            "duration_ms": round(seconds * 1000, 3),
+            "path": current_path.get(),
+            "at": datetime.now(timezone.utc),
+        })
+
+    def recent(self, limit: int | None = None) -> list[dict]:
+        """Entries, newest first."""
+        entries = list(reversed(self.entries))
+        return entries[:limit] if limit else entries
+
+
+slow_query_log = SlowQueryLog(settings.slow_query_log_size, settings.slow_query_ms)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_start"]
+    DB_STATEMENT_SECONDS.labels(operation(statement)).observe(seconds)
+    stats = current_stats.get()
+    if stats is not None:
+        stats.add(statement, seconds)
+    if seconds >= slow_query_log.threshold:
+        slow_query_log.add(statement, seconds)
+
+
+def instrument(engine: AsyncEngine) -> None:
+    """Time every statement of ``engine``, for the request running it and the slow query log."""
+    sync_engine = engine.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
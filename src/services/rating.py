@@ -1,11 +1,34 @@
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import case, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.database.models import Photo, Rating
 from src.schemas import RatingCreate
 
 
-async def add_rating(db: Session, photo_id: int, rating: RatingCreate, user_id: int):
-    photo = db.query(Photo).filter(Photo.id == photo_id).first()
+def update_photo_rating(photo_id: int, count_delta: int, sum_delta: float):
+    """
+    Build an atomic UPDATE of the photo's rating aggregates.
+
+    The new values are computed from the current row values inside the
+    statement, so concurrent rating writes never overwrite each other.
+    """
+    new_count = Photo.rating_count + count_delta
+    new_sum = Photo.rating_sum + sum_delta
+    return (
+        update(Photo)
+        .where(Photo.id == photo_id)
+        .values(
+            rating_count=new_count,
+            rating_sum=new_sum,
+            avg_rating=case((new_count > 0, new_sum / new_count), else_=None),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def add_rating(db: AsyncSession, photo_id: int, rating: RatingCreate, user_id: int):
+    photo = await db.get(Photo, photo_id)
 
     if not photo:
         raise HTTPException(
@@ -24,25 +47,39 @@ async def add_rating(db: Session, photo_id: int, rating: RatingCreate, user_id:
             detail="Rating can be between 1 and 5",
         )
 
-    existing_rating = (
-        db.query(Rating)
-        .filter(Rating.photo_id == photo_id, Rating.user_id == user_id)
-        .first()
-    )
-    if existing_rating:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="You have rated this photo already!",
-        )
-
     new_rating = Rating(
         photo_id=photo_id,
         user_id=user_id,
         rating=rating.rating,
     )
 
+    # uq_ratings_photo_id_user_id rejects a second rating of the same user
     db.add(new_rating)
-    db.commit()
-    db.refresh(new_rating)
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You have rated this photo already!",
+        )
+    await db.execute(update_photo_rating(photo_id, 1, rating.rating))
+    await db.commit()
+    await db.refresh(new_rating)
 
     return new_rating
+
+
+async def delete_rating(db: AsyncSession, rating_id: int):
+    rating = await db.get(Rating, rating_id)
+
+    if not rating:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Rating not found"
+        )
+
+    await db.delete(rating)
+    await db.execute(update_photo_rating(rating.photo_id, -1, -rating.rating))
+    await db.commit()
+
+    return rating
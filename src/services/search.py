@@ -1,16 +1,76 @@
-from sqlalchemy.orm import Session
+import re
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from src.database.models import Photo
-from sqlalchemy import select
+from src.services.pagination import keyset
+from sqlalchemy import func, select
 
+# Text search configuration used by the photos.search_vector triggers
+SEARCH_CONFIG = "simple"
 
-async def search_photos(tag: str, keyword: str, db: Session) -> list[Photo]:
-    query = db.query(Photo)
 
-    if tag:
-        query = query.join(Photo.tags).filter(Photo.tags.any(name=tag))
+def build_ts_query(keyword: str) -> str | None:
+    """
+    Turn a user keyword into a prefix-matching tsquery expression.
+
+    Every word must match, the last characters may be incomplete
+    ("sun beac" matches "sunset on the beach").
+
+    :param keyword: Raw search string.
+    :type keyword: str
+    :return: tsquery text, or None when the keyword has no searchable words.
+    :rtype: str | None
+    """
+    terms = re.findall(r"\w+", keyword.lower())
+    if not terms:
+        return None
+    return " & ".join(f"{term}:*" for term in terms)
+
 
-    if keyword:
-        query = query.filter(Photo.description.ilike(f"%{keyword}%"))
+async def search_photos(
+    tag: str, keyword: str, db: AsyncSession, limit: int = 20, after: list | None = None,
+) -> list[Photo]:
+    """
+    Search photos by exact tag and/or keyword.
+
+    Keyword results are ranked by relevance (``ts_rank_cd``) over every
+    matching photo, best first, ties newest first; each photo gets its rank
+    as ``search_rank``, and ``after`` is the (rank, id) of the last photo of
+    the previous page. The other results are newest first and ``after`` is
+    the id of the last photo of the previous page.
+    """
+    if not keyword:
+        query = select(Photo).options(selectinload(Photo.tags))
+        if tag:
+            query = query.filter(Photo.tags.any(name=tag))
+        result = await db.execute(keyset(query, [Photo.id], after, descending=True).limit(limit))
+        return list(result.scalars().all())
+
+    ts_query_text = build_ts_query(keyword)
+    if ts_query_text is None:
+        return []
+    ts_query = func.to_tsquery(SEARCH_CONFIG, ts_query_text)
+
+    # Matches found with the GIN index ix_photos_search_vector
+    ranked = select(
+        Photo.id, func.ts_rank_cd(Photo.search_vector, ts_query).label("rank")
+    ).filter(Photo.search_vector.op("@@")(ts_query))
+    if tag:
+        ranked = ranked.filter(Photo.tags.any(name=tag))
+    ranked = ranked.subquery("ranked")
+    page = keyset(
+        select(ranked.c.id, ranked.c.rank), [ranked.c.rank, ranked.c.id], after, descending=True
+    ).limit(limit).subquery("page")
 
-    photos = query.all()
+    query = (
+        select(Photo, page.c.rank)
+        .options(selectinload(Photo.tags))
+        .join(page, page.c.id == Photo.id)
+        .order_by(page.c.rank.desc(), Photo.id.desc())
+    )
+    photos = []
+    for photo, rank in (await db.execute(query)).all():
+        photo.search_rank = rank
+        photos.append(photo)
     return photos
@@ -0,0 +1,383 @@
+import asyncio
+import os
+import re
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import AsyncIterator
+from uuid import uuid4
+
+from cloudinary.exceptions import BadRequest, Error, NotFound
+
+from src.conf.config import settings
+from src.services.cloudinary_client import CloudinaryClient, cloudinary_client
+from src.services.derivative_cache import (
+    DERIVED_SUFFIX,
+    DerivativeCache,
+    canonical_options,
+    derivative_key,
+    is_derived_from,
+    is_preview,
+    saved_key,
+)
+from src.services.image_engine import PROBE_BYTES, ImageEngine, probe_image
+from src.settings import logger
+
+
+# Version part of a local file URL: /storage/files/v<version>/<key>
+VERSION_PREFIX = re.compile(r"^v\d+/")
+
+
+class StorageBackend(ABC):
+    """
+    Where photos are stored and how their URLs are built.
+
+    Keys are public ids such as ``PhotoShare/alice1picjpg1a2b3c4d``. Every
+    backend raises ``cloudinary.exceptions`` errors (``NotFound``,
+    ``BadRequest``...) so the routes handle them in one place.
+    """
+
+    def __init__(self, derivatives: DerivativeCache | None = None):
+        if derivatives is None:
+            derivatives = DerivativeCache(settings.derivative_cache_entries, settings.derivative_cache_bytes)
+        self.derivatives = derivatives
+
+    @abstractmethod
+    async def put(self, chunks: AsyncIterator[bytes], key: str, filename: str | None = None) -> dict:
+        """Store a stream of chunks; returns ``public_id``, ``version`` and ``bytes``."""
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes:
+        """Content of a stored image (a bytes-like object)."""
+
+    @abstractmethod
+    async def delete(self, key: str) -> dict:
+        """Remove an image; returns ``{"result": "ok"}`` or ``{"result": "not found"}``."""
+
+    @abstractmethod
+    async def info(self, key: str) -> dict:
+        """Metadata of a stored image: ``public_id``, ``version``, ``bytes``."""
+
+    @abstractmethod
+    def url(self, key: str, version: int | None = None) -> str:
+        """URL of the original image."""
+
+    @abstractmethod
+    async def transform(self, key: str, version: int | None = None, **options) -> str:
+        """URL of the image with Cloudinary-style transformation options (crop, width, gravity...)."""
+
+    @abstractmethod
+    async def rendered_info(self, url: str) -> dict:
+        """``bytes``, ``width``, ``height`` and ``format`` of the image served at a URL of this storage."""
+
+    async def source(self, key: str) -> bytes | str:
+        """Original handed to the image engine: its content, or a file path it can open."""
+        return bytes(await self.get(key))
+
+    async def derive(self, key: str, version: int | None = None, **options) -> str:
+        """
+        Transform an image with the local engine and store the result next to it.
+
+        Results are kept in the derivative cache, keyed by the source key,
+        version and options, so a transformation already made is served
+        again without reprocessing.
+        """
+        options = canonical_options(options)
+        if not any(options.get(name) for name in ("width", "height", "aspect_ratio")):
+            return self.url(key, version)
+        derived_key = derivative_key(key, version, options)
+        stored = await self.cached_derivative(derived_key)
+        if stored is not None:
+            self.derivatives.hits += 1
+        else:
+            stored = await self.derivatives.shared(derived_key, lambda: self._derive(key, derived_key, options))
+        return self.url(derived_key, stored["version"])
+
+    async def _derive(self, key: str, derived_key: str, options: dict) -> dict:
+        try:
+            # Made by another worker, or before a restart
+            stored = await self.info(derived_key)
+            self.derivatives.hits += 1
+        except NotFound:
+            self.derivatives.misses += 1
+            content, _ = await image_engine.transform(await self.source(key), options)
+
+            async def chunks():
+                yield content
+
+            stored = await self.put(chunks(), derived_key)
+        await self._remove(self.derivatives.add(derived_key, stored.get("version"), stored.get("bytes", 0)))
+        return stored
+
+    async def cached_derivative(self, key: str) -> dict | None:
+        """Version and size of a derivative known to the cache, None to look it up in storage."""
+        return self.derivatives.get(key)
+
+    async def _remove(self, keys) -> None:
+        for key in keys:
+            try:
+                await self.delete(key)
+            except Error as e:
+                logger.warning(f"Derivative {key} was not removed: {e}")
+
+    async def find_derivatives(self, source: str | None = None) -> list[dict]:
+        """
+        Stored transformations (previews and saved) of an image, or of all images.
+
+        Only backends able to list their files find the ones this process
+        has not indexed; returns ``public_id``, ``version`` and ``bytes``.
+        """
+        return []
+
+    async def load_derivatives(self) -> None:
+        """Index the stored previews at startup, oldest first."""
+        previews = [item for item in await self.find_derivatives() if is_preview(item["public_id"])]
+        for item in sorted(previews, key=lambda item: item["version"] or 0):
+            await self._remove(self.derivatives.add(item["public_id"], item["version"], item["bytes"]))
+        logger.info(f"Derivative cache loaded: {self.derivatives.stats()}")
+
+    async def invalidate(self, key: str, saved: bool = False) -> None:
+        """
+        Remove the previews made from an image, once it is replaced or deleted.
+
+        :param saved: Also remove the saved transformations (the image itself is deleted).
+        """
+        keys = set(self.derivatives.drop_source(key))
+        keys.update(
+            item["public_id"] for item in await self.find_derivatives(key)
+            if is_derived_from(item["public_id"], key, saved)
+        )
+        await self._remove(sorted(keys))
+
+    async def transform_saved(self, key: str, version: int | None = None, **options) -> str:
+        """
+        URL of a transformation kept for good, not subject to cache eviction:
+        an avatar, or what a photo shows, whose URL is stored in the database.
+        """
+        url = await self.transform(key, version, **options)
+        derived_key = derivative_key(key, version, options)
+        if not url.endswith(derived_key):
+            # Rendered by Cloudinary, or nothing to transform
+            return url
+        saved = await self.promote(derived_key)
+        return self.url(saved["public_id"], saved.get("version"))
+
+    async def promote(self, key: str) -> dict:
+        """
+        Keep a preview as a saved transformation, out of reach of cache eviction.
+
+        :return: ``public_id``, ``version``, ``bytes``, ``width``, ``height`` and
+            ``format`` of the saved image.
+        """
+        target = saved_key(key)
+        self.derivatives.discard(key)
+        try:
+            # Saved for another photo of the same image
+            return await self.info(target)
+        except NotFound:
+            pass
+        content = bytes(await self.get(key))
+
+        async def chunks():
+            yield content
+
+        stored = await self.put(chunks(), target)
+        await self._remove([key])
+        return {**stored, **(probe_image(content) or {})}
+
+    async def aclose(self) -> None:
+        pass
+
+
+class CloudinaryStorage(StorageBackend):
+    """
+    Images stored on Cloudinary.
+
+    Transformations are delivery URLs rendered by Cloudinary, or with
+    ``local_transforms`` made by the local engine and uploaded as new images.
+    """
+
+    def __init__(self, client: CloudinaryClient, local_transforms: bool = False,
+                 derivatives: DerivativeCache | None = None):
+        super().__init__(derivatives)
+        self.client = client
+        self.local_transforms = local_transforms
+
+    async def put(self, chunks: AsyncIterator[bytes], key: str, filename: str | None = None) -> dict:
+        return await self.client.upload_stream(chunks, key, filename)
+
+    async def get(self, key: str) -> bytes:
+        return await self.client.download(key)
+
+    async def delete(self, key: str) -> dict:
+        return await self.client.destroy(key)
+
+    async def info(self, key: str) -> dict:
+        return await self.client.resource(key)
+
+    def url(self, key: str, version: int | None = None) -> str:
+        return self.client.url(key, version=version)
+
+    async def transform(self, key: str, version: int | None = None, **options) -> str:
+        if self.local_transforms:
+            return await self.derive(key, version, **options)
+        return self.client.url(key, version=version, **options)
+
+    async def rendered_info(self, url: str) -> dict:
+        # Transformations in the URL are rendered by Cloudinary, not stored
+        content = await self.client.fetch(url)
+        return {"bytes": len(content), **(probe_image(content[:PROBE_BYTES]) or {})}
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class LocalStorage(StorageBackend):
+    """
+    Images stored as files under ``root``, served by ``GET /storage/files``.
+
+    Uploads are written to a temporary file and renamed into place, so a
+    file is never seen half-written. File system calls run in worker
+    threads, off the event loop; the route serves files with ``FileResponse`` (``sendfile`` where the server
+    supports it) or hands them to the reverse proxy with ``X-Accel-Redirect``.
+    The version is the file's modification time in milliseconds.
+    """
+
+    def __init__(self, root: str, base_url: str = "", derivatives: DerivativeCache | None = None):
+        super().__init__(derivatives)
+        self.root = Path(root).resolve()
+        self.base_url = base_url.rstrip("/")
+
+    def path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root not in path.parents:
+            raise BadRequest(f"Invalid storage key - {key}")
+        return path
+
+    def _info(self, key: str) -> dict:
+        try:
+            stat = self.path(key).stat()
+        except FileNotFoundError:
+            raise NotFound(f"Resource not found - {key}")
+        return {"public_id": key, "version": stat.st_mtime_ns // 1_000_000, "bytes": stat.st_size}
+
+    async def put(self, chunks: AsyncIterator[bytes], key: str, filename: str | None = None) -> dict:
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f".{path.name}.{uuid4().hex}.part")
+        file = await asyncio.to_thread(open, partial, "wb")
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(file.write, chunk)
+            await asyncio.to_thread(file.close)
+            await asyncio.to_thread(os.replace, partial, path)
+        except BaseException:
+            file.close()
+            partial.unlink(missing_ok=True)
+            raise
+        return await asyncio.to_thread(self._info, key)
+
+    async def get(self, key: str) -> bytes:
+        def read():
+            with open(self.path(key), "rb") as file:
+                return file.read()
+
+        try:
+            return await asyncio.to_thread(read)
+        except FileNotFoundError:
+            raise NotFound(f"Resource not found - {key}")
+
+    async def delete(self, key: str) -> dict:
+        try:
+            await asyncio.to_thread(self.path(key).unlink)
+        except FileNotFoundError:
+            return {"result": "not found"}
+        return {"result": "ok"}
+
+    async def info(self, key: str) -> dict:
+        return await asyncio.to_thread(self._info, key)
+
+    def url(self, key: str, version: int | None = None) -> str:
+        version_part = f"v{version}/" if version else ""
+        return f"{self.base_url}/storage/files/{version_part}{key}"
+
+    async def source(self, key: str) -> str:
+        # The worker process maps the file itself, nothing is copied here
+        await asyncio.to_thread(self._info, key)
+        return str(self.path(key))
+
+    async def transform(self, key: str, version: int | None = None, **options) -> str:
+        return await self.derive(key, version, **options)
+
+    async def rendered_info(self, url: str) -> dict:
+        key = VERSION_PREFIX.sub("", url.split("/storage/files/", 1)[-1])
+
+        def read():
+            try:
+                with open(self.path(key), "rb") as file:
+                    return self._info(key), file.read(PROBE_BYTES)
+            except FileNotFoundError:
+                raise NotFound(f"Resource not found - {key}")
+
+        stored, head = await asyncio.to_thread(read)
+        return {"bytes": stored["bytes"], **(probe_image(head) or {})}
+
+    async def cached_derivative(self, key: str) -> dict | None:
+        stored = self.derivatives.get(key)
+        if stored is not None and not await asyncio.to_thread(self.path(key).is_file):
+            # Saved or evicted by another worker
+            self.derivatives.discard(key)
+            return None
+        return stored
+
+    async def find_derivatives(self, source: str | None = None) -> list[dict]:
+        def find():
+            if source is None:
+                files = self.root.rglob("*_[ts]*")
+            else:
+                path = self.path(source)
+                files = path.parent.glob(f"{path.name}_[ts]*")
+            found = []
+            for file in files:
+                key = file.relative_to(self.root).as_posix()
+                if DERIVED_SUFFIX.search(key) and not file.name.startswith("."):
+                    try:
+                        found.append(self._info(key))
+                    except NotFound:
+                        pass
+            return found
+
+        return await asyncio.to_thread(find)
+
+    async def promote(self, key: str) -> dict:
+        target = saved_key(key)
+
+        def save():
+            # A second link to the file: the preview stays cached until evicted
+            try:
+                os.link(self.path(key), self.path(target))
+            except FileExistsError:
+                # Saved for another photo of the same image
+                pass
+            except FileNotFoundError:
+                # Evicted meanwhile, found only if saved by another request
+                pass
+            with open(self.path(target), "rb") as file:
+                return self._info(target), file.read(PROBE_BYTES)
+
+        try:
+            stored, head = await asyncio.to_thread(save)
+        except FileNotFoundError:
+            raise NotFound(f"Resource not found - {key}")
+        return {**stored, **(probe_image(head) or {})}
+
+
+def create_storage() -> StorageBackend:
+    if settings.storage_backend == "local":
+        return LocalStorage(settings.storage_local_root, settings.storage_local_base_url)
+    return CloudinaryStorage(cloudinary_client, local_transforms=settings.image_engine == "local")
+
+
+image_engine = ImageEngine(settings.image_workers, settings.image_queue)
+
+
+storage = create_storage()
@@ -0,0 +1,210 @@
+import hashlib
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
+
+from fastapi import HTTPException, Request, status
+from python_multipart.multipart import parse_options_header
+
+from src.conf.config import settings
+from src.services.image_engine import PROBE_BYTES, probe_image
+from src.services.multipart import MultipartReader
+from src.services.storage import storage
+
+MAX_FIELD_BYTES = 64 * 1024
+# Room for the form fields and part headers on top of the file itself
+FORM_OVERHEAD_BYTES = 64 * 1024
+SNIFF_BYTES = 12
+
+BRANDS_HEIF = {b"heic", b"heix", b"hevc", b"heim", b"heis", b"mif1", b"msf1", b"avif", b"avis"}
+
+
+def sniff_image_type(head: bytes) -> str | None:
+    """Content type of an image from its first bytes, None if not a known image format."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "image/tiff"
+    if head.startswith(b"BM"):
+        return "image/bmp"
+    if head[4:8] == b"ftyp" and head[8:12] in BRANDS_HEIF:
+        return "image/avif" if head[8:12] in (b"avif", b"avis") else "image/heic"
+    return None
+
+
+class UploadLimiter:
+    """
+    Caps the uploads a user has in progress in this worker.
+
+    Requests over the limit are rejected with 429 before their body is read.
+    """
+
+    def __init__(self, max_per_user: int):
+        self.max_per_user = max_per_user
+        self.active: dict[int, int] = {}
+
+    @asynccontextmanager
+    async def slot(self, user_id: int):
+        if self.active.get(user_id, 0) >= self.max_per_user:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many uploads in progress",
+                headers={"Retry-After": "1"},
+            )
+        self.active[user_id] = self.active.get(user_id, 0) + 1
+        try:
+            yield
+        finally:
+            self.active[user_id] -= 1
+            if not self.active[user_id]:
+                del self.active[user_id]
+
+
+upload_limiter = UploadLimiter(settings.upload_max_concurrent_per_user)
+
+
+class Upload:
+    """A file streamed to storage, with the form fields sent alongside it."""
+
+    def __init__(self, public_id: str, filename: str, content_type: str, size: int, sha256: str,
+                 fields: dict[str, str], result: dict, image: dict | None = None):
+        self.public_id = public_id
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.sha256 = sha256
+        self.fields = fields
+        self.result = result
+        # Read from the image header, or else as reported by storage
+        image = image or {}
+        self.width = image.get("width") or result.get("width")
+        self.height = image.get("height") or result.get("height")
+        self.format = image.get("format") or result.get("format")
+
+
+def too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File larger than {max_bytes} bytes",
+    )
+
+
+async def receive_upload(
+    request: Request,
+    user_id: int,
+    public_id: Callable[[str], str],
+    required: tuple[str, ...] = (),
+    max_bytes: int | None = None,
+) -> Upload:
+    """
+    Stream the ``file`` part of a multipart/form-data request to storage.
+
+    The body is parsed as it arrives instead of being spooled by Starlette:
+    the image type is checked from the first bytes (415), the dimensions are
+    read from its header, the size is counted and the SHA-256 computed chunk
+    by chunk, and the upload is aborted as soon as it grows over
+    ``max_bytes`` (413). At most ``upload_max_concurrent_per_user`` uploads
+    run per user (429).
+
+    :param public_id: Builds the storage key (public id) from the file name.
+    :param required: Form fields that must be sent; the upload is removed
+        again when one is missing (422).
+    """
+    max_bytes = max_bytes or settings.upload_max_bytes
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected multipart/form-data")
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + FORM_OVERHEAD_BYTES:
+        raise too_large(max_bytes)
+
+    async with upload_limiter.slot(user_id):
+        reader = MultipartReader(options[b"boundary"], request.stream())
+        fields: dict[str, str] = {}
+        upload = None
+        try:
+            while part := await reader.next_part():
+                if part.filename is None:
+                    try:
+                        fields[part.name] = (await reader.read(MAX_FIELD_BYTES)).decode()
+                    except ValueError as e:
+                        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+                elif part.name == "file" and upload is None:
+                    upload = await stream_file(reader, part.filename, public_id(part.filename), max_bytes)
+            if upload is None:
+                raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Missing file")
+            upload.fields = fields
+            missing = [name for name in required if name not in fields]
+            if missing:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"Missing form fields: {', '.join(missing)}",
+                )
+        except BaseException:
+            # The file is stored, but the rest of the form is not usable
+            if upload is not None:
+                await storage.delete(upload.public_id)
+            raise
+        return upload
+
+
+async def stream_file(reader: MultipartReader, filename: str, public_id: str, max_bytes: int) -> Upload:
+    chunks = reader.iter_data()
+    head = b""
+    async for chunk in chunks:
+        head += chunk
+        if len(head) >= SNIFF_BYTES:
+            break
+    content_type = sniff_image_type(head)
+    if content_type is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="File is not a supported image"
+        )
+    if len(head) > max_bytes:
+        raise too_large(max_bytes)
+    digest = hashlib.sha256(head)
+    size = len(head)
+    probe = bytearray(head)
+    image = probe_image(head)
+
+    async def counted() -> AsyncIterator[bytes]:
+        nonlocal size, image
+        yield head
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise too_large(max_bytes)
+            digest.update(chunk)
+            if image is None and len(probe) < PROBE_BYTES:
+                probe.extend(chunk)
+                image = probe_image(bytes(probe))
+            yield chunk
+
+    result = await storage.put(counted(), public_id, filename)
+    return Upload(public_id, filename, content_type, size, digest.hexdigest(), {}, result, image)
+
+
+def upload_form(**fields: str) -> dict:
+    """OpenAPI request body of a streamed upload: a ``file`` plus string form fields."""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["file", *fields],
+                        "properties": {
+                            "file": {"type": "string", "format": "binary"},
+                            **{name: {"type": kind} for name, kind in fields.items()},
+                        },
+                    }
+                }
+            },
+        }
+    }
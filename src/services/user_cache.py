@@ -0,0 +1,162 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+from src.database.models import User
+from src.settings import logger
+
+KEY_PREFIX = "user_cache:"
+# Invalidations are broadcast so that every worker drops its local copy
+CHANNEL = "user_cache"
+# Credentials are never cached; current_user does not need them
+CACHED_COLUMNS = (
+    "id", "username", "email", "created_at", "updated_at",
+    "role", "allowed", "avatar", "phone_number", "confirmed",
+)
+DATETIME_COLUMNS = ("created_at", "updated_at")
+
+
+def user_to_fields(user: User) -> dict:
+    return {column: getattr(user, column) for column in CACHED_COLUMNS}
+
+
+def dump_fields(fields: dict) -> str:
+    return json.dumps(
+        {k: v.isoformat() if k in DATETIME_COLUMNS and v else v for k, v in fields.items()}
+    )
+
+
+def load_fields(data: str) -> dict:
+    fields = json.loads(data)
+    for column in DATETIME_COLUMNS:
+        if fields.get(column):
+            fields[column] = datetime.fromisoformat(fields[column])
+    return fields
+
+
+class UserCache:
+    """
+    Short-lived cache of authenticated users keyed by token subject and ``iat``.
+
+    An in-process LRU is backed by an optional Redis tier shared by the
+    workers (one hash per subject, so a user is invalidated with one DEL).
+    Entries expire after ``ttl`` seconds and are dropped by ``invalidate``
+    whenever the user row changes.
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.redis: Redis | None = None
+        self._entries: OrderedDict[tuple[str, int], tuple[float, dict]] = OrderedDict()
+        # Loads started before an invalidation must not be stored
+        self._invalidated_at: dict[str, float] = {}
+        self._listener: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+
+    async def start(self, redis: Redis) -> None:
+        self.redis = redis
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            self._listener = None
+        self.redis = None
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._drop(message["data"])
+            except RedisError as e:
+                logger.warning(f"User cache lost its Redis subscription: {e}")
+                await asyncio.sleep(1)
+
+    def _drop(self, subject: str) -> None:
+        now = time.monotonic()
+        self._invalidated_at[subject] = now
+        for key in [key for key in self._entries if key[0] == subject]:
+            del self._entries[key]
+        if len(self._invalidated_at) > self.maxsize:
+            self._invalidated_at = {
+                s: at for s, at in self._invalidated_at.items() if now - at < self.ttl
+            }
+
+    def _store_local(self, subject: str, iat: int, fields: dict) -> None:
+        self._entries[(subject, iat)] = (time.monotonic() + self.ttl, fields)
+        self._entries.move_to_end((subject, iat))
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get(self, subject: str, iat: int) -> dict | None:
+        """Cached user columns for a token, or None."""
+        entry = self._entries.get((subject, iat))
+        if entry is not None:
+            expires_at, fields = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end((subject, iat))
+                self.hits += 1
+                return fields
+            del self._entries[(subject, iat)]
+
+        if self.redis is not None:
+            loaded_at = time.monotonic()
+            try:
+                data = await self.redis.hget(f"{KEY_PREFIX}{subject}", str(iat))
+            except RedisError as e:
+                logger.warning(f"User cache lookup failed: {e}")
+                data = None
+            if data is not None:
+                cached_at, fields = json.loads(data)
+                if cached_at + self.ttl > time.time():
+                    fields = load_fields(fields)
+                    if self._invalidated_at.get(subject, 0) < loaded_at:
+                        self._store_local(subject, iat, fields)
+                    self.hits += 1
+                    return fields
+
+        self.misses += 1
+        return None
+
+    async def set(self, subject: str, iat: int, fields: dict, loaded_at: float) -> None:
+        """
+        Cache the user columns of a token.
+
+        :param loaded_at: ``time.monotonic()`` taken before the user was read.
+        """
+        if self._invalidated_at.get(subject, 0) >= loaded_at:
+            return
+        self._store_local(subject, iat, fields)
+        if self.redis is not None:
+            key = f"{KEY_PREFIX}{subject}"
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.hset(key, str(iat), json.dumps([time.time(), dump_fields(fields)]))
+                    pipe.expire(key, self.ttl)
+                    await pipe.execute()
+            except RedisError as e:
+                logger.warning(f"User cache update failed: {e}")
+
+    async def invalidate(self, subject: str) -> None:
+        """Forget every cached token of a user, in all workers."""
+        self._drop(subject)
+        if self.redis is not None:
+            try:
+                await self.redis.delete(f"{KEY_PREFIX}{subject}")
+                await self.redis.publish(CHANNEL, subject)
+            except RedisError as e:
+                logger.warning(f"User cache invalidation failed: {e}")
+
+
+user_cache = UserCache(settings.user_cache_size, settings.user_cache_ttl)
@@ -0,0 +1,23 @@
+import asyncio
+
+from src.database.db import AsyncSessionLocal
+from src.repository import admin_moderation as repository_admin_moderation
+from src.settings import logger
+
+
+async def refresh_user_statistics_periodically(interval: int) -> None:
+    """
+    Refresh the user_statistics materialized view every ``interval`` seconds.
+
+    Meant to run as a background task for the lifetime of the application.
+
+    :param interval: Seconds between two refreshes.
+    :type interval: int
+    """
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                await repository_admin_moderation.refresh_user_statistics_view(db)
+        except Exception as e:
+            logger.warning(f"User statistics refresh failed: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,35 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+@pytest.fixture
+def count_statements():
+    """
+    Record the SQL statements run on an engine inside a ``with`` block.
+
+    With ``at_most`` the block fails when more statements were run, e.g. one
+    per row of a page (N+1 queries):
+
+        with count_statements(engine, at_most=3) as statements:
+            await get_users_photos(...)
+    """
+
+    @contextmanager
+    def counting(engine: AsyncEngine, at_most: int | None = None):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        if at_most is not None:
+            assert len(statements) <= at_most, f"{len(statements)} statements:\n" + "\n\n".join(statements)
+
+    return counting
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY, CollectorRegistry, generate_latest
+
+from src.database.db import get_async_db
+from src.database.models import User
+from src.middleware.metrics_middleware import MetricsMiddleware
+from src.routes import metrics
+from src.services.metrics import CacheCollector, PoolCollector, monitor_event_loop_lag
+
+app = FastAPI()
+app.add_middleware(MetricsMiddleware)
+
+
+@app.get("/items/{item_id}")
+async def read_item(item_id: int):
+    if item_id == 0:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return {"in_progress": sample("photoshare_http_requests_in_progress", method="GET")}
+
+
+@app.get("/broken")
+async def broken():
+    raise RuntimeError("boom")
+
+
+client = TestClient(app, raise_server_exceptions=False)
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def requests(method: str, route: str, status: str) -> float:
+    return sample("photoshare_http_request_seconds_count", method=method, route=route, status=status)
+
+
+def test_requests_counted_by_route_template():
+    ok = requests("GET", "/items/{item_id}", "200")
+    missing = requests("GET", "/items/{item_id}", "404")
+
+    responses = [client.get(f"/items/{item_id}") for item_id in (1, 2, 0)]
+
+    assert responses[0].json() == {"in_progress": 1}
+    assert requests("GET", "/items/{item_id}", "200") == ok + 2
+    assert requests("GET", "/items/{item_id}", "404") == missing + 1
+    assert sample("photoshare_http_requests_in_progress", method="GET") == 0
+
+
+def test_unmatched_paths_and_errors():
+    unmatched = requests("GET", "unmatched", "404")
+    failed = requests("GET", "/broken", "500")
+
+    client.get("/no/such/path")
+    client.get("/broken")
+
+    assert requests("GET", "unmatched", "404") == unmatched + 1
+    assert requests("GET", "/broken", "500") == failed + 1
+
+
+def test_collectors_read_when_scraped():
+    registry = CollectorRegistry()
+    cache = SimpleNamespace(hits=3, misses=1)
+    pool = SimpleNamespace(size=lambda: 5, checkedout=lambda: 2)
+    registry.register(CacheCollector({"user": lambda: cache}))
+    registry.register(PoolCollector(lambda: pool))
+    cache.hits = 9
+
+    assert registry.get_sample_value("photoshare_cache_hit_ratio", {"cache": "user"}) == 0.9
+    assert registry.get_sample_value("photoshare_cache_misses_total", {"cache": "user"}) == 1
+    assert registry.get_sample_value("photoshare_db_pool_checked_out") == 2
+    assert b"photoshare_db_pool_overflow" not in generate_latest(registry)
+
+
+@pytest.mark.asyncio
+async def test_event_loop_lag():
+    lag = sample("photoshare_event_loop_lag_probe_seconds_sum")
+    monitor = asyncio.create_task(monitor_event_loop_lag(0.01))
+    await asyncio.sleep(0.015)
+    # Blocks the loop past the probe's due time
+    time.sleep(0.05)
+    await asyncio.sleep(0.01)
+    monitor.cancel()
+
+    assert sample("photoshare_event_loop_lag_probe_seconds_sum") - lag >= 0.03
+
+
+def test_metrics_refused_without_credentials():
+    metrics_app = FastAPI()
+    metrics_app.include_router(metrics.router)
+    metrics_app.dependency_overrides[get_async_db] = lambda: None
+    metrics_client = TestClient(metrics_app)
+    user = AsyncMock(return_value=User(id=1, role="user"))
+    admin = AsyncMock(return_value=User(id=2, role="admin"))
+
+    with patch.object(metrics.settings, "metrics_token", "scrape"):
+        anonymous = metrics_client.get("/metrics")
+        wrong_token = metrics_client.get("/metrics", auth=("prometheus", "guess"))
+        scraper = metrics_client.get("/metrics", auth=("prometheus", "scrape"))
+        with patch.object(metrics.auth_service, "get_current_user", user):
+            not_admin = metrics_client.get("/metrics", headers={"Authorization": "Bearer t"})
+        with patch.object(metrics.auth_service, "get_current_user", admin):
+            by_admin = metrics_client.get("/metrics", headers={"Authorization": "Bearer t"})
+
+    assert (anonymous.status_code, wrong_token.status_code, not_admin.status_code) == (401, 401, 403)
+    assert scraper.status_code == by_admin.status_code == 200
+    assert b"photoshare_http_request_seconds" in scraper.content
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.conf.config import settings
+from src.middleware.query_stats_middleware import QueryStatsMiddleware
+from src.services import query_stats
+from src.services.query_stats import DB_REQUEST_STATEMENTS, SlowQueryLog
+
+
+def make_client(headers: bool, monkeypatch) -> TestClient:
+    monkeypatch.setattr(settings, "query_stats_headers", headers)
+    engine = create_async_engine("sqlite+aiosqlite://")
+    query_stats.instrument(engine)
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        async with engine.connect() as connection:
+            for value in range(item_id):
+                await connection.execute(text(f"SELECT {value}, 'name'"))
+        return {"item_id": item_id}
+
+    return TestClient(app)
+
+
+def test_headers_in_debug_mode(monkeypatch):
+    client = make_client(True, monkeypatch)
+
+    response = client.get("/items/3")
+
+    assert response.status_code == 200
+    assert response.headers["x-db-statements"] == "3"
+    assert float(response.headers["x-db-time-ms"]) > 0
+    slowest = json.loads(response.headers["x-db-slowest"])
+    assert [entry["sql"] for entry in slowest] == ["SELECT ?, ?"] * 3
+
+
+def test_no_headers_by_default(monkeypatch):
+    client = make_client(False, monkeypatch)
+    before = DB_REQUEST_STATEMENTS.labels("/items/{item_id}")._sum.get()
+
+    response = client.get("/items/2")
+
+    assert "x-db-statements" not in response.headers
+    assert DB_REQUEST_STATEMENTS.labels("/items/{item_id}")._sum.get() == before + 2
+
+
+def test_slow_statements_logged_with_path(monkeypatch):
+    log = SlowQueryLog(max_entries=2, threshold_ms=0)
+    monkeypatch.setattr(query_stats, "slow_query_log", log)
+    client = make_client(False, monkeypatch)
+
+    client.get("/items/3")
+
+    assert [(entry["sql"], entry["path"]) for entry in log.recent()] == [("SELECT ?, ?", "/items/3")] * 2
+
+
+@pytest.mark.parametrize("statement, normalized", [
+    ("SELECT photos.id FROM photos WHERE photos.id = $1::INTEGER", "SELECT photos.id FROM photos WHERE photos.id = ?::INTEGER"),
+    ("SELECT * FROM tags WHERE name IN ($1, $2, $3)\n  LIMIT 10", "SELECT * FROM tags WHERE name IN (?) LIMIT ?"),
+    ("INSERT INTO t (a, b) VALUES (1, 'x'), (2, 'it''s')", "INSERT INTO t (a, b) VALUES (?)"),
+    ("SELECT t1.c2 FROM t1 WHERE t1.c2 > -1.5", "SELECT t1.c2 FROM t1 WHERE t1.c2 > ?"),
+])
+def test_normalize_sql(statement, normalized):
+    assert query_stats.normalize_sql(statement) == normalized
@@ -0,0 +1,87 @@
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from src.conf.config import settings
+from src.middleware.security_middleware import AuthMiddleware
+from src.repository.token_blacklist import add_token_to_blacklist
+from src.services.auth import auth_service
+
+app = FastAPI()
+app.add_middleware(AuthMiddleware)
+
+
+@app.get("/public")
+async def public(request: Request):
+    return {"payload": getattr(request.state, "token_payload", None)}
+
+
+@app.get("/claims")
+async def claims(payload: dict = Depends(auth_service.get_token_payload)):
+    return payload
+
+
+client = TestClient(app)
+
+
+def make_token(**claims) -> str:
+    payload = {"sub": "a@x.com", "scope": "access_token", "exp": int(time.time()) + 600}
+    payload.update(claims)
+    return jwt.encode(payload, settings.jwt_secret_key, algorithm=settings.algorithm)
+
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_no_token_passes_through():
+    response = client.get("/public")
+
+    assert response.status_code == 200
+    assert response.json() == {"payload": None}
+
+
+def test_claims_stored_on_request_state():
+    response = client.get("/public", headers=bearer(make_token(jti="state")))
+
+    assert response.json()["payload"]["jti"] == "state"
+
+
+def test_token_decoded_once():
+    token = make_token(jti="once")
+
+    with patch("jose.jwt.decode", wraps=jwt.decode) as decode:
+        response = client.get("/claims", headers=bearer(token))
+
+    assert response.status_code == 200
+    assert response.json()["jti"] == "once"
+    decode.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "token, detail",
+    [
+        ("not-a-jwt", "Invalid token."),
+        (make_token(exp=int(time.time()) - 10), "Token has expired"),
+    ],
+)
+def test_bad_token_rejected(token, detail):
+    response = client.get("/public", headers=bearer(token))
+
+    assert response.status_code == 401
+    assert response.json() == {"detail": detail}
+
+
+@pytest.mark.asyncio
+async def test_revoked_token_rejected():
+    token = make_token(jti="revoked")
+    await add_token_to_blacklist(token, jwt.get_unverified_claims(token))
+
+    response = client.get("/public", headers=bearer(token))
+
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Token is blacklisted. Please log in again."}
@@ -0,0 +1,33 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.repository.admin_moderation import get_user_statistics, user_statistics_query
+from src.schemas import UserStatistics
+
+
+def test_user_statistics_query_is_one_statement_with_grouped_ctes():
+    sql = str(user_statistics_query(limit=10, after_id=5).compile(compile_kwargs={"literal_binds": True}))
+
+    assert sql.count("GROUP BY") == 3
+    for cte in ("page_users", "photo_stats", "comment_stats", "given_stats"):
+        assert f"{cte} AS" in sql
+    assert "users.id > 5" in sql
+    assert "LIMIT 10" in sql
+
+
+@pytest.mark.asyncio
+async def test_get_user_statistics_runs_a_single_query():
+    db = AsyncMock(spec=AsyncSession)
+    db.execute.return_value = [
+        SimpleNamespace(user_id=1, username="alice", num_images=2, num_comments=0,
+                        rating=3.456, average_rating_given=None),
+    ]
+
+    result = await get_user_statistics(db, limit=10)
+
+    db.execute.assert_awaited_once()
+    assert result == [
+        UserStatistics(user_id=1, username="alice", num_images=2, num_comments=0,
+                       rating=3.46, average_rating_given=0.0)
+    ]
@@ -0,0 +1,231 @@
+import asyncio
+import io
+
+import cloudinary
+import httpx
+import pytest
+from PIL import Image
+from prometheus_client import REGISTRY
+from cloudinary.exceptions import BadRequest, GeneralError, NotFound
+
+from src.services.cloudinary_client import CloudinaryClient, FakeCloudinary
+
+
+def client(handler=None, fake=None, **kwargs) -> CloudinaryClient:
+    transport = fake.transport() if fake else httpx.MockTransport(handler)
+    kwargs.setdefault("backoff", 0)
+    return CloudinaryClient("demo", "key", "secret", transport=transport, **kwargs)
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.mark.asyncio
+async def test_fake_backend_round_trip():
+    fake = FakeCloudinary()
+    cloudinary_client = client(fake=fake)
+
+    uploaded = await cloudinary_client.upload(io.BytesIO(b"\xff\xd8image"), "PhotoShare/pic")
+    resource = await cloudinary_client.resource("PhotoShare/pic")
+    destroyed = await cloudinary_client.destroy("PhotoShare/pic")
+
+    assert uploaded["public_id"] == "PhotoShare/pic"
+    assert uploaded["bytes"] == 7
+    assert resource["version"] == uploaded["version"]
+    assert destroyed == {"result": "ok"}
+    with pytest.raises(NotFound):
+        await cloudinary_client.resource("PhotoShare/pic")
+
+
+@pytest.mark.asyncio
+async def test_fake_backend_serves_delivery_urls():
+    fake = FakeCloudinary()
+    cloudinary_client = client(fake=fake)
+    png = io.BytesIO()
+    Image.new("RGB", (40, 20), "red").save(png, "PNG")
+
+    uploaded = await cloudinary_client.upload(io.BytesIO(png.getvalue()), "PhotoShare/pic")
+    original = await cloudinary_client.download("PhotoShare/pic")
+    cropped = await cloudinary_client.fetch(
+        cloudinary_client.url("PhotoShare/pic", version=uploaded["version"], crop="fill", width=10, height=10)
+    )
+
+    assert (uploaded["width"], uploaded["height"], uploaded["format"]) == (40, 20, "png")
+    assert original == png.getvalue()
+    assert Image.open(io.BytesIO(cropped)).size == (10, 10)
+    await cloudinary_client.destroy("PhotoShare/pic")
+    with pytest.raises(NotFound):
+        await cloudinary_client.download("PhotoShare/pic")
+
+
+@pytest.mark.asyncio
+async def test_upload_is_signed():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"version": 1})
+
+    await client(handler).upload(io.BytesIO(b"data"), "PhotoShare/pic")
+
+    body = requests[0].content
+    assert requests[0].url == "https://api.cloudinary.com/v1_1/demo/image/upload"
+    assert b'name="signature"' in body and b'name="api_key"' in body
+
+
+@pytest.mark.asyncio
+async def test_retries_server_errors_and_rewinds_file():
+    bodies = []
+
+    def handler(request):
+        bodies.append(request.read())
+        if len(bodies) < 3:
+            return httpx.Response(503, json={"error": {"message": "busy"}})
+        return httpx.Response(200, json={"version": 7})
+
+    result = await client(handler, max_retries=3).upload(io.BytesIO(b"payload"), "PhotoShare/pic")
+
+    assert result == {"version": 7}
+    assert len(bodies) == 3
+    assert all(b"payload" in body for body in bodies)
+
+
+@pytest.mark.asyncio
+async def test_client_errors_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400, json={"error": {"message": "Invalid image file"}})
+
+    timed = sample("photoshare_cloudinary_request_seconds_count", action="destroy")
+    errors = sample("photoshare_cloudinary_errors_total", action="destroy", reason="400")
+
+    with pytest.raises(BadRequest, match="Invalid image file"):
+        await client(handler).destroy("PhotoShare/pic")
+    assert len(calls) == 1
+    assert sample("photoshare_cloudinary_request_seconds_count", action="destroy") == timed + 1
+    assert sample("photoshare_cloudinary_errors_total", action="destroy", reason="400") == errors + 1
+
+
+@pytest.mark.asyncio
+async def test_network_errors_give_up_after_retries():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.ConnectTimeout("timed out")
+
+    errors = sample("photoshare_cloudinary_errors_total", action="resource", reason="transport")
+
+    with pytest.raises(GeneralError):
+        await client(handler, max_retries=2).resource("PhotoShare/pic")
+    assert len(calls) == 3
+    assert sample("photoshare_cloudinary_errors_total", action="resource", reason="transport") == errors + 3
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded():
+    in_flight = peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json={"result": "ok"})
+
+    cloudinary_client = client(handler, max_concurrency=3)
+
+    await asyncio.gather(*(cloudinary_client.destroy(f"PhotoShare/{i}") for i in range(12)))
+
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_backoff_releases_the_slot():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path.rsplit("/", 1)[-1])
+        if len(calls) == 1:
+            return httpx.Response(503, json={"error": {"message": "busy"}})
+        return httpx.Response(200, json={"result": "ok"})
+
+    cloudinary_client = client(handler, max_concurrency=1, backoff=0.05)
+    # The first destroy sleeps before its retry (up to 0.05s) while the second one runs
+    retried = asyncio.create_task(cloudinary_client._request("POST", "https://api/v1_1/demo/image/first"))
+    await asyncio.sleep(0)
+    await cloudinary_client._request("POST", "https://api/v1_1/demo/image/second")
+    await retried
+
+    assert calls[:2] == ["first", "second"]
+
+
+@pytest.mark.asyncio
+async def test_resource_uses_configured_api_host(monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"version": 1})
+
+    monkeypatch.setattr(cloudinary.config(), "upload_prefix", "https://api-eu.cloudinary.com", raising=False)
+
+    await client(handler).resource("PhotoShare/pic")
+
+    assert requests[0].url == "https://api-eu.cloudinary.com/v1_1/demo/resources/image/upload/PhotoShare/pic"
+
+
+@pytest.mark.asyncio
+async def test_download_retried_and_not_found():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if request.url.path.endswith("/missing"):
+            return httpx.Response(404)
+        if len(calls) == 1:
+            raise httpx.ConnectError("reset")
+        return httpx.Response(200, content=b"\xff\xd8image")
+
+    cloudinary_client = client(handler)
+
+    assert await cloudinary_client.download("PhotoShare/pic") == b"\xff\xd8image"
+    assert len(calls) == 2
+    with pytest.raises(NotFound, match="PhotoShare/missing"):
+        await cloudinary_client.download("PhotoShare/missing")
+
+
+def test_url_with_transformation():
+    url = client(lambda request: None).url("PhotoShare/pic", width=250, crop="fill", version=5)
+
+    assert url == "https://res.cloudinary.com/demo/image/upload/c_fill,w_250/v5/PhotoShare/pic"
+
+
+@pytest.mark.asyncio
+async def test_resource_details_cached_until_changed():
+    lookups = []
+
+    def handler(request):
+        if "/resources/" in request.url.path:
+            lookups.append(request)
+            return httpx.Response(200, json={"version": len(lookups)})
+        return httpx.Response(200, json={"version": 100})
+
+    cloudinary_client = client(handler)
+
+    first = await cloudinary_client.resource("PhotoShare/pic")
+    second = await cloudinary_client.resource("PhotoShare/pic")
+    await cloudinary_client.upload(io.BytesIO(b"data"), "PhotoShare/pic")
+    third = await cloudinary_client.resource("PhotoShare/pic")
+
+    assert (first["version"], second["version"], third["version"]) == (1, 1, 2)
+    assert (cloudinary_client.hits, cloudinary_client.misses) == (1, 2)
+
+    expired = client(handler, resource_ttl=0)
+    await expired.resource("PhotoShare/pic")
+    await expired.resource("PhotoShare/pic")
+    assert len(lookups) == 4
@@ -0,0 +1,133 @@
+import asyncio
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from src.photo_effects_schemas import CropEnum
+from src.services.derivative_cache import DerivativeCache, derivative_key, is_preview, saved_key
+from src.services.storage import LocalStorage
+
+
+def png(size=(40, 20)) -> bytes:
+    output = BytesIO()
+    Image.new("RGB", size, "red").save(output, "PNG")
+    return output.getvalue()
+
+
+async def chunks(content: bytes):
+    yield content
+
+
+class CountingEngine:
+    def __init__(self):
+        self.calls = []
+
+    async def transform(self, source, options):
+        self.calls.append(options)
+        await asyncio.sleep(0)
+        return png((options["width"], options["width"])), "png"
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = CountingEngine()
+    monkeypatch.setattr("src.services.storage.image_engine", engine)
+    return engine
+
+
+def test_key_is_canonical():
+    key = derivative_key("PhotoShare/pic", 7, {"crop": CropEnum.option1, "width": 100, "aspect_ratio": "3:2", "x": None})
+
+    assert key == derivative_key("PhotoShare/pic", 7, {"aspect_ratio": "1.5", "width": 100, "crop": "fill"})
+    assert key != derivative_key("PhotoShare/pic", 8, {"aspect_ratio": "1.5", "width": 100, "crop": "fill"})
+    assert is_preview(key) and not is_preview(saved_key(key))
+
+
+def test_lru_eviction():
+    cache = DerivativeCache(max_entries=2, max_bytes=100)
+
+    assert cache.add("a", 1, 10) == []
+    assert cache.add("b", 1, 10) == []
+    cache.get("a")
+    assert cache.add("c", 1, 10) == ["b"]
+    assert cache.add("d", 1, 95) == ["a", "c"]
+    assert cache.stats() == {"entries": 1, "bytes": 95, "hits": 0, "misses": 0, "evictions": 3}
+
+
+@pytest.mark.asyncio
+async def test_repeated_transformation_is_a_hit(tmp_path, engine):
+    local = LocalStorage(str(tmp_path))
+    stored = await local.put(chunks(png()), "PhotoShare/pic")
+
+    urls = await asyncio.gather(*(
+        local.transform("PhotoShare/pic", stored["version"], crop="fill", width=10, height=None) for _ in range(3)
+    ))
+    again = await local.transform("PhotoShare/pic", stored["version"], crop=CropEnum.option1, width=10)
+
+    assert len(set(urls)) == 1 and again == urls[0]
+    assert len(engine.calls) == 1
+    assert (local.derivatives.misses, local.derivatives.hits) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_evicted_derivative_removed_from_storage(tmp_path, engine):
+    local = LocalStorage(str(tmp_path), derivatives=DerivativeCache(max_entries=1, max_bytes=10 ** 6))
+    stored = await local.put(chunks(png()), "PhotoShare/pic")
+
+    await local.transform("PhotoShare/pic", stored["version"], crop="fill", width=10)
+    await local.transform("PhotoShare/pic", stored["version"], crop="fill", width=12)
+
+    derivatives = await local.find_derivatives("PhotoShare/pic")
+    assert [Image.open(local.path(item["public_id"])).size for item in derivatives] == [(12, 12)]
+    assert local.derivatives.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidate_keeps_saved_transformations(tmp_path, engine):
+    local = LocalStorage(str(tmp_path))
+    stored = await local.put(chunks(png()), "PhotoShare/pic")
+    await local.transform("PhotoShare/pic", stored["version"], crop="fill", width=10)
+    url = await local.transform("PhotoShare/pic", stored["version"], crop="fill", width=12)
+
+    saved = await local.promote(url.rsplit("/", 2)[-2] + "/" + url.rsplit("/", 1)[-1])
+    await local.invalidate("PhotoShare/pic")
+
+    assert [item["public_id"] for item in await local.find_derivatives("PhotoShare/pic")] == [saved["public_id"]]
+    assert len(local.derivatives) == 0
+
+    await local.invalidate("PhotoShare/pic", saved=True)
+
+    assert await local.find_derivatives("PhotoShare/pic") == []
+    assert local.path("PhotoShare/pic").is_file()
+
+
+@pytest.mark.asyncio
+async def test_load_derivatives_indexes_previews(tmp_path, engine):
+    first = LocalStorage(str(tmp_path))
+    stored = await first.put(chunks(png()), "PhotoShare/pic")
+    url = await first.transform("PhotoShare/pic", stored["version"], crop="fill", width=10)
+
+    restarted = LocalStorage(str(tmp_path))
+    await restarted.load_derivatives()
+
+    assert len(restarted.derivatives) == 1
+    assert await restarted.transform("PhotoShare/pic", stored["version"], crop="fill", width=10) == url
+    assert len(engine.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_transform_saved_is_not_evicted(tmp_path, engine):
+    local = LocalStorage(str(tmp_path), derivatives=DerivativeCache(max_entries=1, max_bytes=10 ** 6))
+    stored = await local.put(chunks(png()), "PhotoShare/alice")
+
+    url = await local.transform_saved("PhotoShare/alice", stored["version"], crop="fill", width=25)
+    # The preview stays cached next to the saved copy
+    await local.transform("PhotoShare/alice", stored["version"], crop="fill", width=25)
+    assert len(engine.calls) == 1
+    await local.transform("PhotoShare/alice", stored["version"], crop="fill", width=10)
+    await local.transform("PhotoShare/alice", stored["version"], crop="fill", width=12)
+
+    key = "PhotoShare/" + url.rsplit("/", 1)[-1]
+    assert not is_preview(key)
+    assert Image.open(local.path(key)).size == (25, 25)
@@ -0,0 +1,43 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.services.filter import filter_photos_by_criteria
+
+
+def mock_db(photos=()):
+    db = AsyncMock(spec=AsyncSession)
+    result = MagicMock()
+    result.scalars().all.return_value = list(photos)
+    db.execute.return_value = result
+    return db
+
+
+def executed_sql(db):
+    stmt = db.execute.await_args.args[0]
+    return str(stmt.compile(compile_kwargs={"literal_binds": True}))
+
+
+@pytest.mark.asyncio
+async def test_filter_photos_single_query_without_aggregate():
+    db = mock_db()
+
+    await filter_photos_by_criteria(db, 3, 5, None, None)
+
+    db.execute.assert_awaited_once()
+    sql = executed_sql(db)
+    assert "photos.avg_rating >= 3" in sql
+    assert "photos.avg_rating <= 5" in sql
+    assert "GROUP BY" not in sql
+    assert "ratings" not in sql
+
+
+@pytest.mark.asyncio
+async def test_filter_photos_keyset_page():
+    db = mock_db()
+
+    await filter_photos_by_criteria(db, None, None, None, None, limit=10, after_id=42)
+
+    sql = executed_sql(db)
+    assert "photos.id > 42" in sql
+    assert "ORDER BY photos.id" in sql
+    assert "LIMIT 10" in sql
@@ -0,0 +1,137 @@
+from io import BytesIO
+
+import pytest
+from cloudinary.exceptions import BadRequest
+from PIL import Image
+
+from src.services.image_engine import ImageEngine, transform_image
+from src.services.storage import LocalStorage
+
+
+def encode(image: Image.Image, image_format: str = "PNG") -> bytes:
+    output = BytesIO()
+    image.save(output, image_format)
+    return output.getvalue()
+
+
+def halves(size=(400, 200)) -> bytes:
+    """Left half red, right half blue."""
+    image = Image.new("RGB", size, "red")
+    image.paste(Image.new("RGB", (size[0] // 2, size[1]), "blue"), (size[0] // 2, 0))
+    return encode(image)
+
+
+def result(source: bytes, **options) -> Image.Image:
+    content, _ = transform_image(source, options)
+    return Image.open(BytesIO(content)).convert("RGB")
+
+
+@pytest.mark.parametrize("crop, options, size", [
+    ("scale", {"width": 100}, (100, 50)),
+    ("scale", {"width": 100, "height": 100}, (100, 100)),
+    ("fit", {"width": 100, "height": 100}, (100, 50)),
+    ("lfit", {"width": 800, "height": 800}, (400, 200)),
+    ("mfit", {"width": 800, "height": 800}, (800, 400)),
+    ("fill", {"width": 100, "height": 100}, (100, 100)),
+    ("fill", {"width": 100, "aspect_ratio": "1:1"}, (100, 100)),
+    ("lfill", {"width": 800, "height": 800}, (200, 200)),
+    ("fill_pad", {"width": 50, "height": 100}, (50, 100)),
+    ("thumb", {"width": 60, "height": 60}, (60, 60)),
+    ("auto", {"width": 60, "height": 60}, (60, 60)),
+    ("crop", {"width": 100, "height": 50}, (100, 50)),
+    ("crop", {"aspect_ratio": "1.0"}, (200, 200)),
+    ("pad", {"width": 100, "height": 100}, (100, 100)),
+    ("lpad", {"width": 800, "height": 800}, (800, 800)),
+    ("mpad", {"width": 500, "height": 100}, (500, 200)),
+])
+def test_crop_modes_sizes(crop, options, size):
+    assert result(halves(), crop=crop, **options).size == size
+
+
+def test_gravity_picks_side():
+    west = result(halves(), crop="fill", width=100, height=100, gravity="west")
+    east = result(halves(), crop="fill", width=100, height=100, gravity="east")
+
+    assert west.getpixel((50, 50))[0] > 200
+    assert east.getpixel((50, 50))[2] > 200
+
+
+def test_auto_gravity_picks_detailed_region():
+    image = Image.new("RGB", (400, 100), "white")
+    for x in range(300, 400, 4):
+        image.paste(Image.new("RGB", (2, 100), "black"), (x, 0))
+
+    cropped = result(encode(image), crop="fill", width=100, height=100, gravity="auto")
+
+    assert cropped.convert("L").getextrema()[0] < 50
+
+
+def test_coordinates_crop():
+    cropped = result(halves(), crop="crop", width=100, height=100, x=250, y=0)
+
+    assert cropped.getpixel((10, 10))[2] > 200
+
+
+def test_pad_background():
+    padded = result(halves(), crop="pad", width=400, height=400, background="rgb:00ff00")
+
+    assert padded.getpixel((200, 10)) == (0, 255, 0)
+
+
+def test_jpeg_stays_jpeg_and_is_downscaled():
+    source = encode(Image.new("RGB", (3000, 2000), "gray"), "JPEG")
+
+    content, image_format = transform_image(source, {"crop": "fill", "width": 150, "height": 150})
+
+    assert image_format == "jpeg"
+    assert Image.open(BytesIO(content)).size == (150, 150)
+
+
+def test_invalid_input_rejected():
+    with pytest.raises(ValueError):
+        transform_image(b"not an image", {"crop": "fill", "width": 10})
+    with pytest.raises(ValueError):
+        transform_image(halves(), {"crop": "fill", "width": 10, "aspect_ratio": "a:b"})
+
+
+def test_corrupt_and_oversized_images_rejected(monkeypatch):
+    photo = encode(Image.effect_noise((200, 200), 64).convert("RGB"), "WEBP")
+
+    # The header is intact, the image data stops halfway
+    with pytest.raises(ValueError, match="Unsupported image"):
+        transform_image(photo[:len(photo) // 2], {"crop": "scale", "width": 100})
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    with pytest.raises(ValueError, match="Unsupported image"):
+        transform_image(photo, {"crop": "scale", "width": 100})
+
+
+@pytest.mark.asyncio
+async def test_local_storage_derivative_made_once(tmp_path, monkeypatch):
+    local = LocalStorage(str(tmp_path))
+    calls = []
+    engine = ImageEngine(workers=1, max_queue=1)
+    transform = engine.transform
+
+    async def counting_transform(source, options):
+        calls.append(options)
+        return await transform(source, options)
+
+    monkeypatch.setattr(engine, "transform", counting_transform)
+    monkeypatch.setattr("src.services.storage.image_engine", engine)
+
+    async def chunks():
+        yield halves()
+
+    stored = await local.put(chunks(), "PhotoShare/pic")
+    try:
+        first = await local.transform("PhotoShare/pic", stored["version"], crop="fill", width=50, height=50)
+        second = await local.transform("PhotoShare/pic", stored["version"], crop="fill", width=50, height=50)
+        with pytest.raises(BadRequest):
+            await local.transform("PhotoShare/pic", stored["version"], crop="fill", width=50, aspect_ratio="x")
+    finally:
+        engine.shutdown()
+
+    key = first.split("/storage/files/", 1)[1].split("/", 1)[1]
+    assert first == second
+    assert len(calls) == 2
+    assert Image.open(local.path(key)).size == (50, 50)
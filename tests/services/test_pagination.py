@@ -0,0 +1,25 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from src.services.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 10, 18, 12, 30, 5, 123456)
+
+    cursor = encode_cursor(created_at, 42)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor, datetime, int) == [created_at, 42]
+
+
+@pytest.mark.parametrize(
+    "cursor", ["", "not a cursor", encode_cursor(42), encode_cursor({"dt": "yesterday"}, 1), encode_cursor(1, 2)]
+)
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, datetime, int)
+
+    assert error.value.status_code == 400
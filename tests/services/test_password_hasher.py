@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from src.services.password_hasher import PasswordHasher
+
+FAST_ARGON2 = dict(argon2__time_cost=1, argon2__memory_cost=1024, argon2__parallelism=1)
+
+
+def hasher(workers=2, max_queue=4, **params) -> PasswordHasher:
+    context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto", **(params or FAST_ARGON2))
+    return PasswordHasher(context, workers, max_queue)
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify():
+    password_hasher = hasher()
+
+    hashed = await password_hasher.hash("secret")
+
+    assert hashed.startswith("$argon2")
+    assert await password_hasher.verify("secret", hashed) is True
+    assert await password_hasher.verify("wrong", hashed) is False
+
+
+@pytest.mark.asyncio
+async def test_rehash_when_parameters_change():
+    old_hash = await hasher(argon2__time_cost=1, argon2__memory_cost=512, argon2__parallelism=1).hash("secret")
+
+    valid, new_hash = await hasher().verify_and_update("secret", old_hash)
+
+    assert valid is True
+    assert "m=1024" in new_hash
+
+
+@pytest.mark.asyncio
+async def test_no_rehash_for_current_parameters():
+    password_hasher = hasher()
+    hashed = await password_hasher.hash("secret")
+
+    assert await password_hasher.verify_and_update("secret", hashed) == (True, None)
+
+
+@pytest.mark.asyncio
+async def test_bcrypt_hash_upgraded():
+    bcrypt_hash = CryptContext(schemes=["bcrypt"]).hash("secret")
+
+    valid, new_hash = await hasher().verify_and_update("secret", bcrypt_hash)
+
+    assert valid is True
+    assert new_hash.startswith("$argon2")
+
+
+@pytest.mark.asyncio
+async def test_saturated_pool_rejected_with_429():
+    password_hasher = hasher(workers=1, max_queue=1)
+    release = threading.Event()
+    password_hasher.context = type("Blocking", (), {"hash": staticmethod(lambda password: release.wait())})()
+
+    running = [asyncio.create_task(password_hasher.hash("secret")) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await password_hasher.hash("secret")
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.headers == {"Retry-After": "1"}
+
+    release.set()
+    await asyncio.gather(*running)
+    assert password_hasher.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_event_loop_not_blocked():
+    password_hasher = hasher(argon2__time_cost=3, argon2__memory_cost=65536, argon2__parallelism=1)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.001)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    await password_hasher.hash("secret")
+    task.cancel()
+
+    assert ticks > 5
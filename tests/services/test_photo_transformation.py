@@ -0,0 +1,110 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from src.database.models import Photo, User
+from src.photo_effects_schemas import QRCodeFormatEnum
+from src.repository import photo_transformation
+from src.routes.photo_transformation import generate_qr
+
+
+@pytest.fixture
+def storage():
+    storage = MagicMock()
+    storage.transform_saved = AsyncMock(return_value="https://cdn/c_fill,w_100/v7/PhotoShare/pic")
+    storage.info = AsyncMock(return_value={"version": 7, "width": 800, "height": 600, "format": "jpg", "bytes": 5000})
+    with patch("src.repository.photo_transformation.storage", storage):
+        yield storage
+
+
+@pytest.fixture
+def db():
+    db = AsyncMock()
+    db.execute = AsyncMock()
+    return db
+
+
+def found(db, photo):
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = photo
+    db.execute.return_value = result
+
+
+@pytest.mark.asyncio
+async def test_crop_uses_stored_version(storage, db):
+    photo = Photo(id=1, user_id=1, url="https://cdn/v7/PhotoShare/pic", version=7, transformation_position=0)
+    found(db, photo)
+
+    await photo_transformation.gravity_crop(1, "1:1", 100, "fill", "north", User(id=1), db)
+
+    storage.info.assert_not_awaited()
+    storage.transform_saved.assert_awaited_once_with(
+        "PhotoShare/pic", 7, gravity="north", aspect_ratio="1:1", width=100, crop="fill"
+    )
+    assert photo.transformed_url == "https://cdn/c_fill,w_100/v7/PhotoShare/pic"
+
+
+@pytest.mark.asyncio
+async def test_older_photo_looked_up_once(storage, db):
+    photo = Photo(id=1, user_id=1, url="https://cdn/PhotoShare/pic", transformation_position=0)
+    found(db, photo)
+
+    await photo_transformation.coordinates_crop(1, "1:1", 100, 5, 5, "crop", User(id=1), db)
+    await photo_transformation.coordinates_crop(1, "1:1", 120, 5, 5, "crop", User(id=1), db)
+
+    storage.info.assert_awaited_once_with("PhotoShare/pic")
+    assert (photo.version, photo.width, photo.height, photo.format, photo.size) == (7, 800, 600, "jpg", 5000)
+
+
+@pytest.mark.asyncio
+async def test_batch_reports_each_photo(storage, db):
+    photos = [
+        Photo(id=1, user_id=1, url="https://cdn/v7/PhotoShare/a", version=7, transformation_position=0),
+        Photo(id=2, user_id=1, url="https://cdn/v7/PhotoShare/b", version=7, transformation_position=2),
+    ]
+    db.scalars = AsyncMock(return_value=photos)
+    db.add = MagicMock()
+
+    async def transform(public_id, version, **options):
+        if public_id == "PhotoShare/b":
+            raise photo_transformation.BadRequest("Invalid aspect ratio")
+        return f"https://cdn/c_fill/v{version}/{public_id}"
+
+    storage.transform_saved.side_effect = transform
+
+    items = await photo_transformation.apply_transformation_batch(
+        [1, 2, 3, 1], {"crop": "fill", "width": 100}, User(id=1), db
+    )
+
+    assert items == [
+        {"photo_id": 1, "status_code": 200, "transformed_url": "https://cdn/c_fill/v7/PhotoShare/a"},
+        {"photo_id": 2, "status_code": 400, "detail": "Invalid aspect ratio"},
+        {"photo_id": 3, "status_code": 404, "detail": "Photo was not found"},
+    ]
+    assert (photos[0].transformation_position, photos[1].transformation_position) == (1, 2)
+    db.add.assert_called_once()
+    db.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_save_rendered_by_cloudinary_refreshes_metadata(storage, db):
+    photo = Photo(id=1, user_id=1, url="https://cdn/v7/PhotoShare/pic", version=7, width=800, height=600,
+                  format="jpg", size=5000, transformed_url="https://cdn/c_fill,w_100/v7/PhotoShare/pic",
+                  transformation_position=1)
+    found(db, photo)
+    storage.rendered_info = AsyncMock(return_value={"bytes": 900, "width": 100, "height": 100, "format": "jpg"})
+
+    await photo_transformation.save_transformation(1, User(id=1), db)
+
+    storage.rendered_info.assert_awaited_once_with("https://cdn/c_fill,w_100/v7/PhotoShare/pic")
+    assert photo.url == "https://cdn/c_fill,w_100/v7/PhotoShare/pic"
+    assert (photo.version, photo.width, photo.height, photo.format, photo.size) == (7, 100, 100, "jpg", 900)
+
+
+@pytest.mark.asyncio
+async def test_qr_code_of_missing_photo_not_found(db):
+    with patch("src.repository.photos.read_photo", AsyncMock(return_value=None)), pytest.raises(HTTPException) as e:
+        await generate_qr(1, MagicMock(), QRCodeFormatEnum("png"), User(id=1), db)
+
+    assert e.value.status_code == 404
@@ -0,0 +1,71 @@
+import asyncio
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from src.services.qr_codes import QRCodeCache, qr_digest, render_png, render_svg
+from src.services.storage import LocalStorage
+
+URL = "https://res.cloudinary.com/n/image/upload/c_fill,w_90/v17/PhotoShare/pic"
+
+
+def test_svg_is_compact():
+    svg = render_svg(URL)
+    png = Image.open(BytesIO(render_png(URL)))
+
+    assert svg.startswith(b"<svg") and svg.endswith(b"</svg>")
+    assert f'width="{png.width}"'.encode() in svg
+    assert len(svg) < 5000
+
+
+def test_digest_depends_on_url_and_format():
+    assert qr_digest(URL, "png") == qr_digest(URL, "png")
+    assert qr_digest(URL, "png") != qr_digest(URL, "svg")
+    assert qr_digest(URL, "png") != qr_digest(URL + "x", "png")
+
+
+@pytest.mark.asyncio
+async def test_rendered_once_then_served_from_memory(tmp_path):
+    cache = QRCodeCache(max_entries=10, storage=LocalStorage(str(tmp_path)))
+
+    images = await asyncio.gather(*(cache.get(URL) for _ in range(5)))
+    again = await cache.get(URL)
+
+    assert Image.open(BytesIO(again)).format == "PNG"
+    assert all(image == again for image in images)
+    assert (cache.renders, cache.hits, cache.misses) == (1, 1, 5)
+
+
+@pytest.mark.asyncio
+async def test_other_worker_reads_from_storage(tmp_path):
+    await QRCodeCache(max_entries=10, storage=LocalStorage(str(tmp_path))).get(URL, "svg")
+    other = QRCodeCache(max_entries=10, storage=LocalStorage(str(tmp_path)))
+
+    assert await other.get(URL, "svg") == render_svg(URL)
+    assert other.renders == 0
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_dropped():
+    cache = QRCodeCache(max_entries=1)
+
+    await cache.get(URL)
+    await cache.get(URL + "/other")
+    await cache.get(URL)
+
+    assert cache.renders == 3
+
+
+@pytest.mark.asyncio
+async def test_forget_removes_every_format(tmp_path):
+    cache = QRCodeCache(max_entries=10, storage=LocalStorage(str(tmp_path)))
+    await cache.get(URL)
+    await cache.get(URL, "svg")
+
+    await cache.forget(URL)
+    await cache.forget(URL)
+
+    assert not list((tmp_path / "QRCodes").iterdir())
+    await cache.get(URL)
+    assert cache.renders == 3
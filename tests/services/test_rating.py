@@ -1,18 +1,27 @@
 import pytest
-from unittest.mock import MagicMock
-from sqlalchemy.orm import Session
-from src.services.rating import add_rating
+from unittest.mock import AsyncMock
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.services.rating import add_rating, delete_rating, update_photo_rating
 from src.schemas import RatingCreate
 from src.database.models import Photo, User, Rating
 from src.repository.photos import create_photo
 from fastapi import HTTPException, status, Depends
+from sqlalchemy.exc import IntegrityError
+
+
+def mock_db(photo, existing_rating=None):
+    db = AsyncMock(spec=AsyncSession)
+    db.get.return_value = photo
+    if existing_rating is not None:
+        # uq_ratings_photo_id_user_id violation on insert
+        db.flush.side_effect = IntegrityError("INSERT INTO ratings", {}, Exception("duplicate key"))
+    return db
 
 
 @pytest.mark.asyncio
 async def test_add_rating_success():
-    db = MagicMock(spec=Session)
     mock_photo = Photo(id=1, user_id=2)
-    db.query().filter().first.side_effect = [mock_photo, None]  # Photo exists, no existing rating
+    db = mock_db(mock_photo, None)  # Photo exists, no existing rating
 
     rating_data = RatingCreate(rating=4)
 
@@ -21,6 +30,8 @@ async def test_add_rating_success():
     db.add.assert_called_once()
     db.commit.assert_called_once()
     db.refresh.assert_called_once()
+    # aggregate update only, duplicates are rejected by the unique constraint
+    db.execute.assert_awaited_once()
 
     assert isinstance(result, Rating)
     assert result.photo_id == 1
@@ -29,8 +40,7 @@ async def test_add_rating_success():
 
 @pytest.mark.asyncio
 async def test_add_rating_photo_not_found():
-    db = MagicMock(spec=Session)
-    db.query().filter().first.side_effect = [None]
+    db = mock_db(None)
     rating_data = RatingCreate(rating=4)
 
     with pytest.raises(HTTPException) as exc_info:
@@ -41,9 +51,8 @@ async def test_add_rating_photo_not_found():
 
 @pytest.mark.asyncio
 async def test_add_rating_owner_cannot_rate_own_photo():
-    db = MagicMock(spec=Session)
     mock_photo = Photo(id=1, user_id=3)
-    db.query().filter().first.side_effect = [mock_photo]
+    db = mock_db(mock_photo)
 
     rating_data = RatingCreate(rating=4)
 
@@ -56,11 +65,11 @@ async def test_add_rating_owner_cannot_rate_own_photo():
 @pytest.mark.parametrize("invalid_rating", [0, 6])
 @pytest.mark.asyncio
 async def test_add_rating_invalid_rating_range(invalid_rating):
-    db = MagicMock(spec=Session)
     mock_photo = Photo(id=1, user_id=2)
-    db.query().filter().first.side_effect = [mock_photo, None]
+    db = mock_db(mock_photo, None)
 
-    rating_data = RatingCreate(rating=invalid_rating)
+    # Built without validation: 6 is refused by the schema before reaching the service
+    rating_data = RatingCreate.model_construct(rating=invalid_rating)
 
     with pytest.raises(HTTPException) as exc_info:
         await add_rating(db=db, photo_id=1, rating=rating_data, user_id=3)
@@ -70,10 +79,9 @@ async def test_add_rating_invalid_rating_range(invalid_rating):
 
 @pytest.mark.asyncio
 async def test_add_rating_already_rated():
-    db = MagicMock(spec=Session)
     mock_photo = Photo(id=1, user_id=2)
     mock_existing_rating = Rating(photo_id=1, user_id=3, rating=4)
-    db.query().filter().first.side_effect = [mock_photo, mock_existing_rating]
+    db = mock_db(mock_photo, mock_existing_rating)
 
     rating_data = RatingCreate(rating=4)
 
@@ -81,4 +89,42 @@ async def test_add_rating_already_rated():
         await add_rating(db=db, photo_id=1, rating=rating_data, user_id=3)
 
     assert exc_info.value.status_code == 400
-    assert exc_info.value.detail == "You have rated this photo already!"
\ No newline at end of file
+    assert exc_info.value.detail == "You have rated this photo already!"
+    db.rollback.assert_awaited_once()
+    db.commit.assert_not_awaited()
+
+def test_update_photo_rating_is_single_atomic_update():
+    stmt = update_photo_rating(photo_id=1, count_delta=1, sum_delta=4)
+    sql = str(stmt.compile())
+
+    assert sql.startswith("UPDATE photos SET")
+    assert "rating_count=(photos.rating_count +" in sql
+    assert "rating_sum=(photos.rating_sum +" in sql
+    assert "avg_rating=CASE WHEN" in sql
+
+
+@pytest.mark.asyncio
+async def test_delete_rating_success():
+    mock_rating = Rating(id=7, photo_id=1, user_id=3, rating=4)
+    db = AsyncMock(spec=AsyncSession)
+    db.get.return_value = mock_rating
+
+    result = await delete_rating(db=db, rating_id=7)
+
+    db.delete.assert_awaited_once_with(mock_rating)
+    db.execute.assert_awaited_once()
+    db.commit.assert_awaited_once()
+    assert result is mock_rating
+
+
+@pytest.mark.asyncio
+async def test_delete_rating_not_found():
+    db = AsyncMock(spec=AsyncSession)
+    db.get.return_value = None
+
+    with pytest.raises(HTTPException) as exc_info:
+        await delete_rating(db=db, rating_id=7)
+
+    assert exc_info.value.status_code == 404
+    assert exc_info.value.detail == "Rating not found"
+    db.commit.assert_not_awaited()
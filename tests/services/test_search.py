@@ -0,0 +1,51 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.services.search import build_ts_query, search_photos
+
+
+@pytest.mark.parametrize(
+    "keyword, expected",
+    [
+        ("sunset", "sunset:*"),
+        ("Sun  BEAC", "sun:* & beac:*"),
+        ("it's (sea)!", "it:* & s:* & sea:*"),
+        ("!!!", None),
+    ],
+)
+def test_build_ts_query(keyword, expected):
+    assert build_ts_query(keyword) == expected
+
+
+def mock_db():
+    db = AsyncMock(spec=AsyncSession)
+    result = MagicMock()
+    result.scalars().all.return_value = []
+    result.all.return_value = []
+    db.execute.return_value = result
+    return db
+
+
+@pytest.mark.asyncio
+async def test_search_photos_uses_full_text_ranking():
+    db = mock_db()
+
+    await search_photos(None, "sun", db, limit=10, after=[0.25, 20])
+
+    stmt = db.execute.await_args.args[0]
+    compiled = stmt.compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+    assert "photos.search_vector @@ to_tsquery(" in sql
+    assert "(ranked.rank, ranked.id) < (" in sql
+    assert "ORDER BY page.rank DESC" in sql
+    assert "ILIKE" not in sql
+    assert {"simple", "sun:*", 0.25, 20, 10} <= set(compiled.params.values())
+
+
+@pytest.mark.asyncio
+async def test_search_photos_without_words_skips_query():
+    db = mock_db()
+
+    assert await search_photos(None, "???", db) == []
+    db.execute.assert_not_awaited()
@@ -0,0 +1,115 @@
+from io import BytesIO
+from unittest.mock import patch
+
+import httpx
+import pytest
+from cloudinary.exceptions import BadRequest, NotFound
+from fastapi import FastAPI
+from PIL import Image
+
+from src.routes import storage as storage_routes
+from src.services.cloudinary_client import CloudinaryClient
+from src.services.storage import CloudinaryStorage, LocalStorage
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"p" * 1000
+
+
+async def chunks(data: bytes, size: int = 100):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+@pytest.fixture
+def local(tmp_path):
+    return LocalStorage(str(tmp_path), "http://test")
+
+
+@pytest.mark.asyncio
+async def test_local_round_trip(local):
+    stored = await local.put(chunks(PNG), "PhotoShare/pic")
+    content = await local.get("PhotoShare/pic")
+
+    assert stored["public_id"] == "PhotoShare/pic"
+    assert stored["bytes"] == len(PNG)
+    assert content == PNG
+    assert await local.info("PhotoShare/pic") == stored
+    assert local.url("PhotoShare/pic", stored["version"]) == f"http://test/storage/files/v{stored['version']}/PhotoShare/pic"
+    assert await local.delete("PhotoShare/pic") == {"result": "ok"}
+    assert await local.delete("PhotoShare/pic") == {"result": "not found"}
+    with pytest.raises(NotFound):
+        await local.get("PhotoShare/pic")
+
+
+@pytest.mark.asyncio
+async def test_failed_upload_leaves_no_file(local, tmp_path):
+    async def broken():
+        yield PNG
+        raise RuntimeError("client went away")
+
+    with pytest.raises(RuntimeError):
+        await local.put(broken(), "PhotoShare/pic")
+
+    assert list(tmp_path.rglob("*")) == [tmp_path / "PhotoShare"]
+
+
+def test_keys_outside_root_rejected(local):
+    with pytest.raises(BadRequest):
+        local.path("../etc/passwd")
+
+
+@pytest.mark.asyncio
+async def test_files_served_with_content_type_and_caching(local):
+    stored = await local.put(chunks(PNG), "PhotoShare/pic")
+    app = FastAPI()
+    app.include_router(storage_routes.router)
+
+    with patch.object(storage_routes, "storage", local):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://test") as client:
+            versioned = await client.get(f"/storage/files/v{stored['version']}/PhotoShare/pic")
+            latest = await client.get("/storage/files/PhotoShare/pic")
+            missing = await client.get("/storage/files/PhotoShare/other")
+            escaped = await client.get("/storage/files/PhotoShare/..%2F..%2Fsecret")
+            directory = await client.get("/storage/files/PhotoShare")
+
+    assert versioned.status_code == 200
+    assert versioned.content == PNG
+    assert versioned.headers["content-type"] == "image/png"
+    assert "immutable" in versioned.headers["cache-control"]
+    assert latest.headers["cache-control"] == "no-cache"
+    assert missing.status_code == 404
+    assert escaped.status_code == 404
+    assert directory.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_accel_redirect_hands_file_to_proxy(local):
+    await local.put(chunks(PNG), "PhotoShare/pic")
+    app = FastAPI()
+    app.include_router(storage_routes.router)
+
+    with patch.object(storage_routes, "storage", local), \
+            patch.object(storage_routes.settings, "storage_local_accel_redirect", "/protected-media/"):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://test") as client:
+            response = await client.get("/storage/files/PhotoShare/pic")
+
+    assert response.headers["x-accel-redirect"] == "/protected-media/PhotoShare/pic"
+    assert response.content == b""
+
+
+@pytest.mark.asyncio
+async def test_rendered_info_of_cloudinary_transformation():
+    image = BytesIO()
+    Image.new("RGB", (100, 50), "red").save(image, "PNG")
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(200, content=image.getvalue())
+
+    client = CloudinaryClient("demo", "key", "secret", transport=httpx.MockTransport(handler))
+    url = client.url("PhotoShare/pic", version=7, crop="fill", width=100)
+
+    info = await CloudinaryStorage(client).rendered_info(url)
+
+    assert requested == [url]
+    assert info == {"bytes": len(image.getvalue()), "width": 100, "height": 50, "format": "png"}
@@ -0,0 +1,221 @@
+import asyncio
+import time
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from src.repository.token_blacklist import KEY_PREFIX, TokenBlacklist, blacklist_key
+from src.services.bloom_filter import BloomFilter
+
+
+def synced_blacklist(redis=None):
+    blacklist = TokenBlacklist(capacity=1000, error_rate=0.001)
+    blacklist.redis = redis or AsyncMock()
+    blacklist.synced = True
+    return blacklist
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f"jti-{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+    assert bloom.is_full
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"jti-{i}")
+
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 10000 * 0.02
+
+
+def test_blacklist_key_prefers_jti():
+    assert blacklist_key("token", {"jti": "abc"}) == "abc"
+    assert len(blacklist_key("token", {})) == 64
+
+
+@pytest.mark.asyncio
+async def test_unknown_token_skips_redis():
+    blacklist = synced_blacklist()
+
+    assert await blacklist.contains("not-revoked") is False
+    blacklist.redis.exists.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_add_sets_ttl_and_publishes():
+    blacklist = synced_blacklist()
+
+    await blacklist.add("abc", time.time() + 600)
+
+    key, value = blacklist.redis.set.await_args.args
+    assert key == f"{KEY_PREFIX}abc"
+    assert 590 <= blacklist.redis.set.await_args.kwargs["ex"] <= 600
+    blacklist.redis.publish.assert_awaited_once_with("token_blacklist", "abc")
+    assert "abc" in blacklist.bloom
+
+
+@pytest.mark.asyncio
+async def test_add_ignores_expired_token():
+    blacklist = synced_blacklist()
+
+    await blacklist.add("abc", time.time() - 1)
+
+    blacklist.redis.set.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_filter_hit_is_confirmed_in_redis():
+    blacklist = synced_blacklist()
+    blacklist.bloom.add("abc")
+    blacklist.redis.exists.return_value = 1
+
+    assert await blacklist.contains("abc") is True
+    blacklist.redis.exists.assert_awaited_once_with(f"{KEY_PREFIX}abc")
+
+
+@pytest.mark.asyncio
+async def test_not_synced_goes_to_redis():
+    blacklist = synced_blacklist()
+    blacklist.synced = False
+    blacklist.redis.exists.return_value = 1
+
+    assert await blacklist.contains("revoked-by-another-worker") is True
+
+
+@pytest.mark.asyncio
+async def test_redis_failure_fails_closed():
+    blacklist = synced_blacklist()
+    blacklist.bloom.add("abc")
+    blacklist.redis.exists.side_effect = RedisConnectionError()
+
+    assert await blacklist.contains("abc") is True
+
+
+@pytest.mark.asyncio
+async def test_redis_failure_before_sync_answers_from_filter():
+    blacklist = synced_blacklist()
+    blacklist.synced = False
+    blacklist.bloom.add("revoked-here")
+    blacklist.redis.exists.side_effect = RedisConnectionError()
+
+    assert await blacklist.contains("not-revoked") is False
+    assert await blacklist.contains("revoked-here") is True
+
+
+@pytest.mark.asyncio
+async def test_full_filter_rebuilt_once_with_room_to_grow():
+    blacklist = synced_blacklist()
+    live = [f"jti-{i}" for i in range(1500)]
+    scans = 0
+
+    async def scan_iter(**kwargs):
+        nonlocal scans
+        scans += 1
+        await asyncio.sleep(0)
+        for jti in live:
+            yield f"{KEY_PREFIX}{jti}"
+
+    blacklist.redis.scan_iter = scan_iter
+    for jti in live:
+        await blacklist.add(jti, time.time() + 600)
+    await blacklist._rebuild_task
+
+    assert scans == 1
+    assert blacklist.bloom.capacity == 3000
+    assert all(jti in blacklist.bloom for jti in live)
+    await blacklist.add("one-more", time.time() + 600)
+    assert blacklist._rebuild_task is None
+
+
+@pytest.mark.asyncio
+async def test_rebuild_loads_keys_from_redis():
+    blacklist = synced_blacklist()
+
+    async def scan_iter(**kwargs):
+        for key in (f"{KEY_PREFIX}a", f"{KEY_PREFIX}b"):
+            yield key
+
+    blacklist.redis.scan_iter = scan_iter
+    blacklist.bloom.add("expired")
+
+    await blacklist.rebuild()
+
+    assert "a" in blacklist.bloom and "b" in blacklist.bloom
+    assert "expired" not in blacklist.bloom
+
+
+@pytest.mark.asyncio
+async def test_without_redis_kept_in_memory():
+    blacklist = TokenBlacklist(capacity=1000, error_rate=0.001)
+
+    await blacklist.add("abc", time.time() + 600)
+
+    assert await blacklist.contains("abc") is True
+    assert await blacklist.contains("other") is False
+
+
+class FakePubSub:
+    """Subscription whose first ``listen`` fails with ``error`` after one message."""
+
+    def __init__(self, error: Exception):
+        self.error = error
+        self.subscriptions = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def subscribe(self, channel):
+        self.subscriptions += 1
+
+    async def listen(self):
+        yield {"type": "message", "data": "from-other-worker"}
+        if self.subscriptions == 1:
+            raise self.error
+        await asyncio.Event().wait()
+
+
+@pytest.mark.asyncio
+async def test_listener_resubscribes_after_any_error():
+    pubsub = FakePubSub(ValueError("bad message"))
+    redis = MagicMock(pubsub=MagicMock(return_value=pubsub))
+    scans = 0
+
+    async def scan_iter(**kwargs):
+        nonlocal scans
+        scans += 1
+        yield f"{KEY_PREFIX}stored"
+
+    redis.scan_iter = scan_iter
+    blacklist = TokenBlacklist(capacity=1000, error_rate=0.001)
+    await blacklist.start(redis)
+    await asyncio.sleep(0.1)
+    # Resubscribing waits a second after the failure
+    assert blacklist.synced is False
+
+    await asyncio.sleep(1)
+    assert blacklist.synced is True
+    await blacklist.stop()
+
+    assert (pubsub.subscriptions, scans) == (2, 2)
+    assert "stored" in blacklist.bloom and "from-other-worker" in blacklist.bloom
+
+
+@pytest.mark.asyncio
+async def test_without_redis_expired_revocations_dropped_on_add():
+    blacklist = TokenBlacklist(capacity=1000, error_rate=0.001)
+    await blacklist.add("old", time.time() + 600)
+    blacklist._local["old"] = time.time() - 1
+
+    await blacklist.add("new", time.time() + 600)
+
+    assert list(blacklist._local) == ["new"]
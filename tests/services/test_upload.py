@@ -0,0 +1,182 @@
+import hashlib
+from io import BytesIO
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from PIL import Image
+
+from src.services.cloudinary_client import CloudinaryClient, FakeCloudinary
+from src.services.multipart import MultipartReader
+from src.services.storage import CloudinaryStorage
+from src.services.upload import UploadLimiter, receive_upload, sniff_image_type
+
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00JFIF" + bytes(range(256)) * 400
+
+
+@pytest.fixture
+def fake():
+    fake = FakeCloudinary()
+    client = CloudinaryClient("demo", "key", "secret", transport=fake, backoff=0)
+    with patch("src.services.upload.storage", CloudinaryStorage(client)):
+        yield fake
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        upload = await receive_upload(
+            request, 1, lambda filename: f"PhotoShare/{filename}", required=("description",), max_bytes=200_000
+        )
+        return {
+            "public_id": upload.public_id,
+            "size": upload.size,
+            "sha256": upload.sha256,
+            "content_type": upload.content_type,
+            "fields": upload.fields,
+            "image": [upload.width, upload.height, upload.format],
+        }
+
+    return app
+
+
+async def post(app, **kwargs) -> httpx.Response:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://test") as client:
+        return await client.post("/upload", **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_upload_streamed_to_cloudinary(app, fake):
+    response = await post(app, data={"description": "sunset"}, files={"file": ("a.jpg", JPEG)})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "public_id": "PhotoShare/a.jpg",
+        "size": len(JPEG),
+        "sha256": hashlib.sha256(JPEG).hexdigest(),
+        "content_type": "image/jpeg",
+        "fields": {"description": "sunset"},
+        "image": [None, None, "jpg"],
+    }
+    assert fake.images["PhotoShare/a.jpg"]["bytes"] == len(JPEG)
+
+
+@pytest.mark.asyncio
+async def test_dimensions_read_from_header(app, fake):
+    image = BytesIO()
+    Image.effect_noise((320, 240), 64).save(image, "PNG")
+
+    response = await post(app, data={"description": "noise"}, files={"file": ("n.png", image.getvalue())})
+
+    assert response.status_code == 200
+    assert response.json()["image"] == [320, 240, "png"]
+
+
+@pytest.mark.asyncio
+async def test_not_an_image_rejected_before_upload(app, fake):
+    response = await post(app, data={"description": "x"}, files={"file": ("a.jpg", b"<html>" * 100)})
+
+    assert response.status_code == 415
+    assert fake.images == {}
+
+
+@pytest.mark.asyncio
+async def test_declared_size_over_limit_rejected(app, fake):
+    response = await post(app, data={"description": "x"}, files={"file": ("a.jpg", JPEG * 4)})
+
+    assert response.status_code == 413
+    assert fake.images == {}
+
+
+@pytest.mark.asyncio
+async def test_stream_over_limit_aborted(app, fake):
+    boundary = "b0undary"
+
+    async def body():
+        yield f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="a.jpg"\r\n\r\n'.encode()
+        for _ in range(4):
+            yield JPEG
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    response = await post(app, content=body(), headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+
+    assert response.status_code == 413
+    assert fake.images == {}
+
+
+@pytest.mark.asyncio
+async def test_missing_field_removes_upload(app, fake):
+    response = await post(app, files={"file": ("a.jpg", JPEG)})
+
+    assert response.status_code == 422
+    assert fake.images == {}
+
+
+@pytest.mark.asyncio
+async def test_field_after_file_too_large_removes_upload(app, fake):
+    boundary = "b0undary"
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="a.jpg"\r\n\r\n'.encode()
+        + JPEG
+        + f'\r\n--{boundary}\r\nContent-Disposition: form-data; name="description"\r\n\r\n'.encode()
+        + b"x" * 100_000
+        + f"\r\n--{boundary}--\r\n".encode()
+    )
+
+    response = await post(app, content=body, headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+
+    assert response.status_code == 413
+    assert fake.images == {}
+
+
+@pytest.mark.asyncio
+async def test_limiter_rejects_over_limit_per_user():
+    limiter = UploadLimiter(max_per_user=1)
+
+    async with limiter.slot(1):
+        async with limiter.slot(2):
+            with pytest.raises(HTTPException) as exc_info:
+                async with limiter.slot(1):
+                    pass
+    assert exc_info.value.status_code == 429
+    assert limiter.active == {}
+
+
+@pytest.mark.asyncio
+async def test_reader_handles_parts_split_across_chunks():
+    body = (
+        b'--xx\r\nContent-Disposition: form-data; name="description"\r\n\r\nhello world\r\n'
+        b'--xx\r\nContent-Disposition: form-data; name="file"; filename="a b.png"\r\n'
+        b"Content-Type: image/png\r\n\r\n" + b"\x89PNG\r\n\x1a\n" + b"p" * 100 + b"\r\n--xx--\r\n"
+    )
+
+    async def stream():
+        for i in range(0, len(body), 7):
+            yield body[i:i + 7]
+
+    reader = MultipartReader(b"xx", stream())
+    field = await reader.next_part()
+    value = await reader.read(1024)
+    file = await reader.next_part()
+    data = b"".join([chunk async for chunk in reader.iter_data()])
+
+    assert (field.name, field.filename, value) == ("description", None, b"hello world")
+    assert (file.name, file.filename, file.content_type) == ("file", "a b.png", "image/png")
+    assert data == b"\x89PNG\r\n\x1a\n" + b"p" * 100
+    assert await reader.next_part() is None
+
+
+@pytest.mark.parametrize("head, content_type", [
+    (b"\xff\xd8\xff\xe1....Exif", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n\x00\x00\x00\x0d", "image/png"),
+    (b"GIF89a\x01\x00\x01\x00\x00\x00", "image/gif"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "image/webp"),
+    (b"\x00\x00\x00\x18ftypheic\x00\x00", "image/heic"),
+    (b"%PDF-1.7\n%\xe2\xe3\xcf\xd3", None),
+])
+def test_sniff_image_type(head, content_type):
+    assert sniff_image_type(head) == content_type
@@ -0,0 +1,141 @@
+import json
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import User
+from src.services.auth import auth_service
+from src.services.user_cache import KEY_PREFIX, UserCache, dump_fields, user_to_fields
+
+FIELDS = {
+    "id": 1, "username": "alice1", "email": "a@x.com",
+    "created_at": datetime(2024, 1, 1), "updated_at": datetime(2024, 1, 2),
+    "role": "user", "allowed": True, "avatar": None, "phone_number": None, "confirmed": True,
+}
+
+
+def loaded_before():
+    return time.monotonic()
+
+
+@pytest.mark.asyncio
+async def test_get_after_set():
+    cache = UserCache(maxsize=10, ttl=30)
+
+    await cache.set("a@x.com", 100, FIELDS, loaded_before())
+
+    assert await cache.get("a@x.com", 100) == FIELDS
+    assert await cache.get("a@x.com", 101) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_entries_expire():
+    cache = UserCache(maxsize=10, ttl=0)
+
+    await cache.set("a@x.com", 100, FIELDS, loaded_before())
+
+    assert await cache.get("a@x.com", 100) is None
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_evicted():
+    cache = UserCache(maxsize=2, ttl=30)
+    for iat in (1, 2):
+        await cache.set("a@x.com", iat, FIELDS, loaded_before())
+    await cache.get("a@x.com", 1)
+
+    await cache.set("a@x.com", 3, FIELDS, loaded_before())
+
+    assert await cache.get("a@x.com", 1) == FIELDS
+    assert await cache.get("a@x.com", 2) is None
+
+
+@pytest.mark.asyncio
+async def test_invalidate_drops_every_token_of_user():
+    cache = UserCache(maxsize=10, ttl=30)
+    for iat in (1, 2):
+        await cache.set("a@x.com", iat, FIELDS, loaded_before())
+    await cache.set("b@x.com", 1, FIELDS, loaded_before())
+
+    await cache.invalidate("a@x.com")
+
+    assert await cache.get("a@x.com", 1) is None
+    assert await cache.get("a@x.com", 2) is None
+    assert await cache.get("b@x.com", 1) == FIELDS
+
+
+@pytest.mark.asyncio
+async def test_load_started_before_invalidation_not_stored():
+    cache = UserCache(maxsize=10, ttl=30)
+    loaded_at = loaded_before()
+
+    await cache.invalidate("a@x.com")
+    await cache.set("a@x.com", 1, FIELDS, loaded_at)
+
+    assert await cache.get("a@x.com", 1) is None
+
+
+@pytest.mark.asyncio
+async def test_redis_tier():
+    cache = UserCache(maxsize=10, ttl=30)
+    cache.redis = AsyncMock()
+    cache.redis.hget.return_value = json.dumps([time.time(), dump_fields(FIELDS)])
+
+    assert await cache.get("a@x.com", 1) == FIELDS
+    cache.redis.hget.assert_awaited_once_with(f"{KEY_PREFIX}a@x.com", "1")
+
+    # promoted to the local tier
+    assert await cache.get("a@x.com", 1) == FIELDS
+    cache.redis.hget.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_redis_invalidate_deletes_and_publishes():
+    cache = UserCache(maxsize=10, ttl=30)
+    cache.redis = AsyncMock()
+
+    await cache.invalidate("a@x.com")
+
+    cache.redis.delete.assert_awaited_once_with(f"{KEY_PREFIX}a@x.com")
+    cache.redis.publish.assert_awaited_once_with("user_cache", "a@x.com")
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_served_from_cache():
+    cache = UserCache(maxsize=10, ttl=30)
+    await cache.set("a@x.com", 100, FIELDS, loaded_before())
+    request = SimpleNamespace(
+        state=SimpleNamespace(token="t", token_payload={"sub": "a@x.com", "iat": 100, "scope": "access_token"})
+    )
+    db = AsyncMock(spec=AsyncSession)
+    db.merge.side_effect = lambda user, load: user
+
+    with patch("src.services.auth.user_cache", cache):
+        user = await auth_service.get_current_user(request, "t", db)
+
+    db.execute.assert_not_awaited()
+    assert db.merge.await_args.kwargs == {"load": False}
+    assert user_to_fields(user) == FIELDS
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_miss_loads_and_caches():
+    cache = UserCache(maxsize=10, ttl=30)
+    request = SimpleNamespace(
+        state=SimpleNamespace(token="t", token_payload={"sub": "a@x.com", "iat": 100, "scope": "access_token"})
+    )
+    db = AsyncMock(spec=AsyncSession)
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = User(**FIELDS)
+    db.execute.return_value = result
+
+    with patch("src.services.auth.user_cache", cache):
+        await auth_service.get_current_user(request, "t", db)
+
+    db.execute.assert_awaited_once()
+    assert await cache.get("a@x.com", 100) == FIELDS